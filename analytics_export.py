@@ -0,0 +1,393 @@
+# analytics_export.py
+"""
+분석용 Parquet 내보내기와 DuckDB 집계
+--------------------------------------------------------
+기능:
+- 종료된 거래, AI 분석, 평가 자산 샘플을 날짜별로 나눈 Parquet 파일(analytics/<DB 이름>/<데이터셋>/date=YYYY-MM-DD/)에 증분 추가
+- 데이터셋별 워터마크(마지막으로 내보낸 키)를 저장해 새 행만 읽고, 중단된 실행이 남긴 파일은 다음 실행에서 정리
+- 거래는 (청산 시간, id) 키로 이어 읽어 같은 청산 시간의 행이 배치 경계에서 빠지지 않고, 늦게 커밋되는 청산을 위해 최근 CLOSE_SETTLE_MS 안의 청산은 다음 실행으로 미룸
+- 대시보드의 일별/방향별/레버리지 구간별/프롬프트 버전별 집계를 내장 DuckDB 엔진으로 Parquet에서 직접 계산
+- python analytics_export.py: cron/systemd 타이머로 실행하는 내보내기 작업 (--bench N: N행 합성 데이터로 속도 측정)
+--------------------------------------------------------
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from db import get_connection
+from migrations import epoch_ms
+from performance_aggregates import _leverage_bucket_sql
+from shards import DEFAULT_SHARD, list_all_shards, shard_info
+from storage import PROFILES
+
+try:
+    import duckdb
+except ImportError:  # 선택 의존성: 없으면 내보내기/집계를 사용할 수 없고 대시보드는 기존 조회만 사용
+    duckdb = None
+
+EXPORT_ROOT = "analytics"      # 내보내기 기본 디렉터리 (DB 파일과 같은 위치 기준)
+EXPORT_BATCH = 200_000         # 한 번에 읽어 쓸 최대 행 수
+WATERMARK_FILE = "_watermarks.json"
+CLOSE_SETTLE_MS = 5 * 60 * 1000  # 이보다 최근에 청산된 거래는 다음 실행에서 내보냄 (청산 시간보다 늦게 커밋되는 행 대비)
+
+# 데이터셋 -> (테이블, 워터마크 키 컬럼(함께 유일한 순서), 날짜 구분 기준 시간 컬럼(epoch-ms), 추가 조건)
+# 테이블 이름의 {trades}/{analyses}는 프로필의 테이블로 바뀌고, 조건의 :settled는 지금 - CLOSE_SETTLE_MS
+DATASETS = {
+    "trades": ("{trades}", ("exit_timestamp_ms", "id"), "exit_timestamp_ms",
+               "status = 'CLOSED' AND exit_timestamp_ms <= :settled"),
+    "analyses": ("{analyses}", ("id",), "timestamp_ms", ""),
+    "equity": ("equity_samples", ("timestamp_ms",), "timestamp_ms", ""),
+}
+
+# 프롬프트 이력은 작고 종료 시간이 나중에 채워지므로 매번 전체를 한 파일로 덮어씀
+SNAPSHOT_TABLES = {"prompts": "prompt_history"}
+
+# 집계 기준 -> (그룹 표현식, 정렬)
+GROUPINGS = {
+    "day": ("t.date", "bucket"),
+    "direction": ("t.action", "bucket"),
+    "leverage": (_leverage_bucket_sql("t.leverage"), "MIN(t.leverage)"),
+    "prompt": ("p.id", "bucket"),
+}
+
+
+def _require_duckdb():
+    if duckdb is None:
+        raise RuntimeError("Parquet 내보내기/집계에는 duckdb 패키지가 필요합니다. (pip install duckdb)")
+
+
+def export_dir_for(db_file, root=None):
+    """
+    DB 파일의 내보내기 디렉터리
+
+    기본 파일은 <기본 DB 위치>/analytics/<DB 이름>, 샤드는 <기본 DB 위치>/analytics/<DB 이름>-<샤드>
+    (실거래/모의 거래 샤드 이름이 같아도 겹치지 않음)
+    """
+    info = shard_info(db_file)
+    if info is None:
+        base_dir, name = os.path.dirname(db_file), os.path.splitext(os.path.basename(db_file))[0]
+    else:
+        profile, shard, base_dir = info
+        name = os.path.splitext(PROFILES[profile][0])[0]
+        if shard != DEFAULT_SHARD:
+            name = f"{name}-{shard}"
+    if root is None:
+        root = os.path.join(base_dir, EXPORT_ROOT)
+    return os.path.join(root, name)
+
+
+def profile_for(db_file):
+    """DB 파일(기본 파일 또는 샤드)의 저장소 프로필 (봇 DB가 아니면 ValueError)"""
+    info = shard_info(db_file)
+    if info is None:
+        raise ValueError(f"봇 DB 파일이 아니어서 프로필을 알 수 없습니다: {db_file} (--profile로 지정)")
+    return info[0]
+
+
+def _load_watermarks(export_dir):
+    path = os.path.join(export_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_watermarks(export_dir, watermarks):
+    path = os.path.join(export_dir, WATERMARK_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(watermarks, f)
+    os.replace(path + ".tmp", path)
+
+
+def _part_files(dataset_dir):
+    return glob.glob(os.path.join(dataset_dir, "date=*", "part-*.parquet"))
+
+
+def _watermark_key(value, width):
+    """저장된 워터마크를 키 튜플로 바꿉니다. (예전 형식의 단일 값은 그 값까지 모두 내보낸 것으로 취급)"""
+    if value is None:
+        return (0,) * width
+    if isinstance(value, list):
+        return tuple(value)
+    return (value,) + (2 ** 62,) * (width - 1)
+
+
+def _format_key(key):
+    """파일 이름에 쓰는 키 (예: 000001700000000000_000000000042)"""
+    return "_".join(f"{int(part):015d}" for part in key)
+
+
+def _parse_key(text):
+    return tuple(int(part) for part in text.split("_"))
+
+
+def _remove_orphans(dataset_dir, watermark):
+    """워터마크를 저장하기 전에 중단된 실행이 쓴 파일(첫 키 > 워터마크)을 지웁니다. (다시 내보낼 때 중복 방지)"""
+    for path in _part_files(dataset_dir):
+        first_key = _parse_key(os.path.basename(path).split("-")[1])
+        if first_key > watermark[:len(first_key)]:
+            os.remove(path)
+
+
+def _write_parquet(con, frame, path):
+    """DataFrame을 zstd 압축 Parquet 파일로 씁니다. (임시 파일에 쓴 뒤 이름 변경)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con.register("batch", frame)
+    try:
+        con.execute(f"COPY batch TO '{path}.tmp' (FORMAT PARQUET, COMPRESSION ZSTD)")
+    finally:
+        con.unregister("batch")
+    os.replace(f"{path}.tmp", path)
+
+
+def export_dataset(db_file, export_dir, name, watermarks, con=None, profile=None):
+    """
+    데이터셋 하나의 새 행을 Parquet으로 내보냅니다
+
+    배치마다 날짜별 파일(part-<첫 키>-<마지막 키>.parquet)을 쓰고 워터마크를 저장합니다.
+    키 컬럼이 여럿이면 파일 이름의 키는 밑줄로 이어 붙입니다.
+
+    매개변수:
+        db_file (str): 원본 DB 파일 경로
+        export_dir (str): 내보내기 디렉터리
+        name (str): DATASETS의 데이터셋 이름
+        watermarks (dict): 데이터셋별 마지막 키 목록 (내보낸 만큼 갱신됨)
+        profile (str, optional): 저장소 프로필 (기본값: 파일 경로에서 찾음)
+
+    반환값:
+        int: 내보낸 행 수
+    """
+    _require_duckdb()
+    con = con or duckdb.connect()
+    _, trades_table, analyses_table = PROFILES[profile or profile_for(db_file)]
+    table, key_columns, time_column, condition = DATASETS[name]
+    table = table.format(trades=trades_table, analyses=analyses_table)
+    dataset_dir = os.path.join(export_dir, name)
+    watermark = _watermark_key(watermarks.get(name), len(key_columns))
+    _remove_orphans(dataset_dir, watermark)
+
+    # 키 컬럼이 여럿이면 행 값 비교로 (청산 시간, id) 순서상 워터마크 다음 행부터 읽음
+    key_list = ", ".join(key_columns)
+    key_params = [f":k{i}" for i in range(len(key_columns))]
+    if len(key_columns) == 1:
+        where = f"{key_list} > {key_params[0]}"
+    else:
+        where = f"({key_list}) > ({', '.join(key_params)})"
+    where += f" AND {condition}" if condition else ""
+    sql = (
+        f"SELECT *, date({time_column} / 1000, 'unixepoch', 'localtime') AS date FROM {table} "
+        f"WHERE {where} ORDER BY {key_list} LIMIT :limit"
+    )
+    conn = get_connection(db_file, readonly=True)
+    settled = epoch_ms() - CLOSE_SETTLE_MS
+    exported = 0
+    while True:
+        params = {f"k{i}": value for i, value in enumerate(watermark)}
+        params.update(limit=EXPORT_BATCH, settled=settled)
+        frame = pd.read_sql_query(sql, conn, params=params)
+        if frame.empty:
+            break
+        for date, rows in frame.groupby("date", sort=False):
+            keys = rows[list(key_columns)]
+            first, last = _format_key(keys.iloc[0]), _format_key(keys.iloc[-1])
+            path = os.path.join(dataset_dir, f"date={date}", f"part-{first}-{last}.parquet")
+            _write_parquet(con, rows.drop(columns="date"), path)
+        watermark = tuple(int(value) for value in frame[list(key_columns)].iloc[-1])
+        watermarks[name] = list(watermark)
+        _save_watermarks(export_dir, watermarks)
+        exported += len(frame)
+    return exported
+
+
+def export_database(db_file, root=None, profile=None):
+    """DB 하나의 모든 데이터셋을 증분 내보내고 프롬프트 이력 스냅샷을 갱신합니다."""
+    _require_duckdb()
+    profile = profile or profile_for(db_file)
+    export_dir = export_dir_for(db_file, root)
+    os.makedirs(export_dir, exist_ok=True)
+    watermarks = _load_watermarks(export_dir)
+    con = duckdb.connect()
+    for name in DATASETS:
+        start = time.perf_counter()
+        try:
+            exported = export_dataset(db_file, export_dir, name, watermarks, con, profile)
+        except (pd.errors.DatabaseError, sqlite3.OperationalError) as e:
+            print(f"[Export] {db_file}:{name} 건너뜀 ({e})")
+            continue
+        print(f"[Export] {db_file}:{name} {exported:,} rows -> {os.path.join(export_dir, name)} "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    conn = get_connection(db_file, readonly=True)
+    for name, table in SNAPSHOT_TABLES.items():
+        try:
+            frame = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+        except (pd.errors.DatabaseError, sqlite3.OperationalError):
+            continue
+        _write_parquet(con, frame, os.path.join(export_dir, f"{name}.parquet"))
+
+
+def connect(export_dir):
+    """
+    내보낸 데이터셋을 뷰(trades, analyses, equity, prompts)로 등록한 DuckDB 연결을 반환합니다
+
+    아직 파일이 없는 데이터셋은 뷰를 만들지 않습니다.
+    """
+    _require_duckdb()
+    con = duckdb.connect()
+    for name in DATASETS:
+        dataset_dir = os.path.join(export_dir, name)
+        if _part_files(dataset_dir):
+            # 날짜 디렉터리(date=...)를 컬럼으로 읽고, 나중에 추가된 컬럼은 이름으로 맞춤
+            con.execute(
+                f"CREATE VIEW {name} AS SELECT * FROM read_parquet('{dataset_dir}/date=*/part-*.parquet', "
+                f"hive_partitioning = true, union_by_name = true)"
+            )
+    for name in SNAPSHOT_TABLES:
+        path = os.path.join(export_dir, f"{name}.parquet")
+        if os.path.exists(path):
+            con.execute(f"CREATE VIEW {name} AS SELECT * FROM read_parquet('{path}')")
+    return con
+
+
+def _has_view(con, name):
+    return con.execute("SELECT COUNT(*) FROM duckdb_views() WHERE view_name = ?", [name]).fetchone()[0] > 0
+
+
+def aggregate_trades(export_dir, by="day", since=None, con=None):
+    """
+    종료된 거래의 성과를 기준별로 집계합니다 (DuckDB, Parquet 직접 조회)
+
+    매개변수:
+        export_dir (str): 내보내기 디렉터리 (export_dir_for())
+        by (str): "day"(청산일), "direction", "leverage"(구간), "prompt"(진입 시점의 프롬프트 버전, 모의 거래만)
+        since (datetime, optional): 이 시간 이후에 청산된 거래만
+
+    반환값:
+        DataFrame: bucket, trades, wins, win_rate, pnl_sum, avg_pnl, max_pnl, min_pnl 컬럼
+            (내보낸 거래가 없으면 빈 DataFrame)
+    """
+    columns = ["bucket", "trades", "wins", "win_rate", "pnl_sum", "avg_pnl", "max_pnl", "min_pnl"]
+    con = con or connect(export_dir)
+    if not _has_view(con, "trades") or (by == "prompt" and not _has_view(con, "prompts")):
+        return pd.DataFrame(columns=columns)
+
+    group_expr, order_expr = GROUPINGS[by]
+    join = ""
+    if by == "prompt":
+        # 진입 시점에 사용 중이던 프롬프트 (종료 시간이 없으면 현재 사용 중)
+        join = ("JOIN prompts p ON t.timestamp_ms >= p.start_time_ms "
+                "AND (p.end_time_ms IS NULL OR t.timestamp_ms < p.end_time_ms)")
+    where = "WHERE t.exit_timestamp_ms >= ?" if since is not None else ""
+    params = [epoch_ms(since)] if since is not None else []
+    return con.execute(f'''
+    SELECT
+        {group_expr} AS bucket,
+        COUNT(*) AS trades,
+        COUNT(*) FILTER (WHERE t.profit_loss > 0) AS wins,
+        COUNT(*) FILTER (WHERE t.profit_loss > 0) * 100.0 / COUNT(*) AS win_rate,
+        SUM(t.profit_loss) AS pnl_sum,
+        AVG(t.profit_loss) AS avg_pnl,
+        MAX(t.profit_loss) AS max_pnl,
+        MIN(t.profit_loss) AS min_pnl
+    FROM trades t {join}
+    {where}
+    GROUP BY 1
+    ORDER BY {order_expr}
+    ''', params).df()
+
+
+def _benchmark(rows):
+    """합성 거래 rows건을 SQLite에 만들고 내보내기와 집계 속도를 pandas(SQLite 전체 조회) 방식과 비교합니다."""
+    import random
+    import shutil
+    import tempfile
+
+    from db import close_connections
+
+    work_dir = tempfile.mkdtemp()
+    db_file = os.path.join(work_dir, "mock_trading.db")
+    cursor = get_connection(db_file).cursor()
+    cursor.execute('''
+    CREATE TABLE mock_trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, timestamp_ms INTEGER, action TEXT, entry_price REAL,
+        amount REAL, leverage INTEGER, sl_price REAL, tp_price REAL, status TEXT, exit_price REAL,
+        exit_timestamp TEXT, exit_timestamp_ms INTEGER, profit_loss REAL
+    )''')
+    cursor.execute('''
+    CREATE TABLE prompt_history (id INTEGER PRIMARY KEY, content TEXT, start_time TEXT, end_time TEXT,
+                                 start_time_ms INTEGER, end_time_ms INTEGER)''')
+    start_ms = epoch_ms() - rows * 60_000
+    cursor.execute("BEGIN")
+    cursor.executemany(
+        "INSERT INTO mock_trades (timestamp_ms, action, entry_price, amount, leverage, sl_price, tp_price, status, "
+        "exit_price, exit_timestamp_ms, profit_loss) VALUES (?, ?, 60000, 0.01, ?, 59000, 62000, 'CLOSED', 60500, ?, ?)",
+        ((start_ms + i * 60_000, random.choice(("long", "short")), random.randint(1, 25), start_ms + i * 60_000 + 30_000,
+          random.uniform(-50, 50)) for i in range(rows))
+    )
+    versions = 20
+    step = rows * 60_000 // versions
+    cursor.executemany(
+        "INSERT INTO prompt_history (id, content, start_time_ms, end_time_ms) VALUES (?, 'prompt', ?, ?)",
+        [(v + 1, start_ms + v * step, start_ms + (v + 1) * step if v < versions - 1 else None) for v in range(versions)]
+    )
+    cursor.execute("COMMIT")
+
+    root = os.path.join(work_dir, "analytics")
+    start = time.perf_counter()
+    export_database(db_file, root)
+    print(f"Full export of {rows:,} trades: {time.perf_counter() - start:.1f}s")
+    now_ms = epoch_ms()
+    cursor.execute("BEGIN")
+    cursor.executemany(
+        "INSERT INTO mock_trades (timestamp_ms, action, leverage, status, exit_timestamp_ms, profit_loss) "
+        "VALUES (?, 'long', 5, 'CLOSED', ?, 10)",
+        [(now_ms + i, now_ms - CLOSE_SETTLE_MS - 1000 + i // 10) for i in range(1000)]  # 청산 시간이 같은 행 10개씩
+    )
+    cursor.execute("COMMIT")
+    start = time.perf_counter()
+    export_database(db_file, root)
+    print(f"Incremental export (1,000 new closes): {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    export_dir = export_dir_for(db_file, root)
+    con = connect(export_dir)
+    for by in GROUPINGS:
+        start = time.perf_counter()
+        result = aggregate_trades(export_dir, by, con=con)
+        duck_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        frame = pd.read_sql_query("SELECT * FROM mock_trades WHERE status = 'CLOSED'", get_connection(db_file))
+        if by == "day":
+            frame.groupby(pd.to_datetime(frame["exit_timestamp_ms"], unit="ms").dt.date)["profit_loss"].agg(["count", "sum"])
+        elif by == "prompt":
+            prompts = pd.read_sql_query("SELECT id, start_time_ms FROM prompt_history ORDER BY start_time_ms", get_connection(db_file))
+            frame = pd.merge_asof(frame.sort_values("timestamp_ms"), prompts, left_on="timestamp_ms", right_on="start_time_ms")
+            frame.groupby("id_y")["profit_loss"].agg(["count", "sum"])
+        else:
+            frame.groupby("action" if by == "direction" else "leverage")["profit_loss"].agg(["count", "sum"])
+        pandas_ms = (time.perf_counter() - start) * 1000
+        print(f"by {by:10} {len(result):>5} buckets | DuckDB/Parquet {duck_ms:7.1f} ms | pandas/SQLite {pandas_ms:7.1f} ms")
+
+    close_connections()
+    shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="종료된 거래, 분석, 평가 자산 샘플을 Parquet으로 증분 내보냅니다.")
+    parser.add_argument("--db", action="append", help="대상 DB 파일 (기본값: 존재하는 모든 봇 DB와 샤드)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), help="--db 파일의 저장소 프로필 (기본값: 파일 경로에서 찾음)")
+    parser.add_argument("--root", help="내보내기 디렉터리 (기본값: DB 파일 옆의 analytics)")
+    parser.add_argument("--bench", type=int, metavar="ROWS", help="합성 데이터로 내보내기/집계 속도 측정")
+    args = parser.parse_args()
+
+    _require_duckdb()
+    if args.bench:
+        _benchmark(args.bench)
+    else:
+        for db_file in args.db or list_all_shards():
+            export_database(db_file, args.root, args.profile)
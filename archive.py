@@ -0,0 +1,252 @@
+# archive.py
+"""
+오래된 분석/조정 기록 보관(archive) 및 압축
+--------------------------------------------------------
+기능:
+- 보관 기간이 지난 분석 기록과 포지션 조정 기록을 별도 보관 DB(<이름>_archive.db)로 이동
+- reasoning 같은 긴 텍스트는 zstd(없으면 zlib)로 압축한 BLOB으로 저장
+- 이동 후 운영 DB는 incremental vacuum으로 빈 페이지를 반환해 작게 유지
+- attach_archive(): 운영 DB와 보관 DB를 합친 임시 UNION 뷰(all_<테이블>)로 함께 조회 (읽기 전용 연결에서, 거래 이력과 프롬프트 버전 통계가 사용)
+- python archive.py [--days 90]: cron/systemd 타이머로 실행하는 보관 작업
+--------------------------------------------------------
+"""
+import argparse
+import os
+import sqlite3
+import time
+import zlib
+
+from db import get_connection, transaction
+from shards import list_all_shards, shard_info
+
+try:
+    import zstandard
+except ImportError:  # 선택 의존성: 없으면 표준 라이브러리 zlib 사용
+    zstandard = None
+
+RETENTION_DAYS = 90          # 운영 DB에 남겨둘 기간
+ARCHIVE_BATCH = 1000         # 한 번에 이동할 행 수
+VACUUM_PAGES = 2000          # 한 번에 반환할 최대 빈 페이지 수 (incremental vacuum)
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 9
+
+# 저장소 프로필 -> [(테이블, 텍스트 컬럼, 보관 대상 조건)] (샤드 파일도 shard_info()로 찾은 프로필 기준)
+# 열린 거래에 연결된 기록은 재분석/대시보드에서 쓰이므로 거래가 종료된 뒤에만 이동
+ARCHIVE_TABLES = {
+    "live": [
+        ("ai_analysis", "reasoning",
+         "timestamp_ms < :cutoff AND (trade_id IS NULL OR trade_id NOT IN (SELECT id FROM trades WHERE status = 'OPEN'))"),
+    ],
+    "mock": [
+        ("mock_ai_analysis", "reasoning",
+         "timestamp_ms < :cutoff AND (trade_id IS NULL OR trade_id NOT IN (SELECT id FROM mock_trades WHERE status = 'OPEN'))"),
+        ("trade_adjustments", "reasoning",
+         "timestamp_ms < :cutoff AND trade_id NOT IN (SELECT id FROM mock_trades WHERE status = 'OPEN')"),
+    ],
+}
+
+
+def archive_tables_for(db_file, profile=None):
+    """DB 파일(기본 파일 또는 샤드)의 보관 대상 테이블 목록 (profile을 주면 파일 이름 대신 그 프로필 기준)"""
+    if profile is None:
+        info = shard_info(db_file)
+        profile = info[0] if info else None
+    return ARCHIVE_TABLES.get(profile, [])
+
+
+def archive_path(db_file):
+    root, ext = os.path.splitext(db_file)
+    return f"{root}_archive{ext}"
+
+
+def compress_text(text):
+    """텍스트를 압축해 (BLOB, 코덱 이름)으로 반환합니다."""
+    if text is None:
+        return None, None
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), "zstd"
+    return zlib.compress(data, ZLIB_LEVEL), "zlib"
+
+
+def decompress_text(blob, codec):
+    """compress_text()로 압축한 BLOB을 텍스트로 되돌립니다. (SQL 함수로도 등록됨)"""
+    if blob is None:
+        return None
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd로 압축된 기록을 읽으려면 zstandard 패키지가 필요합니다.")
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(blob).decode("utf-8")
+    return blob  # 압축하지 않은 값
+
+
+def _columns(cursor, schema, table):
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [(row[1], row[2]) for row in cursor.fetchall()]
+
+
+def _ensure_archive_table(archive_cursor, hot_columns, table, text_column):
+    """운영 테이블과 같은 컬럼(+ 코덱 컬럼)의 보관 테이블을 만들고, 운영 쪽에 새로 생긴 컬럼과 trade_id 인덱스를 추가합니다."""
+    codec_column = f"{text_column}_codec"
+    existing = {name for name, _ in _columns(archive_cursor, "main", table)}
+    if not existing:
+        definitions = [
+            f"{name} {'BLOB' if name == text_column else col_type}" + (" PRIMARY KEY" if name == "id" else "")
+            for name, col_type in hot_columns
+        ]
+        archive_cursor.execute(f"CREATE TABLE {table} ({', '.join(definitions)}, {codec_column} TEXT)")
+    else:
+        for name, col_type in hot_columns:
+            if name not in existing:
+                archive_cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+    # all_<테이블> 뷰를 거래 ID로 조인할 때 보관 쪽도 인덱스로 찾도록
+    if any(name == "trade_id" for name, _ in hot_columns):
+        archive_cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_trade_id ON {table} (trade_id)")
+
+
+def archive_table(db_file, table, text_column, condition, cutoff_ms):
+    """
+    조건에 맞는 행을 보관 DB로 옮깁니다
+
+    보관 DB에 먼저 커밋한 뒤 운영 DB에서 삭제하므로, 중간에 종료되어도 행이 사라지지 않습니다.
+    (다시 실행하면 INSERT OR REPLACE로 같은 행을 덮어쓰고 삭제를 마저 진행)
+
+    반환값:
+        tuple: (이동한 행 수, 원본 텍스트 바이트, 압축 후 바이트)
+    """
+    hot_cursor = get_connection(db_file).cursor()
+    archive_file = archive_path(db_file)
+    hot_columns = _columns(hot_cursor, "main", table)
+    if not hot_columns:
+        return 0, 0, 0
+
+    with transaction(archive_file, label="archive") as archive_cursor:
+        _ensure_archive_table(archive_cursor, hot_columns, table, text_column)
+
+    names = [name for name, _ in hot_columns]
+    text_index = names.index(text_column)
+    insert_sql = (
+        f"INSERT OR REPLACE INTO {table} ({', '.join(names)}, {text_column}_codec) "
+        f"VALUES ({', '.join('?' for _ in names)}, ?)"
+    )
+    moved = raw_bytes = packed_bytes = 0
+    while True:
+        hot_cursor.execute(
+            f"SELECT {', '.join(names)} FROM {table} WHERE {condition} ORDER BY id LIMIT :limit",
+            {"cutoff": cutoff_ms, "limit": ARCHIVE_BATCH}
+        )
+        rows = hot_cursor.fetchall()
+        if not rows:
+            break
+
+        archived = []
+        for row in rows:
+            row = list(row)
+            text = row[text_index]
+            blob, codec = compress_text(text)
+            raw_bytes += len(text.encode("utf-8")) if text else 0
+            packed_bytes += len(blob) if blob else 0
+            row[text_index] = blob
+            archived.append((*row, codec))
+
+        with transaction(archive_file, label="archive") as archive_cursor:
+            archive_cursor.executemany(insert_sql, archived)
+        ids = [row[0] for row in rows]
+        with transaction(db_file, label="archive") as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join('?' for _ in ids)})", ids)
+        moved += len(rows)
+    return moved, raw_bytes, packed_bytes
+
+
+def incremental_vacuum(db_file, pages=VACUUM_PAGES):
+    """
+    빈 페이지를 파일에서 반환합니다
+
+    auto_vacuum이 INCREMENTAL이 아니면 설정 후 한 번만 전체 VACUUM을 실행합니다. (기존 DB 전환)
+
+    반환값:
+        int: 반환된 페이지 수
+    """
+    cursor = get_connection(db_file).cursor()
+    before = cursor.execute("PRAGMA page_count").fetchone()[0]
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("VACUUM")
+    else:
+        cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+    return before - cursor.execute("PRAGMA page_count").fetchone()[0]
+
+
+def run_archive(db_file, retention_days=RETENTION_DAYS):
+    """DB 하나의 보관 대상 테이블을 모두 이동하고 incremental vacuum을 실행합니다."""
+    cutoff_ms = int((time.time() - retention_days * 86400) * 1000)
+    for table, text_column, condition in archive_tables_for(db_file):
+        start = time.perf_counter()
+        moved, raw_bytes, packed_bytes = archive_table(db_file, table, text_column, condition, cutoff_ms)
+        ratio = (packed_bytes / raw_bytes * 100) if raw_bytes else 0
+        print(f"[Archive] {db_file}:{table} {moved:,} rows -> {archive_path(db_file)} "
+              f"({raw_bytes:,} -> {packed_bytes:,} bytes, {ratio:.0f}%) in {time.perf_counter() - start:.1f}s")
+    freed = incremental_vacuum(db_file)
+    print(f"[Archive] {db_file}: {freed:,} pages returned to the filesystem")
+
+
+def attach_archive(conn, db_file, profile=None):
+    """
+    연결에 보관 DB를 붙이고 운영+보관 행을 합친 임시 뷰(all_<테이블>)를 만듭니다
+
+    보관 DB가 없으면 운영 테이블만 보는 뷰를 만들기 때문에 호출하는 쪽은 항상 all_<테이블>을 조회하면 됩니다.
+    텍스트 컬럼은 뷰에서 압축이 풀린 상태로 보입니다. 뷰는 연결마다 한 번 만들고, 보관 DB나 컬럼이
+    새로 생겼을 때만 다시 만들므로 조회할 때마다 호출해도 됩니다.
+
+    읽기 전용 연결에 붙이세요. 쓰기 연결에 붙이면 그 연결의 모든 쓰기 트랜잭션이 보관 DB까지 잠가
+    보관 작업과 서로 기다리게 됩니다.
+
+    매개변수:
+        conn (sqlite3.Connection): 운영 DB의 읽기 전용 연결 (get_connection(db_file, readonly=True))
+        db_file (str): 운영 DB 파일 경로
+        profile (str, optional): 저장소 프로필 ("live"/"mock", 기본값: 파일 이름으로 판단)
+    """
+    conn.create_function("decompress_text", 2, decompress_text, deterministic=True)
+    archive_file = archive_path(db_file)
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    has_archive = "archive" in attached or os.path.exists(archive_file)
+    if has_archive and "archive" not in attached:
+        # 연결이 읽기 전용이면 붙인 DB도 읽기 전용으로 열림
+        conn.execute("ATTACH DATABASE ? AS archive", (os.path.abspath(archive_file),))
+
+    cursor = conn.cursor()
+    for table, text_column, _ in archive_tables_for(db_file, profile):
+        names = [name for name, _ in _columns(cursor, "main", table)]
+        if not names:
+            continue
+        select_hot = f"SELECT {', '.join(names)} FROM main.{table}"
+        union = ""
+        if has_archive and _columns(cursor, "archive", table):
+            archived = [
+                f"decompress_text({name}, {text_column}_codec) AS {name}" if name == text_column else name
+                for name in names
+            ]
+            union = f" UNION ALL SELECT {', '.join(archived)} FROM archive.{table}"
+        body = f"{select_hot}{union}"
+        current = cursor.execute(
+            "SELECT sql FROM temp.sqlite_master WHERE type = 'view' AND name = ?", (f"all_{table}",)
+        ).fetchone()
+        if current and current[0].split(" AS ", 1)[-1] == body:
+            continue  # 이미 같은 정의의 뷰가 있음
+        cursor.execute(f"DROP VIEW IF EXISTS temp.all_{table}")
+        cursor.execute(f"CREATE TEMP VIEW all_{table} AS {body}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="보관 기간이 지난 분석/조정 기록을 보관 DB로 이동합니다.")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="운영 DB에 남겨둘 기간 (일)")
+    parser.add_argument("--db", action="append", help="대상 DB 파일 (기본값: 존재하는 모든 봇 DB와 샤드)")
+    args = parser.parse_args()
+
+    print(f"Compression codec: {'zstd' if zstandard is not None else 'zlib (zstandard not installed)'}")
+    for db_file in args.db or list_all_shards():
+        try:
+            run_archive(db_file, args.days)
+        except sqlite3.OperationalError as e:
+            print(f"[Archive] {db_file} 보관 실패: {e}")
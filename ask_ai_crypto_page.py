@@ -5,6 +5,7 @@ import pandas_ta as ta
 import json
 from openai import OpenAI
 from ask_ai_crypto_prompt import ASK_AI_CRYPTO_PROMPT
+from model_router import route_completion
 
 # --- 설정 ---
 client = OpenAI()
@@ -77,15 +78,16 @@ def get_ai_advice(data):
         "indicators": indicators
     }
     
-    response = client.chat.completions.create(
-        model="gpt-4o",
+    content, _ = route_completion(
+        client,
+        "ask_ai",
         messages=[
             {"role": "system", "content": ASK_AI_CRYPTO_PROMPT},
             {"role": "user", "content": json.dumps(prompt_data, indent=2)}
         ],
         response_format={"type": "json_object"}
     )
-    return json.loads(response.choices[0].message.content)
+    return json.loads(content)
 
 # --- UI 렌더링 함수 ---
 def render_ask_ai_page():
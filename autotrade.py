@@ -16,19 +16,32 @@ import os  # 환경 변수 및 파일 시스템 접근
 import math  # 수학 연산
 import time  # 시간 지연 및 타임스탬프
 import pandas as pd  # 데이터 분석 및 조작
-import requests  # HTTP 요청
 import json  # JSON 데이터 처리
 import sqlite3  # 로컬 데이터베이스
 from dotenv import load_dotenv  # 환경 변수 로드
 load_dotenv()  # .env 파일에서 환경 변수 로드
 from openai import OpenAI  # OpenAI API 접근
 from datetime import datetime  # 날짜 및 시간 처리
+from concurrent.futures import ThreadPoolExecutor  # 주문 준비 작업 병렬 실행
+from model_router import route_request, print_router_stats  # 호출 지점별 모델 라우팅
+from llm_stream import stream_completion  # 응답 스트리밍 및 필드 점진 파싱
+from market_filter import evaluate_entry_gate, setup_gate_table, record_gate_result, print_gate_stats  # LLM 호출 전 사전 필터
+from decision_memo import market_fingerprint, lookup_decision, store_decision, print_memo_stats  # 시장 상태 변화 없을 때 판단 재사용
+from news_sentiment import get_news_sentiment  # 로컬 헤드라인 감성 점수 요약
+from db import get_connection, print_transaction_stats  # 스레드별 재사용 SQLite 연결 (WAL), 트랜잭션 묶음
+from write_behind import print_write_behind_stats  # 거래와 무관한 기록은 백그라운드에서 커밋
+from equity import start_equity_sampler, EQUITY_SAMPLE_INTERVAL  # 평가 자산 시계열 샘플링
+from migrations import run_migrations, TRADING_MIGRATIONS  # 스키마 버전 관리 및 인덱스
+from storage import TradingStore, TradeRecord, AnalysisRecord  # 거래/분석 기록 공용 저장소
+from position_state import PositionState  # 열린 포지션 메모리 상태 (루프 반복 조회 제거)
+from shards import shard_file  # 전략(봇)별 DB 샤드
+from performance_aggregates import get_overall_metrics, get_scope_metrics, get_recent_days_metrics  # 증분 성과 집계
 
 # ===== 설정 및 초기화 =====
 # 바이낸스 API 설정
 api_key = os.getenv("BINANCE_API_KEY")  # 바이낸스 API 키
 secret = os.getenv("BINANCE_SECRET_KEY")  # 바이낸스 시크릿 키
-exchange = ccxt.binance({
+exchange_config = {
     'apiKey': api_key,
     'secret': secret,
     'enableRateLimit': True,  # API 호출 제한 준수
@@ -36,17 +49,32 @@ exchange = ccxt.binance({
         'defaultType': 'future',  # 선물 거래 설정
         'adjustForTimeDifference': True  # 시간대 차이 조정
     }
-})
+}
+exchange = ccxt.binance(exchange_config)
+# 자산 시계열 샘플러 스레드 전용 클라이언트 (ccxt 클라이언트는 스레드 간 공유에 안전하지 않음)
+sampler_exchange = ccxt.binance(exchange_config)
 symbol = "BTC/USDT"  # 거래 페어 설정
 
 # OpenAI API 클라이언트 초기화
 client = OpenAI()
 
-# SERP API 설정 (뉴스 데이터 수집용)
-serp_api_key = os.getenv("SERP_API_KEY")  # 서프 API 키
-
 # SQLite 데이터베이스 설정
-DB_FILE = "bitcoin_trading.db"  # 데이터베이스 파일명
+DB_FILE = shard_file("live")  # 데이터베이스 파일 (BOT_SHARD 환경 변수가 있으면 전략별 샤드, 없으면 bitcoin_trading.db)
+store = TradingStore("live", DB_FILE)  # 거래/분석 기록 저장소 (mocktrade, 대시보드와 공용)
+position_state = PositionState(store)  # 열린 포지션/최근 분석 메모리 상태 (DB write-through)
+
+# 응답 스트리밍 중 주문 준비 작업(잔고 조회)을 실행할 스레드 풀
+# 레버리지 같은 계정 설정은 바꾸지 않음 (응답이 중간에 버려져도 계정 상태가 그대로 남도록)
+pretrade_executor = ThreadPoolExecutor(max_workers=1)
+
+# reasoning보다 먼저 완성되어야 주문 준비를 시작할 수 있는 필드
+DECISION_FIELDS = (
+    "direction",
+    "recommended_position_size",
+    "recommended_leverage",
+    "stop_loss_percentage",
+    "take_profit_percentage"
+)
 
 # ===== 데이터베이스 관련 함수 =====
 def setup_database():
@@ -57,7 +85,7 @@ def setup_database():
     - trades: 모든 거래 정보 (진입가, 청산가, 손익 등)
     - ai_analysis: AI의 분석 결과 및 추천 사항
     """
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection(DB_FILE)
     cursor = conn.cursor()
     
     # 거래 기록 테이블
@@ -100,56 +128,70 @@ def setup_database():
     )
     ''')
     
-    conn.commit()
-    conn.close()
     print("데이터베이스 설정 완료")
 
-def save_ai_analysis(analysis_data, trade_id=None):
+def build_analysis_record(analysis_data, trade_id=None):
     """
-    AI 분석 결과를 데이터베이스에 저장
+    AI 분석 결과 dict를 저장용 레코드로 변환합니다
     
     매개변수:
         analysis_data (dict): AI 분석 결과 데이터
         trade_id (int, optional): 연결된 거래 ID
         
     반환값:
-        int: 생성된 분석 기록의 ID
+        AnalysisRecord: 저장할 분석 레코드
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    return AnalysisRecord(
+        current_price=analysis_data.get('current_price', 0),  # 현재 가격
+        direction=analysis_data.get('direction', 'NO_POSITION'),  # 추천 방향
+        recommended_position_size=analysis_data.get('recommended_position_size', 0),  # 추천 포지션 크기
+        recommended_leverage=analysis_data.get('recommended_leverage', 0),  # 추천 레버리지
+        stop_loss_percentage=analysis_data.get('stop_loss_percentage', 0),  # 스탑로스 비율
+        take_profit_percentage=analysis_data.get('take_profit_percentage', 0),  # 테이크프로핏 비율
+        reasoning=analysis_data.get('reasoning', ''),  # 분석 근거
+        trade_id=trade_id  # 연결된 거래 ID
+    )
+
+def save_ai_analysis(analysis_data, trade_id=None, background=False):
+    """
+    AI 분석 결과를 데이터베이스에 저장하고 최근 분석 상태를 갱신
     
-    cursor.execute('''
-    INSERT INTO ai_analysis (
-        timestamp, 
-        current_price, 
-        direction, 
-        recommended_position_size, 
-        recommended_leverage, 
-        stop_loss_percentage, 
-        take_profit_percentage, 
-        reasoning,
-        trade_id
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        datetime.now().isoformat(),  # 현재 시간
-        analysis_data.get('current_price', 0),  # 현재 가격
-        analysis_data.get('direction', 'NO_POSITION'),  # 추천 방향
-        analysis_data.get('recommended_position_size', 0),  # 추천 포지션 크기
-        analysis_data.get('recommended_leverage', 0),  # 추천 레버리지
-        analysis_data.get('stop_loss_percentage', 0),  # 스탑로스 비율
-        analysis_data.get('take_profit_percentage', 0),  # 테이크프로핏 비율
-        analysis_data.get('reasoning', ''),  # 분석 근거
-        trade_id  # 연결된 거래 ID
-    ))
+    매개변수:
+        analysis_data (dict): AI 분석 결과 데이터
+        trade_id (int, optional): 연결된 거래 ID
+        background (bool): True면 백그라운드 기록 큐에 넣고 바로 반환 (거래와 연결되지 않은 분석용)
+        
+    반환값:
+        int: 생성된 분석 기록의 ID (background=True면 None)
+    """
+    return position_state.record_analysis(build_analysis_record(analysis_data, trade_id), background=background)
+
+def build_trade_record(trade_data):
+    """
+    거래 정보 dict를 저장용 레코드로 변환합니다
     
-    analysis_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return analysis_id
+    매개변수:
+        trade_data (dict): 거래 정보 데이터
+        
+    반환값:
+        TradeRecord: 저장할 거래 레코드
+    """
+    return TradeRecord(
+        action=trade_data.get('action', ''),  # 포지션 방향
+        entry_price=trade_data.get('entry_price', 0),  # 진입 가격
+        amount=trade_data.get('amount', 0),  # 거래량
+        leverage=trade_data.get('leverage', 0),  # 레버리지
+        sl_price=trade_data.get('sl_price', 0),  # 스탑로스 가격
+        tp_price=trade_data.get('tp_price', 0),  # 테이크프로핏 가격
+        sl_percentage=trade_data.get('sl_percentage', 0),  # 스탑로스 비율
+        tp_percentage=trade_data.get('tp_percentage', 0),  # 테이크프로핏 비율
+        position_size_percentage=trade_data.get('position_size_percentage', 0),  # 자본 대비 포지션 크기
+        investment_amount=trade_data.get('investment_amount', 0)  # 투자 금액
+    )
 
 def save_trade(trade_data):
     """
-    거래 정보를 데이터베이스에 저장
+    거래 정보를 데이터베이스에 저장하고 열린 포지션 상태로 기록
     
     매개변수:
         trade_data (dict): 거래 정보 데이터
@@ -157,41 +199,7 @@ def save_trade(trade_data):
     반환값:
         int: 생성된 거래 기록의 ID
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    INSERT INTO trades (
-        timestamp,
-        action,
-        entry_price,
-        amount,
-        leverage,
-        sl_price,
-        tp_price,
-        sl_percentage,
-        tp_percentage,
-        position_size_percentage,
-        investment_amount
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        datetime.now().isoformat(),  # 진입 시간
-        trade_data.get('action', ''),  # 포지션 방향
-        trade_data.get('entry_price', 0),  # 진입 가격
-        trade_data.get('amount', 0),  # 거래량
-        trade_data.get('leverage', 0),  # 레버리지
-        trade_data.get('sl_price', 0),  # 스탑로스 가격
-        trade_data.get('tp_price', 0),  # 테이크프로핏 가격
-        trade_data.get('sl_percentage', 0),  # 스탑로스 비율
-        trade_data.get('tp_percentage', 0),  # 테이크프로핏 비율
-        trade_data.get('position_size_percentage', 0),  # 자본 대비 포지션 크기
-        trade_data.get('investment_amount', 0)  # 투자 금액
-    ))
-    
-    trade_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return trade_id
+    return position_state.open_position(build_trade_record(trade_data))
 
 def update_trade_status(trade_id, status, exit_price=None, exit_timestamp=None, profit_loss=None, profit_loss_percentage=None):
     """
@@ -205,109 +213,49 @@ def update_trade_status(trade_id, status, exit_price=None, exit_timestamp=None,
         profit_loss (float, optional): 손익 금액
         profit_loss_percentage (float, optional): 손익 비율
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # 동적으로 SQL 업데이트 쿼리 구성
-    update_fields = ["status = ?"]
-    update_values = [status]
-    
-    # 제공된 필드만 업데이트에 포함
-    if exit_price is not None:
-        update_fields.append("exit_price = ?")
-        update_values.append(exit_price)
-    
-    if exit_timestamp is not None:
-        update_fields.append("exit_timestamp = ?")
-        update_values.append(exit_timestamp)
-    
-    if profit_loss is not None:
-        update_fields.append("profit_loss = ?")
-        update_values.append(profit_loss)
-    
-    if profit_loss_percentage is not None:
-        update_fields.append("profit_loss_percentage = ?")
-        update_values.append(profit_loss_percentage)
-    
-    update_sql = f"UPDATE trades SET {', '.join(update_fields)} WHERE id = ?"
-    update_values.append(trade_id)
-    
-    cursor.execute(update_sql, update_values)
-    conn.commit()
-    conn.close()
+    if status == 'CLOSED':
+        # 상태 변경과 성과 집계 갱신을 하나의 트랜잭션으로 처리한 뒤 열린 포지션 상태 갱신
+        position_state.close_position(trade_id, exit_price, profit_loss, profit_loss_percentage, exit_timestamp)
+    else:
+        store.update_trade_status(
+            trade_id,
+            status,
+            exit_price=exit_price,
+            exit_timestamp=exit_timestamp,
+            profit_loss=profit_loss,
+            profit_loss_percentage=profit_loss_percentage
+        )
+        position_state.load()
 
 def get_latest_open_trade():
     """
-    가장 최근의 열린 거래 정보를 가져옵니다
+    가장 최근의 열린 거래 정보를 가져옵니다 (DB 조회 없이 메모리 상태에서 반환)
     
     반환값:
         dict: 거래 정보 또는 None (열린 거래가 없는 경우)
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT id, action, entry_price, amount, leverage, sl_price, tp_price
-    FROM trades
-    WHERE status = 'OPEN'
-    ORDER BY timestamp DESC  -- 가장 최근 거래 먼저
-    LIMIT 1
-    ''')
-    
-    result = cursor.fetchone()
-    conn.close()
-    
-    # 결과가 있을 경우 사전 형태로 변환하여 반환
-    if result:
-        return {
-            'id': result[0],
-            'action': result[1],
-            'entry_price': result[2],
-            'amount': result[3],
-            'leverage': result[4],
-            'sl_price': result[5],
-            'tp_price': result[6]
-        }
-    return None  # 열린 거래가 없음
+    return position_state.open_trade
 
 def get_trade_summary(days=7):
     """
     지정된 일수 동안의 거래 요약 정보를 가져옵니다
     
+    거래 테이블을 스캔하지 않고 청산일별 누적 집계(performance_aggregates)를 합산합니다.
+    
     매개변수:
-        days (int): 요약할 기간(일)
+        days (int): 요약할 기간(일, 청산일 기준)
         
     반환값:
-        dict: 거래 요약 정보 또는 None
+        dict: 거래 요약 정보
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT 
-        COUNT(*) as total_trades,                            -- 총 거래 수
-        SUM(CASE WHEN profit_loss > 0 THEN 1 ELSE 0 END) as winning_trades,  -- 이익 거래 수
-        SUM(CASE WHEN profit_loss < 0 THEN 1 ELSE 0 END) as losing_trades,   -- 손실 거래 수
-        SUM(profit_loss) as total_profit_loss,               -- 총 손익
-        AVG(profit_loss_percentage) as avg_profit_loss_percentage  -- 평균 손익률
-    FROM trades
-    WHERE exit_timestamp IS NOT NULL  -- 청산된 거래만
-    AND timestamp >= datetime('now', ?)  -- 지정된 일수 내 거래만
-    ''', (f'-{days} days',))
-    
-    result = cursor.fetchone()
-    conn.close()
-    
-    # 결과가 있을 경우 사전 형태로 변환하여 반환
-    if result:
-        return {
-            'total_trades': result[0] or 0,
-            'winning_trades': result[1] or 0,
-            'losing_trades': result[2] or 0,
-            'total_profit_loss': result[3] or 0,
-            'avg_profit_loss_percentage': result[4] or 0
-        }
-    return None
+    summary = get_recent_days_metrics(DB_FILE, days)
+    return {
+        'total_trades': summary['total_trades'],
+        'winning_trades': summary['winning_trades'],
+        'losing_trades': summary['losing_trades'],
+        'total_profit_loss': summary['total_profit_loss'],
+        'avg_profit_loss_percentage': summary['avg_profit_loss_percentage']
+    }
 
 def get_historical_trading_data(limit=10):
     """
@@ -319,147 +267,72 @@ def get_historical_trading_data(limit=10):
     반환값:
         list: 거래 및 분석 데이터 사전 목록
     """
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row  # 컬럼명으로 결과에 접근 가능하게 설정
-    cursor = conn.cursor()
-    
-    # 완료된 거래 내역과 관련 AI 분석 함께 조회 (LEFT JOIN 사용)
-    cursor.execute('''
-    SELECT 
-        t.id as trade_id,
-        t.timestamp as trade_timestamp,
-        t.action,
-        t.entry_price,
-        t.exit_price,
-        t.amount,
-        t.leverage,
-        t.sl_price,
-        t.tp_price,
-        t.sl_percentage,
-        t.tp_percentage,
-        t.position_size_percentage,
-        t.status,
-        t.profit_loss,
-        t.profit_loss_percentage,
-        a.id as analysis_id,
-        a.reasoning,
-        a.direction,
-        a.recommended_leverage,
-        a.recommended_position_size,
-        a.stop_loss_percentage,
-        a.take_profit_percentage
-    FROM 
-        trades t
-    LEFT JOIN 
-        ai_analysis a ON t.id = a.trade_id
-    WHERE 
-        t.status = 'CLOSED'  -- 완료된 거래만
-    ORDER BY 
-        t.timestamp DESC  -- 최신 거래 먼저
-    LIMIT ?
-    ''', (limit,))
-    
-    results = cursor.fetchall()
-    
-    # 결과를 사전 목록으로 변환
+    # 완료된 거래 내역과 그 거래를 연 AI 분석 (최신 거래 먼저)
     historical_data = []
-    for row in results:
-        historical_data.append({k: row[k] for k in row.keys()})
+    for trade, analysis in store.get_trade_history(limit):
+        analysis = analysis or AnalysisRecord()
+        historical_data.append({
+            'trade_id': trade.id,
+            'trade_timestamp': trade.timestamp,
+            'action': trade.action,
+            'entry_price': trade.entry_price,
+            'exit_price': trade.exit_price,
+            'amount': trade.amount,
+            'leverage': trade.leverage,
+            'sl_price': trade.sl_price,
+            'tp_price': trade.tp_price,
+            'sl_percentage': trade.sl_percentage,
+            'tp_percentage': trade.tp_percentage,
+            'position_size_percentage': trade.position_size_percentage,
+            'status': trade.status,
+            'profit_loss': trade.profit_loss,
+            'profit_loss_percentage': trade.profit_loss_percentage,
+            'analysis_id': analysis.id,
+            'reasoning': analysis.reasoning,
+            'direction': analysis.direction,
+            'recommended_leverage': analysis.recommended_leverage,
+            'recommended_position_size': analysis.recommended_position_size,
+            'stop_loss_percentage': analysis.stop_loss_percentage,
+            'take_profit_percentage': analysis.take_profit_percentage
+        })
     
-    conn.close()
     return historical_data
 
 def get_performance_metrics():
     """
     거래 성과 메트릭스를 계산합니다
     
-    이 함수는 다음을 포함한 전체 및 방향별(롱/숏) 성과 지표를 계산합니다:
+    이 함수는 다음을 포함한 전체, 방향별(롱/숏), 레버리지 구간별 성과 지표를 계산합니다:
     - 총 거래 수
     - 승률
-    - 평균 수익률
+    - 평균 수익률 및 표준편차, 샤프 유사 비율
     - 최대 이익/손실
     - 방향별 성과
+    - 레버리지 구간별 성과
+    
+    거래를 종료할 때 갱신되는 누적 집계(performance_aggregates)에서 읽으므로
+    거래 이력이 길어져도 비용이 늘지 않습니다.
     
     반환값:
         dict: 성과 메트릭스 데이터
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # 전체 거래 성과 쿼리
-    cursor.execute('''
-    SELECT 
-        COUNT(*) as total_trades,
-        SUM(CASE WHEN profit_loss > 0 THEN 1 ELSE 0 END) as winning_trades,
-        SUM(CASE WHEN profit_loss < 0 THEN 1 ELSE 0 END) as losing_trades,
-        SUM(profit_loss) as total_profit_loss,
-        AVG(profit_loss_percentage) as avg_profit_loss_percentage,
-        MAX(profit_loss_percentage) as max_profit_percentage,
-        MIN(profit_loss_percentage) as max_loss_percentage,
-        AVG(CASE WHEN profit_loss > 0 THEN profit_loss_percentage ELSE NULL END) as avg_win_percentage,
-        AVG(CASE WHEN profit_loss < 0 THEN profit_loss_percentage ELSE NULL END) as avg_loss_percentage
-    FROM trades
-    WHERE status = 'CLOSED'
-    ''')
-    
-    overall_metrics = cursor.fetchone()
-    
-    # 방향별(롱/숏) 성과 쿼리
-    cursor.execute('''
-    SELECT 
-        action,
-        COUNT(*) as total_trades,
-        SUM(CASE WHEN profit_loss > 0 THEN 1 ELSE 0 END) as winning_trades,
-        SUM(CASE WHEN profit_loss < 0 THEN 1 ELSE 0 END) as losing_trades,
-        SUM(profit_loss) as total_profit_loss,
-        AVG(profit_loss_percentage) as avg_profit_loss_percentage
-    FROM trades
-    WHERE status = 'CLOSED'
-    GROUP BY action
-    ''')
-    
-    directional_metrics = cursor.fetchall()
-    
-    conn.close()
+    summary_keys = ("total_trades", "winning_trades", "losing_trades", "total_profit_loss",
+                    "avg_profit_loss_percentage", "win_rate")
     
     # 결과 구성
     metrics = {
-        "overall": {
-            "total_trades": overall_metrics[0] or 0,
-            "winning_trades": overall_metrics[1] or 0,
-            "losing_trades": overall_metrics[2] or 0,
-            "total_profit_loss": overall_metrics[3] or 0,
-            "avg_profit_loss_percentage": overall_metrics[4] or 0,
-            "max_profit_percentage": overall_metrics[5] or 0,
-            "max_loss_percentage": overall_metrics[6] or 0,
-            "avg_win_percentage": overall_metrics[7] or 0,
-            "avg_loss_percentage": overall_metrics[8] or 0
-        },
-        "directional": {}
+        "overall": get_overall_metrics(DB_FILE),
+        "directional": {},
+        "leverage": {}
     }
     
-    # 승률 계산
-    if metrics["overall"]["total_trades"] > 0:
-        metrics["overall"]["win_rate"] = (metrics["overall"]["winning_trades"] / metrics["overall"]["total_trades"]) * 100
-    else:
-        metrics["overall"]["win_rate"] = 0
+    # 방향별 메트릭스 추가 ('long' 또는 'short')
+    for action, direction_metrics in get_scope_metrics(DB_FILE, "direction").items():
+        metrics["directional"][action] = {k: direction_metrics[k] for k in summary_keys}
     
-    # 방향별 메트릭스 추가
-    for row in directional_metrics:
-        action = row[0]  # 'long' 또는 'short'
-        total = row[1] or 0
-        winning = row[2] or 0
-        
-        direction_metrics = {
-            "total_trades": total,
-            "winning_trades": winning,
-            "losing_trades": row[3] or 0,
-            "total_profit_loss": row[4] or 0,
-            "avg_profit_loss_percentage": row[5] or 0,
-            "win_rate": (winning / total * 100) if total > 0 else 0
-        }
-        
-        metrics["directional"][action] = direction_metrics
+    # 레버리지 구간별 메트릭스 추가 (어떤 레버리지 설정이 좋은 성과를 냈는지 판단용)
+    for bucket, leverage_metrics in get_scope_metrics(DB_FILE, "leverage").items():
+        metrics["leverage"][bucket] = {k: leverage_metrics[k] for k in summary_keys}
     
     return metrics
 
@@ -512,51 +385,76 @@ def fetch_multi_timeframe_data():
     
     return multi_tf_data
 
-def fetch_bitcoin_news():
+def fetch_news_sentiment():
     """
-    비트코인 관련 최신 뉴스를 가져옵니다
+    비트코인 관련 최신 뉴스의 감성 요약을 가져옵니다
     
-    SERP API를 사용해 Google 뉴스에서 비트코인 관련 최신 뉴스 10개를 가져옵니다.
+    통합 뉴스 모듈(news_provider)의 공유 TTL 캐시에서 헤드라인을 가져오고,
+    로컬 사전 기반 점수(news_sentiment)로 채점해 요약만 반환합니다.
+    헤드라인별 점수는 캐시 DB에 저장되어 새 헤드라인만 채점됩니다.
     
     반환값:
-        list: 최신 뉴스 기사 정보 (제목과 날짜만 포함)
+        dict: 평균 점수, 추세, 헤드라인 수, 강세/약세 개수, 영향 큰 헤드라인
     """
     try:
-        # SERP API 요청 설정
-        url = "https://serpapi.com/search.json"
-        params = {
-            "engine": "google_news",  # Google 뉴스 검색
-            "q": "bitcoin",           # 검색어: 비트코인
-            "gl": "us",               # 국가: 미국
-            "hl": "en",               # 언어: 영어
-            "api_key": serp_api_key   # API 키
-        }
+        summary = get_news_sentiment()
+        print(f"News sentiment: {summary['score']:+.3f} over {summary['headline_count']} headlines (trend: {summary['trend']})")
+        return summary
+    except Exception as e:
+        print(f"Error fetching news sentiment: {e}")
+        return {"score": 0.0, "trend": None, "headline_count": 0, "bullish": 0, "bearish": 0, "top_movers": []}
+
+# ===== 주문 준비 함수 =====
+def is_valid_entry_decision(fields):
+    """
+    스트리밍 중 완성된 필드가 진입 주문에 사용할 수 있는 값인지 확인합니다
+    
+    매개변수:
+        fields (dict): 완성된 응답 필드
         
-        # API 요청 보내기
-        response = requests.get(url, params=params)
+    반환값:
+        bool: LONG/SHORT 방향이고 수치 필드가 모두 허용 범위이면 True
+    """
+    try:
+        leverage = fields["recommended_leverage"]
+        return (
+            str(fields["direction"]).upper() in ("LONG", "SHORT")
+            and 0 < float(fields["recommended_position_size"]) <= 1
+            and isinstance(leverage, int) and 1 <= leverage <= 20
+            and 0 < float(fields["stop_loss_percentage"]) < 1
+            and 0 < float(fields["take_profit_percentage"]) < 1
+        )
+    except (KeyError, TypeError, ValueError):
+        return False
+
+def start_pretrade(fields):
+    """
+    reasoning 수신을 기다리지 않고 잔고 조회를 미리 시작합니다 (읽기 전용 작업만 수행)
+    
+    매개변수:
+        fields (dict): 스트리밍 중 완성된 응답 필드
         
-        # 응답 확인 및 처리
-        if response.status_code == 200:
-            data = response.json()
-            news_results = data.get("news_results", [])
-            
-            # 최신 뉴스 10개만 추출하고 제목과 날짜만 포함
-            recent_news = []
-            for i, news in enumerate(news_results[:10]):
-                news_item = {
-                    "title": news.get("title", ""),
-                    "date": news.get("date", "")
-                }
-                recent_news.append(news_item)
-            
-            print(f"Collected {len(recent_news)} recent news articles (title and date only)")
-            return recent_news
-        else:
-            print(f"Error fetching news: Status code {response.status_code}")
-            return []
-    except Exception as e:
-        print(f"Error fetching news: {e}")
-        return []
+    반환값:
+        dict: 'balance' (Future) 또는 빈 dict (진입 신호가 아닌 경우)
+    """
+    if not is_valid_entry_decision(fields):
+        return {}
+    print(f"조기 파싱: {fields['direction']} {fields['recommended_leverage']}x - 잔고 조회 시작")
+    return {"balance": pretrade_executor.submit(exchange.fetch_balance)}
+
+def sample_equity():
+    """
+    선물 계정의 평가 자산과 미실현 손익을 조회합니다 (자산 시계열 샘플러에서 호출)
+    
+    반환값:
+        dict: equity(지갑 잔고 + 미실현 손익), unrealized_pnl, price
+    """
+    balance = sampler_exchange.fetch_balance()
+    info = balance.get('info', {})
+    unrealized_pnl = float(info.get('totalUnrealizedProfit') or 0)
+    equity = float(info.get('totalMarginBalance') or balance['USDT']['total'])
+    price = sampler_exchange.fetch_ticker(symbol)['last']
+    return {"equity": equity, "unrealized_pnl": unrealized_pnl, "price": price}
 
 # ===== 포지션 관리 함수 =====
 def handle_position_closure(current_price, side, amount, current_trade_id=None):
@@ -569,15 +467,12 @@ def handle_position_closure(current_price, side, amount, current_trade_id=None):
         amount (float): 포지션 수량
         current_trade_id (int, optional): 현재 거래 ID
     """
-    # 거래 ID가 제공되지 않은 경우 최신 열린 거래 정보 조회
-    if current_trade_id is None:
-        latest_trade = get_latest_open_trade()
-        if latest_trade:
-            current_trade_id = latest_trade['id']
+    # 가장 최근의 열린 거래 (거래 ID가 제공되지 않은 경우 이 거래를 종료)
+    latest_trade = get_latest_open_trade()
+    if current_trade_id is None and latest_trade:
+        current_trade_id = latest_trade['id']
     
     if current_trade_id:
-        # 가장 최근의 열린 거래 가져오기
-        latest_trade = get_latest_open_trade()
         if latest_trade:
             entry_price = latest_trade['entry_price']
             action = latest_trade['action']
@@ -632,10 +527,15 @@ print("Multi Timeframe Analysis: 15m, 1h, 4h")
 print("News Sentiment Analysis: Enabled")
 print("Historical Performance Learning: Enabled")
 print("Database Logging: Enabled")
+print(f"Equity Sampling: every {EQUITY_SAMPLE_INTERVAL}s")
 print("===================================\n")
 
 # 데이터베이스 설정
 setup_database()
+run_migrations(DB_FILE, TRADING_MIGRATIONS)
+setup_gate_table(DB_FILE)
+position_state.load()  # 열린 포지션/최근 분석을 한 번 읽고 이후 루프는 메모리에서 조회
+start_equity_sampler(DB_FILE, sample_equity)
 
 # ===== 메인 트레이딩 루프 =====
 while True:
@@ -728,8 +628,24 @@ while True:
             # 멀티 타임프레임 차트 데이터 수집
             multi_tf_data = fetch_multi_timeframe_data()
             
-            # 최신 비트코인 뉴스 수집
-            recent_news = fetch_bitcoin_news()
+            # 로컬 사전 필터: 추세 정렬/변동성/거래량 규칙상 진입 불가능한 구간이면 LLM 호출 생략
+            gate_result = evaluate_entry_gate(multi_tf_data)
+            if not gate_result["passed"] and not gate_result["shadow"]:
+                record_gate_result(DB_FILE, gate_result)
+                print(f"사전 필터 차단 {gate_result['rules']} - LLM 호출 생략, 5분 후 재확인")
+                time.sleep(300)
+                continue
+            
+            # 최신 비트코인 뉴스 감성 요약 (헤드라인 목록 대신 LLM에 전달)
+            news_sentiment = fetch_news_sentiment()
+            
+            # 직전 NO_POSITION 이후 시장 상태 지문(가격/추세/변동성/뉴스)이 그대로면 이전 판단 재사용
+            fingerprint = market_fingerprint(current_price, multi_tf_data, news_sentiment["top_movers"], extra=round(news_sentiment["score"], 1))
+            if lookup_decision("entry", fingerprint) is not None:
+                print("시장 상태 변화 없음 - 직전 NO_POSITION 판단 재사용")
+                print_memo_stats()
+                time.sleep(600)
+                continue
             
             # 과거 거래 내역 및 AI 분석 결과 가져오기
             historical_trading_data = get_historical_trading_data(limit=10)  # 최근 10개 거래
@@ -742,7 +658,7 @@ while True:
                 "timestamp": datetime.now().isoformat(),
                 "current_price": current_price,
                 "timeframes": {},
-                "recent_news": recent_news,
+                "news_sentiment": news_sentiment,
                 "historical_trading_data": historical_trading_data,
                 "performance_metrics": performance_metrics
             }
@@ -766,7 +682,7 @@ You adhere strictly to Warren Buffett's investment principles:
 **Rule No.7: Take partial profits at predetermined targets to secure gains. **
 **Rule No.8: Adjust position sizing based on current market volatility. **
 
-Analyze the market data across different timeframes (15m, 1h, 4h), recent news headlines, and historical trading performance to provide your trading decision.
+Analyze the market data across different timeframes (15m, 1h, 4h), recent news sentiment, and historical trading performance to provide your trading decision.
 
 Follow this process:
 1. Review historical trading performance:
@@ -784,7 +700,7 @@ Follow this process:
    - Long-term trend (4h): Overall market bias
    - Volatility across timeframes
    - Key support/resistance levels
-   - News sentiment: Analyze recent news article titles for bullish or bearish sentiment
+   - News sentiment: Use the pre-computed news_sentiment summary (score from -1 bearish to 1 bullish, trend, top movers)
 
 3. Based on your analysis, determine:
    - Direction: Whether to go LONG or SHORT
@@ -843,19 +759,28 @@ Your response must contain ONLY a valid JSON object with exactly these 6 fields:
 IMPORTANT: Do not format your response as a code block. Do not include ```json, ```, or any other markdown formatting. Return ONLY the raw JSON object.
 """
             
-            # OpenAI API 호출하여 트레이딩 결정 요청
-            response = client.chat.completions.create(
-                model="gpt-4o",  # GPT-4o 모델 사용
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": str(market_analysis)}
-                ]
+            # OpenAI API 호출하여 트레이딩 결정 요청 (모델은 라우터가 선택)
+            # 응답을 스트리밍으로 받아 방향/레버리지/SL/TP가 완성되면 reasoning 수신 중에 잔고 조회 시작
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": str(market_analysis)}
+            ]
+            pretrade = {}
+            raw_response, used_model = route_request(
+                "entry",  # 신규 진입 분석
+                lambda model: stream_completion(
+                    client,
+                    model,
+                    messages,
+                    required_fields=DECISION_FIELDS,
+                    on_fields=lambda fields: pretrade.update(start_pretrade(fields))
+                )
             )
 
             # ===== 7. AI 응답 처리 및 거래 실행 =====
             try:
                 # API 응답에서 내용 추출
-                response_content = response.choices[0].message.content.strip()
+                response_content = raw_response.strip()
                 print(f"Raw AI response: {response_content}")  # 디버깅용 출력
                 
                 # JSON 형식 정리 (코드 블록 제거)
@@ -871,10 +796,17 @@ IMPORTANT: Do not format your response as a code block. Do not include ```json,
                 
                 # JSON 파싱
                 trading_decision = json.loads(response_content)
+                record_gate_result(DB_FILE, gate_result, trading_decision['direction'])
+                if not gate_result["passed"]:
+                    # 섀도 샘플: 차단된 구간에서 LLM 판단과의 일치도만 기록하고 분석 저장/주문은 하지 않음
+                    print(f"사전 필터 차단(섀도 샘플) {gate_result['rules']} - LLM 판단 {trading_decision['direction']} 기록만, 5분 후 재확인")
+                    time.sleep(300)
+                    continue
+                store_decision("entry", fingerprint, trading_decision)
                 
                 # 결정 내용 출력
                 print(f'Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}')
-                print(f"AI 거래 결정:")
+                print(f"AI 거래 결정 ({used_model}):")
                 print(f"방향: {trading_decision['direction']}")
                 print(f"추천 포지션 크기: {trading_decision['recommended_position_size']*100:.1f}%")
                 print(f"추천 레버리지: {trading_decision['recommended_leverage']}x")
@@ -882,7 +814,7 @@ IMPORTANT: Do not format your response as a code block. Do not include ```json,
                 print(f"테이크프로핏 레벨: {trading_decision['take_profit_percentage']*100:.2f}%")
                 print(f"근거: {trading_decision['reasoning']}")
                 
-                # AI 분석 결과를 데이터베이스에 저장
+                # AI 분석 결과 (포지션을 여는 경우 거래 기록과 같은 트랜잭션에서 저장)
                 analysis_data = {
                     'current_price': current_price,
                     'direction': trading_decision['direction'],
@@ -892,22 +824,36 @@ IMPORTANT: Do not format your response as a code block. Do not include ```json,
                     'take_profit_percentage': trading_decision['take_profit_percentage'],
                     'reasoning': trading_decision['reasoning']
                 }
-                analysis_id = save_ai_analysis(analysis_data)
                 
                 # AI 추천 방향 가져오기
                 action = trading_decision['direction'].lower()
+
+                # 진입 판단은 주문 전에 먼저 저장 (주문이 실패해도 판단 기록이 남고, 성공하면 거래 ID를 연결)
+                analysis_id = None
+                if action != "no_position":
+                    analysis_id = save_ai_analysis(analysis_data)
                 
                 # ===== 8. 트레이딩 결정에 따른 액션 실행 =====
                 # 포지션을 열지 말아야 하는 경우
                 if action == "no_position":
+                    save_ai_analysis(analysis_data, background=True)
                     print("현재 시장 상황에서는 포지션을 열지 않는 것이 좋습니다.")
                     print(f"이유: {trading_decision['reasoning']}")
+                    print_router_stats()
+                    print_gate_stats(DB_FILE)
+                    print_memo_stats()
+                    print_transaction_stats()
+                    print_write_behind_stats()
+                    position_state.print_stats()
                     time.sleep(600)  # 포지션 없을 때 1분 대기
                     continue
                     
                 # ===== 9. 투자 금액 계산 =====
-                # 현재 잔액 확인
-                balance = exchange.fetch_balance()
+                # 현재 잔액 확인 (스트리밍 중 미리 조회한 결과가 있으면 사용)
+                if "balance" in pretrade:
+                    balance = pretrade["balance"].result()
+                else:
+                    balance = exchange.fetch_balance()
                 available_capital = balance['USDT']['free']  # 가용 USDT 잔액
                 total_capital = balance['USDT']['total']  # 전체 USDT 잔액 
 
@@ -981,15 +927,8 @@ IMPORTANT: Do not format your response as a code block. Do not include ```json,
                         'position_size_percentage': position_size_percentage,
                         'investment_amount': investment_amount
                     }
-                    trade_id = save_trade(trade_data)
-                    
-                    # AI 분석 결과와 거래 연결
-                    update_analysis_sql = "UPDATE ai_analysis SET trade_id = ? WHERE id = ?"
-                    conn = sqlite3.connect(DB_FILE)
-                    cursor = conn.cursor()
-                    cursor.execute(update_analysis_sql, (trade_id, analysis_id))
-                    conn.commit()
-                    conn.close()
+                    # 거래 기록 저장과 미리 저장한 AI 분석의 거래 ID 연결을 한 번의 커밋으로 처리하고 포지션 상태 갱신
+                    trade_id = position_state.open_position(build_trade_record(trade_data), analysis_id=analysis_id)
                     
                     print(f"\n=== LONG Position Opened ===")
                     print(f"Entry: ${entry_price:,.2f}")
@@ -1025,15 +964,8 @@ IMPORTANT: Do not format your response as a code block. Do not include ```json,
                         'position_size_percentage': position_size_percentage,
                         'investment_amount': investment_amount
                     }
-                    trade_id = save_trade(trade_data)
-                    
-                    # AI 분석 결과와 거래 연결
-                    update_analysis_sql = "UPDATE ai_analysis SET trade_id = ? WHERE id = ?"
-                    conn = sqlite3.connect(DB_FILE)
-                    cursor = conn.cursor()
-                    cursor.execute(update_analysis_sql, (trade_id, analysis_id))
-                    conn.commit()
-                    conn.close()
+                    # 거래 기록 저장과 미리 저장한 AI 분석의 거래 ID 연결을 한 번의 커밋으로 처리하고 포지션 상태 갱신
+                    trade_id = position_state.open_position(build_trade_record(trade_data), analysis_id=analysis_id)
                     
                     print(f"\n=== SHORT Position Opened ===")
                     print(f"Entry: ${entry_price:,.2f}")
@@ -1047,7 +979,7 @@ IMPORTANT: Do not format your response as a code block. Do not include ```json,
                     
             except json.JSONDecodeError as e:
                 print(f"JSON 파싱 오류: {e}")
-                print(f"AI 응답: {response.choices[0].message.content}")
+                print(f"AI 응답: {raw_response}")
                 time.sleep(10800)  # 대기 후 다시 시도
                 continue
             except Exception as e:
@@ -0,0 +1,220 @@
+# db.py
+"""
+SQLite 연결 관리
+--------------------------------------------------------
+기능:
+- DB 파일별, 스레드별로 오래 유지되는 연결 재사용 (매 호출 connect/close 제거)
+- WAL 저널 모드로 봇(쓰기)과 대시보드(읽기)가 서로 막지 않도록 설정
+- synchronous=NORMAL, 페이지 캐시, busy_timeout PRAGMA 적용
+- 대시보드용 읽기 전용 연결(mode=ro)과 여러 쿼리를 같은 시점으로 읽는 스냅샷
+- 읽기 전용 연결은 스레드가 끝나면 풀로 돌아가 다음 스레드가 재사용 (Streamlit은 재실행마다 새 스레드에서 실행)
+- 여러 쓰기를 한 번의 커밋으로 묶는 트랜잭션 (중첩 시 바깥 트랜잭션에 합류, 소요 시간 통계)
+--------------------------------------------------------
+"""
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+BUSY_TIMEOUT_MS = 10000      # 잠금 대기 시간 (ms)
+CACHE_SIZE_KB = 20000        # 연결당 페이지 캐시 크기 (KB)
+MMAP_SIZE = 64 * 1024 * 1024 # 메모리 맵 읽기 크기 (bytes)
+
+_local = threading.local()
+
+# 트랜잭션 이름별 소요 시간 통계 (모든 스레드 공유)
+_transaction_stats = {}
+_stats_lock = threading.Lock()
+
+# 끝난 스레드가 돌려준 읽기 전용 연결 (DB 파일 경로 -> 연결 목록)
+_idle_readonly = {}
+_pool_lock = threading.Lock()
+
+# data_version 확인용 연결 (DB 파일별로 프로세스에서 하나, 모든 스레드 공유)
+_version_connections = {}
+_version_lock = threading.Lock()
+
+
+def _open(path, readonly):
+    if readonly:
+        # 스레드가 끝나면 다른 스레드가 이어받으므로 check_same_thread=False (동시에는 한 스레드만 사용)
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                               isolation_level=None, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")  # DB 파일에 유지되는 설정
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL에서는 커밋마다 fsync하지 않아도 손상되지 않음
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+class _ThreadConnections(dict):
+    """스레드 하나의 연결 모음 (버려질 때 읽기 전용 연결을 풀에 돌려줌)"""
+
+    def __init__(self):
+        super().__init__()
+        self.readonly = []  # [(경로, 연결)]
+        weakref.finalize(self, _release_readonly, self.readonly)
+
+
+def _release_readonly(items):
+    with _pool_lock:
+        for path, conn in items:
+            if conn.in_transaction:  # 스냅샷 도중 스레드가 끝난 경우
+                conn.close()
+            else:
+                _idle_readonly.setdefault(path, []).append(conn)
+
+
+def _take_readonly(path):
+    with _pool_lock:
+        idle = _idle_readonly.get(path)
+        return idle.pop() if idle else None
+
+
+def get_connection(db_file, readonly=False):
+    """
+    현재 스레드에서 재사용하는 DB 연결을 반환합니다
+
+    연결은 자동 커밋 모드(isolation_level=None)로 열리므로 단일 문장은 즉시 반영됩니다.
+    호출한 쪽에서 연결을 닫지 않습니다. 읽기 전용 연결은 스레드가 끝나면 풀로 돌아가
+    Streamlit 재실행처럼 새로 시작한 스레드가 다시 열지 않고 이어서 사용합니다.
+
+    매개변수:
+        db_file (str): 데이터베이스 파일 경로
+        readonly (bool): True면 읽기 전용(mode=ro) 연결
+
+    반환값:
+        sqlite3.Connection: 스레드 전용 연결
+    """
+    connections = _local.__dict__.get("connections")
+    if connections is None:
+        connections = _local.connections = _ThreadConnections()
+    key = (os.path.abspath(db_file), readonly)
+    conn = connections.get(key)
+    if conn is None:
+        conn = (_take_readonly(key[0]) if readonly else None) or _open(key[0], readonly)
+        connections[key] = conn
+        if readonly:
+            connections.readonly.append((key[0], conn))
+    return conn
+
+
+@contextmanager
+def snapshot(db_file):
+    """
+    읽기 전용 트랜잭션 안에서 연결을 제공합니다
+
+    WAL 모드에서는 트랜잭션의 첫 읽기 시점의 DB 상태가 끝날 때까지 유지되므로,
+    대시보드가 여러 쿼리를 실행해도 봇의 쓰기와 섞이지 않은 같은 시점의 데이터를 봅니다.
+    """
+    conn = get_connection(db_file, readonly=True)
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("ROLLBACK")
+
+
+def data_version(db_file):
+    """
+    다른 연결이 DB에 커밋할 때마다 바뀌는 값을 반환합니다 (PRAGMA data_version)
+
+    값은 연결마다 따로 매겨지므로 같은 연결끼리만 비교할 수 있습니다. 그래서 스레드별 연결 대신
+    DB 파일마다 쓰기를 하지 않는 읽기 전용 연결 하나를 두고 모든 스레드가 공유합니다.
+    대시보드는 이 값이 그대로면 캐시를 그대로 쓰고, 바뀌었을 때만 DB를 다시 읽습니다.
+
+    매개변수:
+        db_file (str): 데이터베이스 파일 경로
+
+    반환값:
+        int: 마지막 확인 이후 다른 연결의 커밋이 있으면 달라지는 값
+    """
+    path = os.path.abspath(db_file)
+    with _version_lock:
+        conn = _version_connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            _version_connections[path] = conn
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+@contextmanager
+def transaction(db_file, durable=False, label="transaction"):
+    """
+    블록 안의 쓰기를 하나의 트랜잭션(한 번의 커밋)으로 묶습니다
+
+    BEGIN IMMEDIATE로 쓰기 잠금을 먼저 잡고, 블록이 정상 종료되면 COMMIT, 예외가 나면 ROLLBACK 합니다.
+    같은 스레드에서 이미 트랜잭션 안이면 새로 시작하지 않고 바깥 트랜잭션에 합류하므로,
+    블록 안에서 get_connection()을 쓰는 저장 함수를 그대로 호출할 수 있습니다.
+
+    매개변수:
+        db_file (str): 데이터베이스 파일 경로
+        durable (bool): True면 이 커밋만 synchronous=FULL로 디스크 동기화 (전원 장애에도 유지)
+        label (str): 소요 시간 통계에 쓰일 이름
+
+    반환값:
+        sqlite3.Cursor: 트랜잭션 안의 커서
+    """
+    conn = get_connection(db_file)
+    cursor = conn.cursor()
+    if conn.in_transaction:
+        yield cursor
+        return
+
+    if durable:
+        cursor.execute("PRAGMA synchronous=FULL")
+    start = time.perf_counter()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        yield cursor
+        cursor.execute("COMMIT")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        if durable:
+            cursor.execute("PRAGMA synchronous=NORMAL")
+    _record_transaction(label, (time.perf_counter() - start) * 1000)
+
+
+def _record_transaction(label, elapsed_ms):
+    with _stats_lock:
+        stats = _transaction_stats.setdefault(label, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+
+def get_transaction_stats():
+    """트랜잭션 이름별 횟수, 평균/최대 소요 시간(ms)을 반환합니다."""
+    with _stats_lock:
+        return {
+            label: {**stats, "avg_ms": stats["total_ms"] / stats["count"]}
+            for label, stats in _transaction_stats.items()
+        }
+
+
+def print_transaction_stats():
+    for label, stats in get_transaction_stats().items():
+        print(f"[DB] {label}: {stats['count']} commits, avg {stats['avg_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
+
+
+def close_connections():
+    """현재 스레드의 모든 연결과 풀에 남은 읽기 전용 연결을 닫습니다."""
+    connections = _local.__dict__.pop("connections", None)
+    if connections is not None:
+        connections.readonly.clear()  # 닫은 연결이 풀로 돌아가지 않도록
+        for conn in connections.values():
+            conn.close()
+    with _pool_lock:
+        idle = [conn for conns in _idle_readonly.values() for conn in conns]
+        _idle_readonly.clear()
+    for conn in idle:
+        conn.close()
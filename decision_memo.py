@@ -0,0 +1,95 @@
+# decision_memo.py
+"""
+시장 상태 지문 기반 AI 판단 재사용
+--------------------------------------------------------
+기능:
+- 가격 구간, 타임프레임별 추세/변동성 구간, 뉴스 해시로 양자화된 시장 상태 지문 생성
+- 지문이 바뀌지 않았고 최대 유효 시간이 지나지 않았으면 직전 판단(NO_POSITION/HOLD)을 재사용
+- 메모별 적중/미적중 횟수 집계
+--------------------------------------------------------
+"""
+import math
+import time
+import hashlib
+
+from market_filter import compute_timeframe_features
+
+PRICE_BUCKET_PCT = 0.0025     # 가격 구간 폭 (0.25%, 로그 스케일)
+VOLATILITY_BUCKET_PCT = 0.2   # ATR% 구간 폭 (%p)
+MAX_AGE_SECONDS = 1800        # 재사용 최대 유효 시간 (30분)
+
+_memos = {}  # 메모 이름 -> {"fingerprint", "decision", "stored_at"}
+_stats = {}  # 메모 이름 -> {"hits", "misses"}
+
+
+def news_hash(news):
+    """뉴스 제목 목록의 순서와 무관한 해시를 만듭니다."""
+    titles = sorted((item.get("title") or "").strip().lower() for item in news or [])
+    return hashlib.sha1("\n".join(titles).encode("utf-8")).hexdigest()[:16]
+
+
+def market_fingerprint(current_price, multi_tf_data, news, extra=None):
+    """
+    양자화된 시장 상태 지문을 생성합니다
+
+    매개변수:
+        current_price (float): 현재 가격
+        multi_tf_data (dict): 타임프레임별 OHLCV DataFrame
+        news (list): 뉴스 목록
+        extra (optional): 지문에 함께 넣을 값 (예: 열린 거래 ID)
+
+    반환값:
+        tuple: 비교 가능한 지문
+    """
+    price_bucket = int(math.log(current_price) / math.log(1 + PRICE_BUCKET_PCT)) if current_price else 0
+    features = compute_timeframe_features(multi_tf_data)
+    timeframe_buckets = tuple(
+        (tf, int(row['trend']), int(row['atr_pct'] // VOLATILITY_BUCKET_PCT))
+        for tf, row in features.sort_index().iterrows()
+        if not math.isnan(row['atr_pct'])
+    )
+    return (price_bucket, timeframe_buckets, news_hash(news), extra)
+
+
+def lookup_decision(name, fingerprint, max_age=MAX_AGE_SECONDS):
+    """
+    같은 지문으로 저장된 유효한 판단이 있으면 반환합니다
+
+    반환값:
+        dict: 재사용할 판단 또는 None (미적중)
+    """
+    stats = _stats.setdefault(name, {"hits": 0, "misses": 0})
+    memo = _memos.get(name)
+    if memo and memo["fingerprint"] == fingerprint and time.time() - memo["stored_at"] <= max_age:
+        stats["hits"] += 1
+        return memo["decision"]
+    stats["misses"] += 1
+    return None
+
+
+def store_decision(name, fingerprint, decision, reusable_values=("NO_POSITION", "HOLD"), field="direction"):
+    """
+    판단을 저장합니다. 재사용해도 안전한 판단(NO_POSITION/HOLD)만 저장하고 나머지는 메모를 비웁니다.
+    """
+    value = str(decision.get(field, "")).upper()
+    if value in reusable_values:
+        _memos[name] = {"fingerprint": fingerprint, "decision": decision, "stored_at": time.time()}
+    else:
+        _memos.pop(name, None)
+
+
+def clear_decision(name):
+    _memos.pop(name, None)
+
+
+def get_memo_stats():
+    """메모별 적중/미적중 횟수와 적중률을 반환합니다."""
+    return {
+        name: {**stats, "hit_rate": stats["hits"] / (stats["hits"] + stats["misses"]) if (stats["hits"] + stats["misses"]) else 0}
+        for name, stats in _stats.items()
+    }
+
+
+def print_memo_stats():
+    for name, stats in get_memo_stats().items():
+        print(f"[Memo] {name}: hits {stats['hits']} / misses {stats['misses']} (hit rate {stats['hit_rate']*100:.1f}%)")
@@ -0,0 +1,168 @@
+# equity.py
+"""
+평가 자산(mark-to-market) 시계열
+--------------------------------------------------------
+기능:
+- 봇이 일정 간격으로 평가 자산, 미실현 손익, 가격 샘플을 기록 (백그라운드 스레드)
+- 샘플을 기록하는 트랜잭션 안에서 1분/1시간/1일 OHLC 구간으로 UPSERT 집계
+- 원본 샘플과 1분 구간은 보관 기간이 지나면 삭제, 1시간/1일 구간은 계속 보관
+- 대시보드는 조회 기간에 맞는 해상도를 골라 수백 개 이하의 점으로 자산 곡선을 그림
+--------------------------------------------------------
+"""
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from db import get_connection, transaction
+
+EQUITY_SAMPLE_INTERVAL = 60   # 샘플 간격 (초)
+RAW_RETENTION_DAYS = 7        # 원본 샘플 보관 기간
+EXPIRY_INTERVAL = 3600        # 보관 기간 지난 행 삭제 주기 (초)
+MAX_CURVE_POINTS = 500        # 대시보드 곡선의 최대 점 개수
+
+DAY_MS = 86_400_000
+# 해상도 이름 -> (구간 길이 ms, 보관 기간 ms 또는 계속 보관하면 None)
+RESOLUTIONS = {
+    "1m": (60_000, 30 * DAY_MS),
+    "1h": (3_600_000, None),
+    "1d": (DAY_MS, None),
+}
+
+_last_expiry = {}
+
+
+def setup_equity_tables(cursor):
+    """원본 샘플 테이블과 구간 집계 테이블을 생성합니다. (마이그레이션에서 호출)"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS equity_samples (
+        timestamp_ms INTEGER PRIMARY KEY,   -- 샘플 시간 (UTC epoch-ms)
+        equity REAL NOT NULL,               -- 평가 자산 (잔고 + 미실현 손익, USDT)
+        unrealized_pnl REAL NOT NULL,       -- 미실현 손익 (USDT)
+        price REAL                          -- 샘플 시점 BTC 가격
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS equity_rollups (
+        resolution TEXT NOT NULL,           -- 1m / 1h / 1d
+        bucket_ms INTEGER NOT NULL,         -- 구간 시작 시간 (UTC epoch-ms)
+        open REAL NOT NULL,
+        high REAL NOT NULL,
+        low REAL NOT NULL,
+        close REAL NOT NULL,
+        unrealized_pnl REAL NOT NULL,       -- 구간 마지막 샘플의 미실현 손익
+        price REAL,                         -- 구간 마지막 샘플의 가격
+        samples INTEGER NOT NULL,
+        PRIMARY KEY (resolution, bucket_ms)
+    ) WITHOUT ROWID
+    ''')
+
+
+def record_equity_sample(db_file, equity, unrealized_pnl, price=None, timestamp_ms=None):
+    """
+    샘플 하나를 기록하고 모든 해상도의 구간 집계에 반영합니다
+
+    매개변수:
+        db_file (str): 데이터베이스 파일 경로
+        equity (float): 평가 자산 (USDT)
+        unrealized_pnl (float): 미실현 손익 (USDT)
+        price (float, optional): BTC 가격
+        timestamp_ms (int, optional): 샘플 시간 (기본값: 현재)
+    """
+    if timestamp_ms is None:
+        timestamp_ms = int(time.time() * 1000)
+    with transaction(db_file, label="equity_sample") as cursor:
+        cursor.execute(
+            "INSERT OR REPLACE INTO equity_samples (timestamp_ms, equity, unrealized_pnl, price) VALUES (?, ?, ?, ?)",
+            (timestamp_ms, equity, unrealized_pnl, price)
+        )
+        cursor.executemany('''
+        INSERT INTO equity_rollups (resolution, bucket_ms, open, high, low, close, unrealized_pnl, price, samples)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+        ON CONFLICT (resolution, bucket_ms) DO UPDATE SET
+            high = MAX(high, excluded.high),
+            low = MIN(low, excluded.low),
+            close = excluded.close,
+            unrealized_pnl = excluded.unrealized_pnl,
+            price = excluded.price,
+            samples = samples + 1
+        ''', [
+            (name, timestamp_ms - timestamp_ms % size, equity, equity, equity, equity, unrealized_pnl, price)
+            for name, (size, _) in RESOLUTIONS.items()
+        ])
+
+        if time.time() - _last_expiry.get(db_file, 0) >= EXPIRY_INTERVAL:
+            _expire(cursor, timestamp_ms)
+            _last_expiry[db_file] = time.time()
+
+
+def _expire(cursor, now_ms):
+    cursor.execute("DELETE FROM equity_samples WHERE timestamp_ms < ?", (now_ms - RAW_RETENTION_DAYS * DAY_MS,))
+    for name, (_, retention) in RESOLUTIONS.items():
+        if retention is not None:
+            cursor.execute("DELETE FROM equity_rollups WHERE resolution = ? AND bucket_ms < ?", (name, now_ms - retention))
+
+
+def start_equity_sampler(db_file, sample_fn, interval=EQUITY_SAMPLE_INTERVAL):
+    """
+    일정 간격으로 샘플을 기록하는 백그라운드 스레드를 시작합니다
+
+    매개변수:
+        db_file (str): 데이터베이스 파일 경로
+        sample_fn (callable): {"equity", "unrealized_pnl", "price"} dict를 반환하는 함수
+        interval (int): 샘플 간격 (초)
+    """
+    def run():
+        while True:
+            started = time.monotonic()
+            try:
+                sample = sample_fn()
+                record_equity_sample(db_file, sample["equity"], sample["unrealized_pnl"], sample.get("price"))
+            except Exception as e:
+                print(f"[Equity] 샘플 기록 실패: {e}")
+            time.sleep(max(interval - (time.monotonic() - started), 1))
+
+    thread = threading.Thread(target=run, name="equity-sampler", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_equity_curve(db_file, since=None, max_points=MAX_CURVE_POINTS):
+    """
+    조회 기간을 max_points 이하의 점으로 덮는 가장 세밀한 해상도의 자산 곡선을 반환합니다
+
+    매개변수:
+        db_file (str): 데이터베이스 파일 경로
+        since (datetime, optional): 조회 시작 시간 (None이면 전체)
+        max_points (int): 최대 점 개수
+
+    반환값:
+        DataFrame: timestamp(로컬 시간), open, high, low, close, unrealized_pnl, price 컬럼과 attrs['resolution']
+    """
+    conn = get_connection(db_file, readonly=True)
+    since_ms = int(since.timestamp() * 1000) if since is not None else 0
+    now_ms = int(time.time() * 1000)
+
+    chosen = "1d"
+    for name, (_, retention) in RESOLUTIONS.items():
+        # 보관 기간이 조회 기간보다 짧은 해상도는 앞부분이 비므로 제외
+        if retention is not None and since_ms < now_ms - retention:
+            continue
+        count = conn.execute(
+            "SELECT COUNT(*) FROM equity_rollups WHERE resolution = ? AND bucket_ms >= ?", (name, since_ms)
+        ).fetchone()[0]
+        if count <= max_points:
+            chosen = name
+            break
+
+    df = pd.read_sql_query(
+        "SELECT bucket_ms, open, high, low, close, unrealized_pnl, price FROM equity_rollups "
+        "WHERE resolution = ? AND bucket_ms >= ? ORDER BY bucket_ms",
+        conn, params=(chosen, since_ms)
+    )
+    if len(df) > max_points:
+        df = df.iloc[-max_points:].reset_index(drop=True)
+    df.insert(0, "timestamp", [datetime.fromtimestamp(ms / 1000) for ms in df.pop("bucket_ms")])
+    df.attrs["resolution"] = chosen
+    return df
@@ -0,0 +1,107 @@
+# llm_stream.py
+"""
+LLM 응답 스트리밍 및 JSON 필드 점진 파싱
+--------------------------------------------------------
+기능:
+- Chat Completions 응답을 토큰 단위로 스트리밍
+- 도착한 부분 JSON에서 값이 완성된 최상위 필드만 추출
+- 지정한 필드가 모두 완성되면 콜백을 한 번 호출 (reasoning 수신 중 주문 준비 시작)
+--------------------------------------------------------
+"""
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def _skip(text, idx, chars=_WHITESPACE):
+    while idx < len(text) and text[idx] in chars:
+        idx += 1
+    return idx
+
+
+def parse_complete_fields(text):
+    """
+    부분적으로 수신된 JSON 객체에서 값이 완성된 최상위 필드를 추출합니다
+
+    코드 블록(```json) 등 앞부분의 불필요한 문자는 첫 '{'까지 건너뜁니다.
+    숫자는 뒤에 구분자(',', '}' 등)가 도착해야 완성된 것으로 봅니다.
+
+    매개변수:
+        text (str): 지금까지 수신된 응답 텍스트
+
+    반환값:
+        dict: 완성된 필드 이름과 값
+    """
+    fields = {}
+    idx = text.find("{")
+    if idx < 0:
+        return fields
+    idx += 1
+
+    while True:
+        idx = _skip(text, idx, _WHITESPACE + ",")
+        if idx >= len(text) or text[idx] != '"':
+            break
+        try:
+            key, idx = _decoder.raw_decode(text, idx)
+        except ValueError:
+            break  # 키 문자열이 아직 끝나지 않음
+        idx = _skip(text, idx)
+        if idx >= len(text) or text[idx] != ":":
+            break
+        idx = _skip(text, idx + 1)
+        try:
+            value, end = _decoder.raw_decode(text, idx)
+        except ValueError:
+            break  # 값이 아직 끝나지 않음
+        if end >= len(text) and not isinstance(value, (str, dict, list)):
+            break  # 숫자/리터럴은 뒤에 더 이어질 수 있음
+        fields[key] = value
+        idx = end
+    return fields
+
+
+def stream_completion(client, model, messages, required_fields=(), on_fields=None, **kwargs):
+    """
+    응답을 스트리밍으로 받으면서 필수 필드가 완성되는 즉시 콜백을 호출합니다
+
+    매개변수:
+        client (OpenAI): OpenAI 클라이언트
+        model (str): 모델 이름
+        messages (list): 대화 메시지 목록
+        required_fields (tuple): 콜백 호출 전에 완성되어야 하는 필드 이름
+        on_fields (callable, optional): 완성된 필드 dict를 받는 콜백 (한 번만 호출)
+        **kwargs: chat.completions.create 추가 인자
+
+    반환값:
+        tuple: (전체 응답 텍스트, usage)
+    """
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kwargs
+    )
+
+    parts = []
+    usage = None
+    fired = on_fields is None or not required_fields
+    for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        parts.append(delta)
+
+        if not fired:
+            fields = parse_complete_fields("".join(parts))
+            if all(name in fields for name in required_fields):
+                fired = True
+                on_fields(fields)
+
+    return "".join(parts), usage
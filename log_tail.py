@@ -0,0 +1,159 @@
+# log_tail.py
+"""
+서비스 로그 증분 조회 (실시간 로그 뷰어용)
+--------------------------------------------------------
+기능:
+- journald: 마지막 커서를 기억하고 --after-cursor로 새 항목만 읽음 (shell 없이 인자 목록으로 실행)
+- 일반 로그 파일: 마지막으로 읽은 위치(offset)부터 새 줄만 읽음, 파일이 잘리거나 교체되면 처음부터 (LOG_TAIL_DIR 설정 시)
+- 서비스별로 최근 MAX_LINES줄을 링 버퍼에 보관하고 줄마다 순번을 매김
+- 여러 세션이 동시에 새로고침해도 MIN_POLL_INTERVAL 안에는 한 번만 읽고, 각 세션은 자기 순번 이후의 줄만 받음
+--------------------------------------------------------
+"""
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+
+MAX_LINES = 1000            # 서비스별 보관 줄 수
+MIN_POLL_INTERVAL = 1.0     # 새 로그를 읽는 최소 간격 (초)
+JOURNAL_TIMEOUT = 10        # journalctl 실행 제한 시간 (초)
+LOG_DIR_ENV = "LOG_TAIL_DIR"  # 설정하면 journald 대신 <디렉터리>/<서비스>.log 파일을 읽음
+CURSOR_PREFIX = "-- cursor: "
+TAIL_CHUNK = 64 * 1024      # 처음 읽을 때 파일 끝에서부터 거꾸로 읽는 단위 (bytes)
+
+
+class JournalSource:
+    """journalctl 커서를 이용해 systemd 서비스의 새 로그만 읽습니다."""
+
+    def __init__(self, unit, use_sudo=True):
+        self.unit = unit
+        self.use_sudo = use_sudo
+        self.cursor = None
+
+    def read(self, initial_lines):
+        """
+        마지막 커서 이후의 로그 줄을 반환합니다 (처음에는 최근 initial_lines줄)
+
+        반환값:
+            list: 새 로그 줄 (오래된 순)
+        """
+        command = ["sudo", "-n"] if self.use_sudo else []
+        command += ["journalctl", "-u", self.unit, "--no-pager", "--quiet", "--show-cursor"]
+        if self.cursor:
+            command += ["--after-cursor", self.cursor]
+        else:
+            command += ["-n", str(initial_lines)]
+        result = subprocess.run(command, capture_output=True, text=True, timeout=JOURNAL_TIMEOUT)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"journalctl 종료 코드 {result.returncode}")
+        lines = result.stdout.splitlines()
+        if lines and lines[-1].startswith(CURSOR_PREFIX):
+            self.cursor = lines.pop()[len(CURSOR_PREFIX):]
+        return lines
+
+
+class FileSource:
+    """일반 로그 파일을 마지막으로 읽은 위치부터 읽습니다. (journald가 없는 로컬 환경용)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self._inode = None
+
+    def read(self, initial_lines):
+        """마지막 위치 이후의 완성된 줄을 반환합니다 (처음에는 최근 initial_lines줄)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        first_read = self._inode is None
+        if stat.st_ino != self._inode or stat.st_size < self.offset:
+            # 처음 읽거나, 로그 로테이션으로 파일이 교체/잘림
+            self._inode, self.offset = stat.st_ino, 0
+        if stat.st_size == self.offset:
+            return []
+        with open(self.path, "rb") as f:
+            if first_read:
+                # 큰 로그 파일 전체를 읽지 않도록 끝에서부터 필요한 줄 수만큼만 읽음
+                self.offset = self._tail_start(f, stat.st_size, initial_lines)
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # 아직 쓰는 중인 마지막 줄은 다음에 읽음
+        self.offset += end
+        lines = data[:end].decode("utf-8", errors="replace").splitlines()
+        return lines[-initial_lines:] if first_read else lines
+
+    @staticmethod
+    def _tail_start(f, size, lines):
+        """
+        끝에서부터 TAIL_CHUNK씩 거꾸로 읽어 마지막 lines줄이 들어 있는 구간의 시작 위치를 찾습니다
+
+        줄바꿈을 lines개보다 많이 찾으면 그 청크의 시작 위치를 반환합니다. (앞쪽에 걸친 줄은 호출한 쪽에서 잘라냄)
+        """
+        position, newlines = size, 0
+        while position > 0 and newlines <= lines:
+            read_size = min(TAIL_CHUNK, position)
+            position -= read_size
+            f.seek(position)
+            newlines += f.read(read_size).count(b"\n")
+        return position
+
+
+class LogTail:
+    """
+    한 서비스의 최근 로그 링 버퍼 (모든 세션 공유)
+
+    매개변수:
+        source (JournalSource | FileSource): 새 로그를 읽을 곳
+        max_lines (int): 보관할 최대 줄 수
+        min_interval (float): 새 로그를 읽는 최소 간격 (초)
+    """
+
+    def __init__(self, source, max_lines=MAX_LINES, min_interval=MIN_POLL_INTERVAL):
+        self.source = source
+        self.min_interval = min_interval
+        self._lines = deque(maxlen=max_lines)
+        self._next_seq = 0      # 다음에 추가될 줄의 순번
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"polls": 0, "lines": 0, "errors": 0}
+
+    def poll(self):
+        """새 로그를 읽어 버퍼에 추가합니다. (min_interval 안에 다시 호출하면 아무것도 하지 않음)"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_poll < self.min_interval:
+                return 0
+            self._last_poll = now
+            try:
+                lines = self.source.read(self._lines.maxlen)
+            except (OSError, RuntimeError, subprocess.TimeoutExpired):
+                self.stats["errors"] += 1
+                raise
+            self._lines.extend(lines)
+            self._next_seq += len(lines)
+            self.stats["polls"] += 1
+            self.stats["lines"] += len(lines)
+            return len(lines)
+
+    def since(self, seq=0):
+        """
+        순번 seq 이후에 추가된 줄을 반환합니다
+
+        반환값:
+            tuple: (새 줄 목록(오래된 순), 다음 호출에 넘길 순번, reset)
+                reset이 True면 seq 이후 일부가 이미 버퍼에서 밀려나 보관 중인 전체를 반환한 것
+        """
+        with self._lock:
+            first_seq = self._next_seq - len(self._lines)
+            reset = seq < first_seq
+            start = 0 if reset else seq - first_seq
+            return list(self._lines)[start:], self._next_seq, reset
+
+
+def make_tail(service):
+    """서비스의 LogTail을 만듭니다. (LOG_TAIL_DIR이 있으면 <디렉터리>/<서비스>.log, 없으면 journald)"""
+    log_dir = os.getenv(LOG_DIR_ENV)
+    source = FileSource(os.path.join(log_dir, f"{service}.log")) if log_dir else JournalSource(service)
+    return LogTail(source)
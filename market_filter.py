@@ -0,0 +1,204 @@
+# market_filter.py
+"""
+LLM 호출 전 로컬 진입 사전 필터
+--------------------------------------------------------
+기능:
+- 이미 수집한 15m/1h/4h 데이터프레임에서 추세, 변동성(ATR%), 거래량 비율을 벡터 연산으로 계산
+- 시스템 프롬프트 규칙에 맞춰 진입 가능성이 없는 구간은 LLM 호출을 건너뜀
+  (Rule 4: 타임프레임 추세 정렬, Rule 6: 충분한 거래량, Rule 8: 변동성)
+- 규칙별 통과율과 LLM의 NO_POSITION 비율을 기록해 임계값 조정에 활용
+--------------------------------------------------------
+"""
+import random
+from datetime import datetime
+
+import pandas as pd
+
+from db import get_connection
+from write_behind import enqueue
+
+# 추세 판단: EMA(fast)와 EMA(slow)의 간격이 종가 대비 이 비율 이상이어야 추세로 인정
+EMA_FAST = 9
+EMA_SLOW = 21
+TREND_MIN_GAP = 0.0005
+
+# 변동성 밴드: 타임프레임별 ATR(14) / 종가 (%) 허용 범위
+ATR_PERIOD = 14
+VOLATILITY_BAND = {
+    "15m": (0.05, 1.5),
+    "1h": (0.10, 3.0),
+    "4h": (0.20, 6.0),
+}
+
+# 거래량: 직전 완성 캔들 거래량 / 최근 20개 평균 거래량
+VOLUME_TIMEFRAME = "15m"
+VOLUME_WINDOW = 20
+MIN_VOLUME_RATIO = 0.8
+
+# 차단 대상이어도 이 비율만큼은 LLM을 호출해 차단의 정확도를 측정
+SHADOW_RATE = 0.05
+
+RULES = ("trend_alignment", "volatility_band", "volume")
+
+
+def compute_timeframe_features(multi_tf_data):
+    """
+    타임프레임별 추세, ATR%, 거래량 비율을 계산합니다
+
+    매개변수:
+        multi_tf_data (dict): 타임프레임별 OHLCV DataFrame
+
+    반환값:
+        DataFrame: 타임프레임을 인덱스로 하는 특징값 (close, trend, atr_pct, volume_ratio)
+    """
+    rows = {}
+    for tf, df in multi_tf_data.items():
+        if len(df) < max(EMA_SLOW, ATR_PERIOD, VOLUME_WINDOW) + 2:
+            continue
+        close = df['close']
+        ema_gap = (close.ewm(span=EMA_FAST, adjust=False).mean() - close.ewm(span=EMA_SLOW, adjust=False).mean()) / close
+
+        # True Range = max(고가-저가, |고가-전일종가|, |저가-전일종가|)
+        prev_close = close.shift(1)
+        true_range = pd.concat([
+            df['high'] - df['low'],
+            (df['high'] - prev_close).abs(),
+            (df['low'] - prev_close).abs()
+        ], axis=1).max(axis=1)
+        atr_pct = true_range.rolling(ATR_PERIOD).mean() / close * 100
+
+        # 마지막 캔들은 진행 중이므로 거래량은 직전 완성 캔들 기준
+        volume_ratio = df['volume'] / df['volume'].rolling(VOLUME_WINDOW).mean().shift(1)
+
+        gap = ema_gap.iloc[-1]
+        rows[tf] = {
+            "close": close.iloc[-1],
+            "trend": 0 if abs(gap) < TREND_MIN_GAP else (1 if gap > 0 else -1),
+            "atr_pct": atr_pct.iloc[-1],
+            "volume_ratio": volume_ratio.iloc[-2],
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def evaluate_entry_gate(multi_tf_data):
+    """
+    LLM을 호출할 가치가 있는 진입 구간인지 판단합니다
+
+    매개변수:
+        multi_tf_data (dict): 타임프레임별 OHLCV DataFrame
+
+    반환값:
+        dict: 규칙별 통과 여부, 최종 통과 여부(passed), 섀도 호출 여부(shadow), 특징값
+    """
+    features = compute_timeframe_features(multi_tf_data)
+    if features.empty or set(features.index) != set(VOLATILITY_BAND):
+        # 데이터가 부족하면 판단하지 않고 LLM에 맡김
+        return {"passed": True, "shadow": False, "rules": {}, "features": features}
+
+    bands = pd.DataFrame.from_dict(VOLATILITY_BAND, orient="index", columns=["low", "high"]).loc[features.index]
+    rules = {
+        "trend_alignment": bool(features['trend'].ne(0).all() and features['trend'].nunique() == 1),
+        "volatility_band": bool(features['atr_pct'].between(bands['low'], bands['high']).all()),
+        "volume": bool(features.loc[VOLUME_TIMEFRAME, 'volume_ratio'] >= MIN_VOLUME_RATIO),
+    }
+    passed = all(rules.values())
+    shadow = not passed and random.random() < SHADOW_RATE
+    return {"passed": passed, "shadow": shadow, "rules": rules, "features": features}
+
+
+def setup_gate_table(db_file):
+    """사전 필터 판정 기록 테이블을 생성합니다."""
+    conn = get_connection(db_file)
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS prefilter_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        trend_alignment INTEGER,
+        volatility_band INTEGER,
+        volume INTEGER,
+        passed INTEGER NOT NULL,     -- 규칙 통과 여부
+        llm_called INTEGER NOT NULL, -- LLM 호출 여부 (통과 또는 섀도 호출)
+        llm_direction TEXT           -- LLM 판단 (호출한 경우)
+    )''')
+
+
+def record_gate_result(db_file, gate_result, llm_direction=None):
+    """
+    사전 필터 판정 결과와 (호출했다면) LLM의 판단을 기록합니다
+
+    매개변수:
+        db_file (str): 데이터베이스 파일 경로
+        gate_result (dict): evaluate_entry_gate()의 결과
+        llm_direction (str, optional): LLM이 반환한 방향 (LONG/SHORT/NO_POSITION)
+    """
+    rules = gate_result["rules"]
+    # 통계용 기록이므로 거래 흐름을 막지 않도록 백그라운드에서 커밋
+    enqueue(db_file, '''
+    INSERT INTO prefilter_log (timestamp, trend_alignment, volatility_band, volume, passed, llm_called, llm_direction)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        datetime.now().isoformat(),
+        rules.get("trend_alignment"),
+        rules.get("volatility_band"),
+        rules.get("volume"),
+        int(gate_result["passed"]),
+        int(llm_direction is not None),
+        llm_direction
+    ))
+
+
+def get_gate_stats(db_file, days=30):
+    """
+    규칙별 통과율과 LLM 판단 분포를 집계합니다
+
+    반환값:
+        dict: 평가 횟수, 규칙별 통과율, 통과 시/차단(섀도) 시 NO_POSITION 비율
+    """
+    conn = get_connection(db_file)
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT
+        COUNT(*),
+        AVG(trend_alignment),
+        AVG(volatility_band),
+        AVG(volume),
+        AVG(passed),
+        SUM(CASE WHEN passed = 1 AND llm_called = 1 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN passed = 1 AND llm_direction = 'NO_POSITION' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN passed = 0 AND llm_called = 1 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN passed = 0 AND llm_direction = 'NO_POSITION' THEN 1 ELSE 0 END)
+    FROM prefilter_log
+    WHERE timestamp >= ?
+    ''', ((datetime.now() - pd.Timedelta(days=days)).isoformat(),))
+    row = cursor.fetchone()
+
+    total = row[0] or 0
+    passed_called, passed_no_position = row[5] or 0, row[6] or 0
+    shadow_called, shadow_no_position = row[7] or 0, row[8] or 0
+    return {
+        "evaluations": total,
+        "hit_rates": {rule: (row[i + 1] or 0) for i, rule in enumerate(RULES)},
+        "pass_rate": row[4] or 0,
+        # 통과했는데도 LLM이 NO_POSITION → 필터가 더 엄격해도 되는 정도
+        "no_position_rate_when_passed": passed_no_position / passed_called if passed_called else None,
+        # 차단했는데 LLM은 NO_POSITION → 차단이 맞았던 비율 (낮으면 필터가 너무 엄격함)
+        "no_position_rate_when_blocked": shadow_no_position / shadow_called if shadow_called else None,
+    }
+
+
+def print_gate_stats(db_file):
+    stats = get_gate_stats(db_file)
+    if stats["evaluations"] == 0:
+        return
+
+    def fmt(value):
+        return f"{value*100:.1f}%" if value is not None else "N/A"
+
+    print("\n=== Entry Pre-Filter Stats (30d) ===")
+    print(f"Evaluations: {stats['evaluations']} | Pass rate: {fmt(stats['pass_rate'])}")
+    for rule, rate in stats["hit_rates"].items():
+        print(f"- {rule}: {fmt(rate)}")
+    print(f"NO_POSITION when passed: {fmt(stats['no_position_rate_when_passed'])}")
+    print(f"NO_POSITION when blocked (shadow): {fmt(stats['no_position_rate_when_blocked'])}")
+    print("====================================")
@@ -0,0 +1,293 @@
+# migrations.py
+"""
+스키마 버전 관리 및 정방향 마이그레이션
+--------------------------------------------------------
+기능:
+- schema_version 테이블에 적용된 마이그레이션 버전을 기록하고, 시작 시 미적용분만 순서대로 실행
+- 상태/시간/거래 ID 조회 패턴에 맞춘 (커버링) 인덱스 추가
+- ISO 문자열 시간 옆에 정수 epoch-ms 컬럼을 추가하고 기존 행을 채움 (범위 조회에 인덱스 사용)
+- python migrations.py: 합성 100만 행 DB에서 주요 쿼리의 실행 계획이 인덱스를 타는지 확인
+--------------------------------------------------------
+"""
+from datetime import datetime
+
+from db import get_connection, close_connections
+from performance_aggregates import setup_aggregates_table, backfill_aggregates
+from equity import setup_equity_tables
+from search_index import setup_search_index
+from prompt_versions import setup_prompt_attribution
+
+# ISO 문자열(로컬 시간) -> UTC epoch-ms
+_EPOCH_MS_SQL = "CAST((julianday({column}, 'utc') - 2440587.5) * 86400000 AS INTEGER)"
+
+
+def epoch_ms(value=None):
+    """
+    datetime 또는 ISO 문자열을 UTC epoch-ms 정수로 변환합니다 (기본값: 현재 시간)
+
+    저장된 ISO 문자열과 같은 로컬 시간 기준이므로 백필 결과와 일치합니다.
+    """
+    if value is None:
+        value = datetime.now()
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.timestamp() * 1000)
+
+
+def _add_epoch_column(cursor, table, text_column, ms_column):
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {ms_column} INTEGER")
+    cursor.execute(f"UPDATE {table} SET {ms_column} = {_EPOCH_MS_SQL.format(column=text_column)} WHERE {text_column} IS NOT NULL")
+
+
+def _table_exists(cursor, table):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+# ===== bitcoin_trading.db (autotrade) =====
+def _trading_indexes(cursor):
+    # 열린 거래 조회, 완료 거래 최신순 조회 (status = ? ORDER BY timestamp DESC)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_status_timestamp ON trades (status, timestamp)")
+    # 방향별/전체 성과 집계 (status = 'CLOSED' GROUP BY action) - 테이블 접근 없이 인덱스만으로 계산
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_status_action_pnl ON trades (status, action, profit_loss, profit_loss_percentage)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_exit_timestamp ON trades (exit_timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_analysis_trade_id ON ai_analysis (trade_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_analysis_timestamp ON ai_analysis (timestamp)")
+
+
+def _trading_epoch_ms(cursor):
+    _add_epoch_column(cursor, "trades", "timestamp", "timestamp_ms")
+    _add_epoch_column(cursor, "trades", "exit_timestamp", "exit_timestamp_ms")
+    _add_epoch_column(cursor, "ai_analysis", "timestamp", "timestamp_ms")
+    # 기간별 요약 (timestamp_ms >= ? AND exit_timestamp IS NOT NULL) 커버링 인덱스
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_timestamp_ms ON trades (timestamp_ms, exit_timestamp, profit_loss, profit_loss_percentage)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_exit_timestamp_ms ON trades (exit_timestamp_ms)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_analysis_timestamp_ms ON ai_analysis (timestamp_ms)")
+
+
+def _trading_aggregates(cursor):
+    setup_aggregates_table(cursor)
+    backfill_aggregates(cursor, """
+        SELECT action, leverage, date(exit_timestamp) AS closed_day,
+               COALESCE(profit_loss, 0) AS pnl, COALESCE(profit_loss_percentage, 0) AS pct
+        FROM trades WHERE status = 'CLOSED'
+    """)
+
+
+def _trading_search(cursor):
+    setup_search_index(cursor, "ai_analysis", "reasoning")
+
+
+TRADING_MIGRATIONS = [
+    # (버전, 설명, 필요한 테이블, 적용 함수)
+    (1, "status/time/trade_id indexes", ("trades", "ai_analysis"), _trading_indexes),
+    (2, "epoch-ms time columns", ("trades", "ai_analysis"), _trading_epoch_ms),
+    (3, "performance aggregates", ("trades",), _trading_aggregates),
+    (4, "equity samples and rollups", (), setup_equity_tables),
+    (5, "full-text search index", ("ai_analysis",), _trading_search),
+]
+
+
+# ===== mock_trading.db (mocktrade, 모의 투자 대시보드) =====
+def _prompt_history(cursor):
+    # 대시보드가 먼저 만들지 않았어도 봇 쪽에서 마이그레이션할 수 있도록 생성
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS prompt_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        end_time TEXT,
+        is_favorite INTEGER DEFAULT 0
+    )
+    """)
+    _add_epoch_column(cursor, "prompt_history", "start_time", "start_time_ms")
+    _add_epoch_column(cursor, "prompt_history", "end_time", "end_time_ms")
+    # 현재 프롬프트 조회/종료 (end_time IS NULL), 목록 정렬 (is_favorite DESC, start_time DESC)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompt_history_end_time ON prompt_history (end_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompt_history_favorite_start ON prompt_history (is_favorite, start_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompt_history_start_time_ms ON prompt_history (start_time_ms)")
+
+
+def _mock_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mock_trades_status_timestamp ON mock_trades (status, timestamp)")
+    # 완료 거래 최신순 목록과 누적 손익 합계 (status = 'CLOSED') - 인덱스만으로 계산
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mock_trades_status_exit_pnl ON mock_trades (status, exit_timestamp, profit_loss)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mock_ai_analysis_trade_id ON mock_ai_analysis (trade_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mock_ai_analysis_timestamp ON mock_ai_analysis (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_adjustments_trade_timestamp ON trade_adjustments (trade_id, timestamp)")
+
+
+def _mock_epoch_ms(cursor):
+    _add_epoch_column(cursor, "mock_trades", "timestamp", "timestamp_ms")
+    _add_epoch_column(cursor, "mock_trades", "exit_timestamp", "exit_timestamp_ms")
+    _add_epoch_column(cursor, "mock_ai_analysis", "timestamp", "timestamp_ms")
+    _add_epoch_column(cursor, "trade_adjustments", "timestamp", "timestamp_ms")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mock_trades_timestamp_ms ON mock_trades (timestamp_ms)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mock_trades_exit_timestamp_ms ON mock_trades (exit_timestamp_ms)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mock_ai_analysis_timestamp_ms ON mock_ai_analysis (timestamp_ms)")
+
+
+def _mock_aggregates(cursor):
+    setup_aggregates_table(cursor)
+    # mock_trades에는 손익률 컬럼이 없으므로 증거금(진입가 * 수량 / 레버리지) 대비로 계산
+    backfill_aggregates(cursor, """
+        SELECT action, leverage, date(exit_timestamp) AS closed_day,
+               COALESCE(profit_loss, 0) AS pnl,
+               COALESCE(profit_loss / (entry_price * amount / leverage) * 100, 0) AS pct
+        FROM mock_trades WHERE status = 'CLOSED'
+    """)
+
+
+def _mock_search(cursor):
+    setup_search_index(cursor, "mock_ai_analysis", "reasoning")
+    setup_search_index(cursor, "trade_adjustments", "reasoning")
+
+
+MOCK_MIGRATIONS = [
+    (1, "prompt_history epoch-ms columns and indexes", (), _prompt_history),
+    (2, "status/time/trade_id indexes", ("mock_trades", "mock_ai_analysis", "trade_adjustments"), _mock_indexes),
+    (3, "epoch-ms time columns", ("mock_trades", "mock_ai_analysis", "trade_adjustments"), _mock_epoch_ms),
+    (4, "performance aggregates", ("mock_trades",), _mock_aggregates),
+    (5, "equity samples and rollups", (), setup_equity_tables),
+    (6, "full-text search index", ("mock_ai_analysis", "trade_adjustments"), _mock_search),
+    (7, "prompt version attribution", ("mock_trades", "mock_ai_analysis", "prompt_history"), setup_prompt_attribution),
+]
+
+
+def get_schema_version(db_file):
+    """적용된 마지막 마이그레이션 버전을 반환합니다 (없으면 0)."""
+    cursor = get_connection(db_file).cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT NOT NULL)")
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    return cursor.fetchone()[0] or 0
+
+
+def run_migrations(db_file, migrations):
+    """
+    아직 적용되지 않은 마이그레이션을 버전 순서대로 실행합니다
+
+    각 마이그레이션은 버전 기록과 함께 하나의 트랜잭션으로 적용됩니다.
+    필요한 테이블이 아직 없으면(예: 봇보다 대시보드가 먼저 실행됨) 그 버전부터는 다음 실행으로 미룹니다.
+
+    매개변수:
+        db_file (str): 데이터베이스 파일 경로
+        migrations (list): (버전, 설명, 필요한 테이블, 적용 함수) 목록
+
+    반환값:
+        int: 적용 후 스키마 버전
+    """
+    version = get_schema_version(db_file)
+    conn = get_connection(db_file)
+    cursor = conn.cursor()
+    for target, description, required_tables, apply in sorted(migrations, key=lambda m: m[0]):
+        if target <= version:
+            continue
+        # 다른 프로세스와 동시에 실행되지 않도록 쓰기 잠금을 먼저 잡음
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("SELECT 1 FROM schema_version WHERE version = ?", (target,))
+            if cursor.fetchone():
+                cursor.execute("COMMIT")  # 다른 프로세스가 먼저 적용함
+                version = target
+                continue
+            if not all(_table_exists(cursor, table) for table in required_tables):
+                cursor.execute("ROLLBACK")
+                break
+            apply(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (target, description, datetime.now().isoformat())
+            )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        version = target
+        print(f"Schema migration {target} applied to {db_file}: {description}")
+    return version
+
+
+if __name__ == "__main__":
+    # 합성 100만 행 DB에서 주요 쿼리의 실행 계획 확인
+    import os
+    import sys
+    import time
+    import random
+    import shutil
+    import tempfile
+    from datetime import timedelta
+
+    ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    work_dir = tempfile.mkdtemp()
+    db_file = os.path.join(work_dir, "plan_check.db")
+    conn = get_connection(db_file)
+    cursor = conn.cursor()
+    cursor.execute("""
+    CREATE TABLE trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, action TEXT NOT NULL,
+        entry_price REAL NOT NULL, amount REAL NOT NULL, leverage INTEGER NOT NULL,
+        sl_price REAL NOT NULL, tp_price REAL NOT NULL, sl_percentage REAL NOT NULL, tp_percentage REAL NOT NULL,
+        position_size_percentage REAL NOT NULL, investment_amount REAL NOT NULL, status TEXT DEFAULT 'OPEN',
+        exit_price REAL, exit_timestamp TEXT, profit_loss REAL, profit_loss_percentage REAL
+    )""")
+    cursor.execute("""
+    CREATE TABLE ai_analysis (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, current_price REAL NOT NULL,
+        direction TEXT NOT NULL, recommended_position_size REAL NOT NULL, recommended_leverage INTEGER NOT NULL,
+        stop_loss_percentage REAL NOT NULL, take_profit_percentage REAL NOT NULL, reasoning TEXT NOT NULL, trade_id INTEGER
+    )""")
+
+    start = time.perf_counter()
+    base = datetime.now() - timedelta(minutes=ROWS)
+    cursor.execute("BEGIN")
+    cursor.executemany(
+        "INSERT INTO trades (timestamp, action, entry_price, amount, leverage, sl_price, tp_price, sl_percentage, tp_percentage, "
+        "position_size_percentage, investment_amount, status, exit_price, exit_timestamp, profit_loss, profit_loss_percentage) "
+        "VALUES (?, ?, 100, 1, 5, 95, 110, 0.05, 0.1, 0.1, 100, ?, 101, ?, ?, ?)",
+        (
+            ((base + timedelta(minutes=i)).isoformat(), random.choice(("long", "short")),
+             "OPEN" if i == ROWS - 1 else "CLOSED",
+             None if i == ROWS - 1 else (base + timedelta(minutes=i + 30)).isoformat(),
+             random.uniform(-10, 10), random.uniform(-5, 5))
+            for i in range(ROWS)
+        )
+    )
+    cursor.executemany(
+        "INSERT INTO ai_analysis (timestamp, current_price, direction, recommended_position_size, recommended_leverage, "
+        "stop_loss_percentage, take_profit_percentage, reasoning, trade_id) VALUES (?, 100, 'LONG', 0.1, 5, 0.05, 0.1, '', ?)",
+        (((base + timedelta(minutes=i)).isoformat(), i + 1) for i in range(ROWS))
+    )
+    cursor.execute("COMMIT")
+    print(f"Synthetic DB: {ROWS:,} trades + {ROWS:,} analyses in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    run_migrations(db_file, TRADING_MIGRATIONS)
+    print(f"Migrations (indexes + backfill): {time.perf_counter() - start:.1f}s")
+
+    since_ms = epoch_ms(datetime.now() - timedelta(days=7))
+    checks = [
+        ("latest open trade", "SELECT id FROM trades WHERE status = 'OPEN' ORDER BY timestamp DESC LIMIT 1", (), "idx_trades_status_timestamp"),
+        ("7-day summary", "SELECT COUNT(*), SUM(profit_loss), AVG(profit_loss_percentage) FROM trades "
+         "WHERE exit_timestamp IS NOT NULL AND timestamp_ms >= ?", (since_ms,), "COVERING INDEX idx_trades_timestamp_ms"),
+        ("closed history", "SELECT t.id, a.reasoning FROM trades t LEFT JOIN ai_analysis a ON t.id = a.trade_id "
+         "WHERE t.status = 'CLOSED' ORDER BY t.timestamp DESC LIMIT 10", (), "idx_ai_analysis_trade_id"),
+        ("direction metrics", "SELECT action, COUNT(*), SUM(profit_loss), AVG(profit_loss_percentage) FROM trades "
+         "WHERE status = 'CLOSED' GROUP BY action", (), "COVERING INDEX idx_trades_status_action_pnl"),
+        ("analysis log", "SELECT * FROM ai_analysis ORDER BY timestamp DESC LIMIT 20", (), "idx_ai_analysis_timestamp"),
+        ("aggregates by direction", "SELECT * FROM performance_aggregates WHERE scope = 'direction'", (), "PRIMARY KEY"),
+        ("aggregates last 7 days", "SELECT SUM(trades), SUM(pnl_sum) FROM performance_aggregates WHERE scope = 'day' AND bucket >= ?",
+         ((datetime.now() - timedelta(days=7)).date().isoformat(),), "PRIMARY KEY"),
+    ]
+    failed = False
+    for name, sql, params, expected in checks:
+        plan = " | ".join(row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall())
+        start = time.perf_counter()
+        cursor.execute(sql, params).fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        ok = expected in plan
+        failed |= not ok
+        print(f"[{'OK' if ok else 'FAIL'}] {name}: {elapsed:.2f} ms | {plan}")
+
+    close_connections()
+    shutil.rmtree(work_dir)
+    sys.exit(1 if failed else 0)
@@ -2,12 +2,22 @@ import streamlit as st
 import pandas as pd
 import sqlite3
 import os
-import subprocess
-import ccxt
+import time
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
 from streamlit_autorefresh import st_autorefresh
 from login_page import render_login_page, initialize_password, set_password
+from db import get_connection, snapshot, transaction, data_version
+from migrations import run_migrations, epoch_ms, MOCK_MIGRATIONS
+from equity import get_equity_curve
+from search_index import search_all
+from storage import TradingStore
+from prompt_versions import get_prompt_version_stats
+from shards import ShardReader
+from ticker_feed import TickerPoller
+from log_tail import make_tail, MAX_LINES
+from news_provider import NEWS_DB_FILE
 
 
 # --- 1. 설정 및 초기화 ---
@@ -25,15 +35,23 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# ccxt 초기화 (가격 조회용)
-try:
-    exchange = ccxt.binance({'options': {'defaultType': 'future'}})
-    symbol = "BTC/USDT"
-except Exception as e:
-    st.error(f"CCXT 초기화 실패: {e}")
+symbol = "BTC/USDT"
+
+
+# 시세는 서버 프로세스당 하나의 백그라운드 스레드가 갱신하고 모든 세션이 공유 (렌더링 중 REST 호출 없음)
+@st.cache_resource
+def get_ticker_poller():
+    return TickerPoller(symbol).start()
+
+
+# 서비스별 로그 버퍼 (서버 프로세스당 하나, journald 커서/파일 위치를 기억해 새 줄만 읽음)
+@st.cache_resource
+def get_log_tail(service_name):
+    return make_tail(service_name)
 
 # 파일 경로 및 설정
 DB_FILE = "/home/ubuntu/binance_futures/mock_trading.db"
+store = TradingStore("mock", DB_FILE, readonly=True)  # 모의 거래/분석 조회 (봇과 같은 저장소 계층)
 ACTIVE_PROMPT_FILE = "/home/ubuntu/binance_futures/active_prompt.txt"
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
 
@@ -45,34 +63,24 @@ def setup_files_and_db():
     # if not os.path.exists(PASSWORD_FILE):
     #     with open(PASSWORD_FILE, "w") as f: f.write("admin123")
     
-    # DB 테이블 생성
-    conn = sqlite3.connect(DB_FILE)
+    # DB 테이블 생성 (prompt_history는 마이그레이션에서 생성, 봇 테이블이 없으면 나머지는 봇 시작 시 적용)
+    run_migrations(DB_FILE, MOCK_MIGRATIONS)
+    conn = get_connection(DB_FILE)
     cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS prompt_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        content TEXT NOT NULL,
-        start_time TEXT NOT NULL,
-        end_time TEXT,
-        is_favorite INTEGER DEFAULT 0
-    )
-    """)
     # active_prompt.txt 파일이 없으면 prompts.py에서 가져와 생성
     if not os.path.exists(ACTIVE_PROMPT_FILE):
         try:
             from prompts import INITIAL_SYSTEM_PROMPT
             with open(ACTIVE_PROMPT_FILE, "w") as f: f.write(INITIAL_SYSTEM_PROMPT)
             # DB에도 첫 기록 삽입
+            now = datetime.now()
             cursor.execute(
-                "INSERT INTO prompt_history (content, start_time) VALUES (?, ?)",
-                (INITIAL_SYSTEM_PROMPT, datetime.now().isoformat())
+                "INSERT INTO prompt_history (content, start_time, start_time_ms) VALUES (?, ?, ?)",
+                (INITIAL_SYSTEM_PROMPT, now.isoformat(), epoch_ms(now))
             )
         except ImportError:
             st.error("prompts.py 파일이 없거나 INITIAL_SYSTEM_PROMPT 변수가 없습니다.")
 
-    conn.commit()
-    conn.close()
-
 # def get_password():
 #     with open(PASSWORD_FILE, "r") as f: return f.read().strip()
 
@@ -84,81 +92,89 @@ def get_active_prompt():
     with open(ACTIVE_PROMPT_FILE, "r") as f: return f.read()
 
 def update_active_prompt(new_prompt_content):
-    now_iso = datetime.now().isoformat()
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE prompt_history SET end_time = ? WHERE end_time IS NULL", (now_iso,))
-    cursor.execute("INSERT INTO prompt_history (content, start_time) VALUES (?, ?)", (new_prompt_content, now_iso))
-    conn.commit()
-    conn.close()
+    now = datetime.now()
+    now_iso, now_ms = now.isoformat(), epoch_ms(now)
+    with transaction(DB_FILE, label="prompt_update") as cursor:
+        cursor.execute("UPDATE prompt_history SET end_time = ?, end_time_ms = ? WHERE end_time IS NULL", (now_iso, now_ms))
+        cursor.execute("INSERT INTO prompt_history (content, start_time, start_time_ms) VALUES (?, ?, ?)", (new_prompt_content, now_iso, now_ms))
     with open(ACTIVE_PROMPT_FILE, "w") as f: f.write(new_prompt_content)
 
 def get_prompt_history():
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection(DB_FILE, readonly=True)
     query = "SELECT * FROM prompt_history ORDER BY is_favorite DESC, start_time DESC"
     df = pd.read_sql_query(query, conn)
-    conn.close()
     return df
 
 def toggle_favorite(prompt_id, current_status):
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection(DB_FILE)
     cursor = conn.cursor()
     new_status = 1 if current_status == 0 else 0
     cursor.execute("UPDATE prompt_history SET is_favorite = ? WHERE id = ?", (new_status, prompt_id))
-    conn.commit()
-    conn.close()
     st.rerun()
 
 
 def delete_prompt(prompt_id):
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection(DB_FILE)
     cursor = conn.cursor()
     cursor.execute("DELETE FROM prompt_history WHERE id = ?", (prompt_id,))
-    conn.commit()
-    conn.close()
+
+
+# 대시보드 KPI (지갑 잔고, 누적 성과)를 한 번의 쿼리로 계산
+KPI_QUERY = """
+SELECT
+    (SELECT usdt_balance FROM mock_wallet WHERE id = 1) AS wallet_balance,
+    COALESCE(overall.trades, 0) AS total_trades,
+    COALESCE(overall.wins, 0) AS winning_trades,
+    COALESCE(overall.pnl_sum, 0) AS total_pnl
+FROM (SELECT 1) LEFT JOIN performance_aggregates AS overall ON overall.scope = 'overall'
+"""
 
 
 def fetch_data():
-    conn = get_db_connection()
-    conn.row_factory = sqlite3.Row
-    try:
-        total_pnl = pd.read_sql_query("SELECT SUM(profit_loss) as total_pnl FROM mock_trades WHERE status = 'CLOSED'", conn).iloc[0]['total_pnl'] or 0
-        closed_trades_df = pd.read_sql_query("SELECT * FROM mock_trades WHERE status = 'CLOSED'", conn)
-        wallet_balance = pd.read_sql_query("SELECT usdt_balance FROM mock_wallet LIMIT 1", conn).iloc[0]['usdt_balance']
-        open_trade_df = pd.read_sql_query("SELECT * FROM mock_trades WHERE status = 'OPEN' ORDER BY timestamp DESC LIMIT 1", conn)
-        trade_history_df = pd.read_sql_query("SELECT * FROM mock_trades WHERE status = 'CLOSED' ORDER BY exit_timestamp DESC LIMIT 20", conn)
-        ai_log_df = pd.read_sql_query("SELECT * FROM mock_ai_analysis ORDER BY timestamp DESC LIMIT 20", conn)
-        
-        total_trades = len(closed_trades_df)
-        winning_trades = len(closed_trades_df[closed_trades_df['profit_loss'] > 0])
-        win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-        
-        # 현재 열려있는 거래의 조정 기록 조회
-        adjustment_history_df = pd.DataFrame()
-        if not open_trade_df.empty:
-            open_trade_id = open_trade_df.iloc[0]['id']
-            adjustment_history_df = pd.read_sql_query(f"SELECT * FROM trade_adjustments WHERE trade_id = {open_trade_id} ORDER BY timestamp DESC", conn)
+    # 모든 세션(브라우저 탭)이 같은 캐시를 공유: 봇이 커밋하지 않았으면(data_version 그대로) DB를 다시 읽지 않음
+    return fetch_dashboard_data(data_version(DB_FILE))
 
-    except (pd.errors.DatabaseError, IndexError, KeyError):
+
+@st.cache_data(ttl=60, max_entries=4, show_spinner=False)
+def fetch_dashboard_data(version):
+    try:
+        # 읽기 전용 스냅샷: 모든 쿼리가 봇의 쓰기와 섞이지 않은 같은 시점의 데이터를 봄
+        with snapshot(DB_FILE) as conn:
+            # 누적 성과는 거래 종료 시 갱신되는 집계 테이블에서 한 행만 읽음
+            kpi = conn.execute(KPI_QUERY).fetchone()
+            open_trade_df = store.trades_frame(status='OPEN', limit=1)
+            trade_history_df = store.trades_frame(status='CLOSED', order_by='exit_timestamp', limit=20)
+            ai_log_df = store.analyses_frame(limit=20)
+            # 미리 집계된 구간(1m/1h/1d)에서 전체 기간을 수백 개 이하의 점으로 읽음
+            equity_curve_df = get_equity_curve(DB_FILE)
+            
+            wallet_balance = kpi[0] if kpi[0] is not None else 10000
+            total_trades, winning_trades, total_pnl = int(kpi[1]), int(kpi[2]), float(kpi[3])
+            win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
+            
+            # 현재 열려있는 거래의 조정 기록 조회
+            adjustment_history_df = pd.DataFrame()
+            if not open_trade_df.empty:
+                open_trade_id = int(open_trade_df.iloc[0]['id'])
+                adjustment_history_df = pd.read_sql_query(
+                    "SELECT * FROM trade_adjustments WHERE trade_id = ? ORDER BY timestamp DESC", conn, params=(open_trade_id,)
+                )
+
+    except (pd.errors.DatabaseError, sqlite3.OperationalError, IndexError, KeyError):
         # DB가 비어있거나 테이블이 없을 때를 대비한 기본값 설정
         return {
             "wallet_balance": 10000, "total_pnl": 0, "win_rate": 0, "total_trades": 0,
             "winning_trades": 0, "open_trade": pd.DataFrame(), "trade_history": pd.DataFrame(), 
-            "ai_log": pd.DataFrame(), "adjustment_history": pd.DataFrame()
+            "ai_log": pd.DataFrame(), "adjustment_history": pd.DataFrame(), "equity_curve": pd.DataFrame()
         }
-    finally:
-        conn.close()
     
     return {
         "wallet_balance": wallet_balance, "total_pnl": total_pnl, "win_rate": win_rate,
         "total_trades": total_trades, "winning_trades": winning_trades, "open_trade": open_trade_df,
-        "trade_history": trade_history_df, "ai_log": ai_log_df, "adjustment_history": adjustment_history_df
+        "trade_history": trade_history_df, "ai_log": ai_log_df, "adjustment_history": adjustment_history_df,
+        "equity_curve": equity_curve_df
     }
 
-def get_db_connection():
-    """데이터베이스 커넥션을 반환합니다."""
-    return sqlite3.connect(DB_FILE, timeout=10)
-
 # --- 3. UI 페이지 렌더링 함수 ---
 
 def render_dashboard_page():
@@ -249,15 +265,35 @@ def render_dashboard_page():
         </div>
     </div>
     """, unsafe_allow_html=True)
+
+    # --- 봇별 성과 (샤드가 여러 개일 때) ---
+    shard_reader = ShardReader("mock", base_dir=os.path.dirname(DB_FILE))
+    if len(shard_reader.shards) > 1:
+        st.subheader("🤖 봇별 성과 (전체 샤드)")
+        shard_summary_df = shard_reader.shard_summary()
+        shard_totals = shard_reader.totals(shard_summary_df)
+        st.markdown(
+            f"**{shard_totals['shards']}개 봇** | 총 거래 {shard_totals['trades']}회 | 승률 {shard_totals['win_rate']:.1f}% | "
+            f"총 손익 ${shard_totals['pnl_sum']:,.2f} | 열린 포지션 {shard_totals['open_positions']}개"
+        )
+        if not shard_summary_df.empty:
+            st.dataframe(shard_summary_df.rename(columns={
+                "shard": "봇", "trades": "거래 수", "wins": "승", "win_rate": "승률 (%)", "pnl_sum": "누적 손익 ($)",
+                "open_positions": "열린 포지션", "last_trade": "마지막 진입", "usdt_balance": "지갑 잔고 ($)"
+            }).round(2), hide_index=True, use_container_width=True)
+
+    # --- 평가 자산 추이 ---
+    if not data['equity_curve'].empty:
+        st.subheader("📈 평가 자산 추이")
+        equity_chart = data['equity_curve'].set_index('timestamp')[['close']].rename(columns={'close': '평가 자산 (USDT)'})
+        st.line_chart(equity_chart, height=250)
     
     # --- 현재 포지션 정보 ---
     st.subheader("🚀 현재 포지션 (OPEN)")
     if not data['open_trade'].empty:
         trade = data['open_trade'].iloc[0]
-        try:
-            current_price = exchange.fetch_ticker(symbol)['last']
-        except Exception:
-            current_price = trade['entry_price']
+        # 첫 시세를 받기 전이거나 시세가 오래됐으면 진입가 기준으로 표시
+        current_price = get_ticker_poller().last_price(default=trade['entry_price'])
 
         entry_time = datetime.fromisoformat(trade['timestamp']).strftime('%y-%m-%d %H:%M')
         margin = (trade['entry_price'] * trade['amount']) / trade['leverage']
@@ -352,6 +388,20 @@ def render_dashboard_page():
             st.info("거래 내역이 없습니다.")
     with col2:
         st.subheader("🧠 AI 분석 로그")
+
+        # 분석 근거, 포지션 조정 근거, 뉴스 헤드라인 전문 검색 (FTS5, 관련도 순)
+        search_text = st.text_input("🔎 기록 검색", key="record_search", placeholder="예: ETF, liquidation")
+        if search_text:
+            start = time.perf_counter()
+            results = search_all([
+                (DB_FILE, ["mock_ai_analysis", "trade_adjustments"]),
+                (NEWS_DB_FILE, ["news_headlines"]),
+            ], search_text)
+            st.caption(f"{len(results)}건 ({(time.perf_counter() - start) * 1000:.0f} ms)")
+            source_labels = {"mock_ai_analysis": "AI 분석", "trade_adjustments": "포지션 조정", "news_headlines": "뉴스"}
+            for _, row in results.iterrows():
+                st.markdown(f"`{source_labels[row['source']]}` {str(row['timestamp'])[:16].replace('T', ' ')}  \n{row['snippet']}")
+
         if not data['ai_log'].empty:
             for _, row in data['ai_log'].iterrows():
                 try:
@@ -395,6 +445,29 @@ def render_prompt_page():
         else:
             st.warning("변경된 내용이 없습니다.")
 
+    st.markdown("---")
+    st.subheader("📊 프롬프트 버전별 성과")
+    # 분석/거래에 기록된 prompt_id 인덱스로 바로 집계 (진입 시점에 사용 중이던 프롬프트 기준)
+    try:
+        prompt_stats_df = get_prompt_version_stats(DB_FILE)
+    except (pd.errors.DatabaseError, sqlite3.OperationalError):
+        prompt_stats_df = pd.DataFrame()
+    if prompt_stats_df.empty:
+        st.info("아직 프롬프트 버전별 기록이 없습니다.")
+    else:
+        display_df = pd.DataFrame({
+            "버전": prompt_stats_df["prompt_id"].map(lambda prompt_id: f"#{prompt_id}"),
+            "시작": pd.to_datetime(prompt_stats_df["start_time"]).dt.strftime('%y-%m-%d %H:%M'),
+            "거래 수": prompt_stats_df["trades"],
+            "승률 (%)": prompt_stats_df["win_rate"].round(1),
+            "누적 손익 ($)": prompt_stats_df["pnl_sum"].round(2),
+            "평균 손익 ($)": prompt_stats_df["avg_pnl"].round(2),
+            "판단 (L/S/N)": prompt_stats_df.apply(
+                lambda row: f"{row['long_count']}/{row['short_count']}/{row['no_position_count']}", axis=1
+            ),
+        })
+        st.dataframe(display_df, hide_index=True, use_container_width=True)
+
     st.markdown("---")
     st.subheader("📚 최근 프롬프트 목록")
     history_df = get_prompt_history()
@@ -443,25 +516,26 @@ def render_log_viewer_page():
     
     service_name = "tradingbot" if "자동매매 봇" in log_choice else "dashboard"
 
-    log_lines = st.number_input("가져올 최근 로그 줄 수:", min_value=10, max_value=1000, value=100, step=10)
+    log_lines = st.number_input("가져올 최근 로그 줄 수:", min_value=10, max_value=MAX_LINES, value=100, step=10)
 
+    # 서비스별 링 버퍼는 모든 세션이 공유하고, 이 세션은 마지막으로 받은 순번 이후의 줄만 가져옴
+    tail = get_log_tail(service_name)
+    view = st.session_state.setdefault(f"log_view_{service_name}", {"seq": 0, "lines": deque(maxlen=MAX_LINES), "text": ""})
     try:
-        # journalctl 명령어를 실행하여 로그를 가져옴
-        # --no-pager 옵션은 출력이 잘리지 않도록 함
-        command = f"sudo journalctl -u {service_name} -n {log_lines} --no-pager"
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            log_lines = result.stdout.strip().splitlines()
-            reversed_logs = log_lines[::-1] 
-            log_content = "\n".join(reversed_logs)
-            
-            st.text_area("Log Output (최신 내용이 위쪽에 표시됩니다)", log_content, height=500, key="log_output_area")
-        else:
-            st.error(f"로그를 가져오는 데 실패했습니다:\n{result.stderr}")
-
+        tail.poll()
     except Exception as e:
-        st.error(f"로그 조회 중 예외가 발생했습니다: {e}")
+        st.error(f"로그를 가져오는 데 실패했습니다:\n{e}")
+
+    new_lines, view["seq"], reset = tail.since(view["seq"])
+    if reset:
+        view["lines"].clear()
+    if new_lines or reset or view.get("shown") != log_lines:
+        view["lines"].extend(new_lines)
+        # 최신 내용이 위쪽에 오도록 뒤집어 표시 (새 줄이 있을 때만 다시 만듦)
+        view["text"] = "\n".join(reversed(list(view["lines"])[-log_lines:]))
+        view["shown"] = log_lines
+
+    st.text_area("Log Output (최신 내용이 위쪽에 표시됩니다)", view["text"], height=500, key="log_output_area")
     
     st_autorefresh(interval=3000, key="log_refresher") # 로그 페이지는 3초마다 새로고침
 
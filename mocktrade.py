@@ -16,13 +16,24 @@ import os
 import math
 import time
 import pandas as pd
-import requests
 import json
 import sqlite3
 from dotenv import load_dotenv
 from openai import OpenAI
 from datetime import datetime, timedelta # timedelta 추가
-from prompts import SYSTEM_PROMPT_UPDATE # 수정용 프롬프트 추가
+from model_router import route_completion # 호출 지점별 모델 라우팅
+from position_conversation import new_session, request_update_decision # 재분석 대화 상태 유지
+from decision_memo import market_fingerprint, lookup_decision, store_decision, print_memo_stats # 시장 상태 변화 없을 때 판단 재사용
+from news_provider import get_news # 뉴스 제공자 통합, TTL 캐시 및 중복 제거
+from news_sentiment import get_news_sentiment # 로컬 헤드라인 감성 점수 요약
+from db import get_connection, print_transaction_stats # 스레드별 재사용 SQLite 연결 (WAL), 트랜잭션 묶음
+from migrations import run_migrations, epoch_ms, MOCK_MIGRATIONS # 스키마 버전 관리 및 인덱스
+from storage import TradingStore, TradeRecord, AnalysisRecord # 거래/분석 기록 공용 저장소
+from position_state import PositionState # 열린 포지션/지갑 메모리 상태
+from prompt_versions import get_active_prompt_id # 분석/거래에 프롬프트 버전 기록
+from shards import shard_file, DEFAULT_SHARD # 전략(봇)별 DB 샤드
+from write_behind import enqueue, print_write_behind_stats # 거래와 무관한 기록은 백그라운드에서 커밋
+from equity import start_equity_sampler # 평가 자산 시계열 샘플링
 
 ACTIVE_PROMPT_FILE = "/home/ubuntu/binance_futures/active_prompt.txt"
 
@@ -31,26 +42,36 @@ ACTIVE_PROMPT_FILE = "/home/ubuntu/binance_futures/active_prompt.txt"
 load_dotenv()
 
 # Binance API (Public data only)
-exchange = ccxt.binance({
+exchange_config = {
     'enableRateLimit': True,
     'options': {
         'defaultType': 'future',
         'adjustForTimeDifference': True
     }
-})
+}
+exchange = ccxt.binance(exchange_config)
+# 자산 시계열 샘플러 스레드 전용 클라이언트 (ccxt 클라이언트는 스레드 간 공유에 안전하지 않음)
+sampler_exchange = ccxt.binance(exchange_config)
 
 symbol = "BTC/USDT"
 
 # OpenAI API
 client = OpenAI()
 
-# SERP API (Optional)
-# serp_api_key = os.getenv("SERP_API_KEY")
-
 # Mock Database
-DB_FILE = "mock_trading.db"
+DB_FILE = shard_file("mock") # BOT_SHARD 환경 변수가 있으면 전략별 샤드 파일 (없으면 mock_trading.db)
+PROMPT_DB_FILE = shard_file("mock", DEFAULT_SHARD) # 프롬프트 이력은 대시보드가 기본 파일에만 기록 (샤드 봇도 여기서 활성 프롬프트 ID를 읽음)
 INITIAL_BUDGET = 10000.0  # 모의 투자 초기 자본 (USDT)
 
+# 메인 루프 주기 (초)와 포지션 재분석 간격
+IN_POSITION_SLEEP = 600     # 포지션 있을 때 10분
+NO_POSITION_SLEEP = 3600    # 포지션 없을 때 1시간
+RE_ANALYSIS_INTERVAL = timedelta(hours=2)
+# 판단 재사용 유효 시간: 다음 판단 시점까지 한 주기 + 여유 (decision_memo 기본값 30분보다 루프 주기가 길기 때문)
+ENTRY_MEMO_MAX_AGE = NO_POSITION_SLEEP + IN_POSITION_SLEEP
+POSITION_MEMO_MAX_AGE = RE_ANALYSIS_INTERVAL.total_seconds() + 2 * IN_POSITION_SLEEP
+store = TradingStore("mock", DB_FILE) # 거래/분석 기록 저장소 (autotrade, 대시보드와 공용)
+
 # ===== 데이터베이스 관련 함수 =====
 def setup_database():
     """
@@ -59,7 +80,7 @@ def setup_database():
     - mock_trades: 가상 거래 기록
     - mock_ai_analysis: AI 분석 결과
     """
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection(DB_FILE)
     cursor = conn.cursor()
 
     # 가상 지갑 테이블
@@ -118,90 +139,80 @@ def setup_database():
     )
     ''')
 
-    conn.commit()
-    conn.close()
     print("모의 투자 데이터베이스 설정 완료.")
 
 def get_wallet_balance():
     """가상 지갑의 현재 USDT 잔고를 가져옵니다."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection(DB_FILE)
     cursor = conn.cursor()
     cursor.execute("SELECT usdt_balance FROM mock_wallet WHERE id = 1")
     result = cursor.fetchone()
-    conn.close()
     return result[0] if result else 0
 
-def update_wallet_balance(new_balance):
-    """가상 지갑의 잔고를 업데이트합니다."""
-    conn = sqlite3.connect(DB_FILE)
+def add_wallet_balance(amount):
+    """가상 지갑 잔고에 금액을 더하고 새 잔고를 반환합니다. (읽기-수정-쓰기 없이 한 문장으로 갱신)"""
+    conn = get_connection(DB_FILE)
     cursor = conn.cursor()
-    cursor.execute("UPDATE mock_wallet SET usdt_balance = ? WHERE id = 1", (new_balance,))
-    conn.commit()
-    conn.close()
+    cursor.execute("UPDATE mock_wallet SET usdt_balance = usdt_balance + ? WHERE id = 1", (amount,))
+    cursor.execute("SELECT usdt_balance FROM mock_wallet WHERE id = 1")
+    result = cursor.fetchone()
+    return result[0] if result else 0
+
+# 열린 포지션/지갑 잔고/최근 분석 메모리 상태 (DB write-through, 루프의 반복 조회 제거)
+position_state = PositionState(store, load_wallet=get_wallet_balance, add_wallet=add_wallet_balance)
+
+def build_analysis_record(analysis_data, trade_id=None):
+    """AI 분석 결과 dict를 저장용 레코드로 변환합니다."""
+    return AnalysisRecord(
+        current_price=analysis_data['current_price'],
+        direction=analysis_data['direction'],
+        reasoning=analysis_data['reasoning'],
+        trade_id=trade_id,
+        prompt_id=analysis_data.get('prompt_id')
+    )
+
+def build_trade_record(trade_data):
+    """가상 거래 정보 dict를 저장용 레코드로 변환합니다."""
+    return TradeRecord(
+        action=trade_data['action'],
+        entry_price=trade_data['entry_price'],
+        amount=trade_data['amount'],
+        leverage=trade_data['leverage'],
+        sl_price=trade_data['sl_price'],
+        tp_price=trade_data['tp_price'],
+        prompt_id=trade_data.get('prompt_id')
+    )
 
 def save_ai_analysis(analysis_data, trade_id=None):
     """AI 분석 결과를 DB에 저장합니다."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
-    INSERT INTO mock_ai_analysis (timestamp, current_price, direction, reasoning, trade_id) 
-    VALUES (?, ?, ?, ?, ?)
-    ''', (
-        datetime.now().isoformat(),
-        analysis_data['current_price'],
-        analysis_data['direction'],
-        analysis_data['reasoning'],
-        trade_id
-    ))
-    analysis_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return analysis_id
+    return position_state.record_analysis(build_analysis_record(analysis_data, trade_id))
 
 def save_mock_trade(trade_data):
-    """가상 거래 정보를 DB에 저장합니다."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
-    INSERT INTO mock_trades (timestamp, action, entry_price, amount, leverage, sl_price, tp_price) 
-    VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        datetime.now().isoformat(),
-        trade_data['action'],
-        trade_data['entry_price'],
-        trade_data['amount'],
-        trade_data['leverage'],
-        trade_data['sl_price'],
-        trade_data['tp_price']
-    ))
-    trade_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return trade_id
+    """가상 거래 정보를 DB에 저장하고 열린 포지션으로 기록합니다."""
+    return position_state.open_position(build_trade_record(trade_data))
+
+def save_trade_adjustment(trade_id, action, new_tp_price, new_sl_price, reasoning):
+    """AI의 재분석 판단(CLOSE/ADJUST)을 백그라운드 기록 큐에 넣습니다."""
+    now = datetime.now()
+    enqueue(DB_FILE, """
+        INSERT INTO trade_adjustments (trade_id, timestamp, timestamp_ms, action, new_tp_price, new_sl_price, reasoning)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (trade_id, now.isoformat(), epoch_ms(now), action, new_tp_price, new_sl_price, reasoning))
 
 def get_open_trade():
-    """현재 열려있는 가상 거래 정보를 가져옵니다."""
-    conn = sqlite3.connect(DB_FILE)
-    # 결과를 dict 형태로 받기 위해 row_factory 설정
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM mock_trades WHERE status = 'OPEN' ORDER BY timestamp DESC LIMIT 1")
-    trade = cursor.fetchone()
-    conn.close()
-    return dict(trade) if trade else None
+    """현재 열려있는 가상 거래 정보를 가져옵니다. (DB 조회 없이 메모리 상태에서 반환)"""
+    return position_state.open_trade
 
 # mocktrade.py의 close_mock_trade 함수
 
 def close_mock_trade(trade_id, exit_price):
     """가상 거래를 종료하고 손익을 계산하여 DB를 업데이트합니다."""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM mock_trades WHERE id = ?", (trade_id,))
-    trade = cursor.fetchone()
-    if not trade:
-        conn.close()
+    # 열린 포지션은 메모리 상태에서 읽음 (다른 거래면 DB에서 조회)
+    trade = get_open_trade()
+    if not trade or trade['id'] != trade_id:
+        record = store.get_trade(trade_id)
+        trade = store.as_dict(record) if record else None
+    if not trade or trade['status'] == 'CLOSED':
         return
 
     # 실제 투자 원금(margin) 계산
@@ -212,48 +223,44 @@ def close_mock_trade(trade_id, exit_price):
         profit_loss = (exit_price - trade['entry_price']) * trade['amount']
     else:  # short
         profit_loss = (trade['entry_price'] - exit_price) * trade['amount']
+    pnl_percentage = (profit_loss / investment_margin) * 100 if investment_margin > 0 else 0
     
-    # DB 업데이트
-    cursor.execute('''
-    UPDATE mock_trades
-    SET status = 'CLOSED', exit_price = ?, exit_timestamp = ?, profit_loss = ?
-    WHERE id = ?
-    ''', (exit_price, datetime.now().isoformat(), profit_loss, trade_id))
-    
-    conn.commit()
-    conn.close()
-
-    # 지갑 잔고 업데이트
-    current_balance = get_wallet_balance()
-    new_balance = current_balance + profit_loss
-    update_wallet_balance(new_balance)
+    # 거래 종료, 성과 집계, 지갑 잔고 갱신을 하나의 트랜잭션으로 처리 (이미 종료된 거래면 변경 없음)
+    if position_state.close_position(trade_id, exit_price, profit_loss, pnl_percentage) is None:
+        return
     
     # 결과 출력
-    pnl_percentage = (profit_loss / investment_margin) * 100 if investment_margin > 0 else 0
     print(f"\n{'='*10} MOCK POSITION CLOSED {'='*10}")
     print(f"Trade ID: {trade['id']} ({trade['action'].upper()})")
     print(f"Entry: ${trade['entry_price']:,.2f} | Exit: ${exit_price:,.2f}")
     print(f"P/L: ${profit_loss:,.2f} ({pnl_percentage:.2f}%)")
-    print(f"Wallet Balance: ${new_balance:,.2f}")
+    print(f"Wallet Balance: ${position_state.wallet_balance:,.2f}")
     print("="*42)
+    print_transaction_stats()
+    print_write_behind_stats()
+    position_state.print_stats()
+
+
+def sample_equity():
+    """가상 지갑 잔고와 열린 거래의 미실현 손익으로 평가 자산을 계산합니다. (자산 시계열 샘플러에서 호출)"""
+    balance = position_state.wallet_balance
+    price = sampler_exchange.fetch_ticker(symbol)['last']
+    trade = get_open_trade()
+    unrealized_pnl = 0.0
+    if trade:
+        if trade['action'] == 'long':
+            unrealized_pnl = (price - trade['entry_price']) * trade['amount']
+        else:
+            unrealized_pnl = (trade['entry_price'] - price) * trade['amount']
+    return {"equity": balance + unrealized_pnl, "unrealized_pnl": unrealized_pnl, "price": price}
 
 
 def get_historical_trading_data(limit=10):
     """과거 거래 및 AI 분석 결과를 가져옵니다."""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('''
-    SELECT t.*, a.reasoning 
-    FROM mock_trades t
-    LEFT JOIN mock_ai_analysis a ON t.id = a.trade_id
-    WHERE t.status = 'CLOSED' 
-    ORDER BY t.timestamp DESC 
-    LIMIT ?
-    ''', (limit,))
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    return [
+        {**store.as_dict(trade), "reasoning": analysis.reasoning if analysis else None}
+        for trade, analysis in store.get_trade_history(limit)
+    ]
 
 # ===== 데이터 수집 함수 (autotrade.py와 동일) =====
 def fetch_multi_timeframe_data():
@@ -272,71 +279,25 @@ def fetch_multi_timeframe_data():
 
 def update_trade_exit_points(trade_id, new_tp, new_sl):
     """기존 거래의 TP/SL 가격을 업데이트합니다."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE mock_trades SET tp_price = ?, sl_price = ? WHERE id = ?", (new_tp, new_sl, trade_id))
-    conn.commit()
-    conn.close()
+    position_state.update_exit_points(trade_id, new_tp, new_sl)
 
 
 def fetch_bitcoin_news():
-    # if not serp_api_key:
-    #     return []
-    # try:
-    #     url = "https://serpapi.com/search.json"
-    #     params = {"engine": "google_news", "q": "bitcoin", "gl": "us", "hl": "en", "api_key": serp_api_key}
-    #     response = requests.get(url, params=params)
-    #     if response.status_code == 200:
-    #         news_results = response.json().get("news_results", [])
-    #         return [{"title": n.get("title", ""), "date": n.get("date", "")} for n in news_results[:10]]
-    #     else:
-    #         return []
-    # except Exception as e:
-    #     print(f"Error fetching news: {e}")
-    #     return []
-
-    """
-    Serper API를 사용해 비트코인 관련 최신 뉴스를 가져옵니다.
-    """
-    # .env 파일에서 Serper API 키를 가져옵니다.
-    # .env 파일에 SERPER_API_KEY="your_key" 형태로 저장해두세요.
-    serper_api_key = os.getenv("SERPER_API_KEY")
-
-    if not serper_api_key:
-        print("SERPER_API_KEY가 .env 파일에 설정되지 않았습니다.")
+    """통합 뉴스 모듈의 공유 TTL 캐시에서 중복 제거된 비트코인 뉴스를 가져옵니다."""
+    try:
+        return get_news(limit=10)
+    except Exception as e:
+        print(f"Error fetching news: {e}")
         return []
 
-    # 1. API URL이 변경되었습니다.
-    url = "https://google.serper.dev/news"
-
-    # 2. 파라미터는 JSON 형태로 구성합니다.
-    payload = json.dumps({
-        "q": "bitcoin", # 검색어
-        "gl": "us",     # 국가
-        "hl": "en",      # 언어
-        "num": 10        # 뉴스 개수
-    })
-
-    # 3. API 키는 헤더(headers)에 추가됩니다.
-    headers = {
-        'X-API-KEY': serper_api_key,
-        'Content-Type': 'application/json'
-    }
 
+def fetch_news_sentiment():
+    """헤드라인을 로컬에서 채점한 감성 요약(점수, 추세, 영향 큰 헤드라인)을 가져옵니다."""
     try:
-        # 4. POST 방식으로 요청을 보냅니다.
-        response = requests.post(url, headers=headers, data=payload)
-        response.raise_for_status() # 오류가 발생하면 예외를 발생시킴
-
-        data = response.json()
-        news_results = data.get("news", []) # 결과는 'news' 키 안에 들어있습니다.
-
-        # print(f"Serper API로 {len(news_results)}개의 뉴스를 가져왔습니다.")
-        return news_results
-
-    except requests.exceptions.RequestException as e:
-        print(f"Serper API 요청 중 오류가 발생했습니다: {e}")
-        return []
+        return get_news_sentiment()
+    except Exception as e:
+        print(f"Error fetching news sentiment: {e}")
+        return {"score": 0.0, "trend": None, "headline_count": 0, "bullish": 0, "bearish": 0, "top_movers": []}
 
 
 def parse_ai_response(response_content):
@@ -392,9 +353,14 @@ def parse_ai_response(response_content):
 def main():
     print("\n" + "="*15 + " MOCK TRADING BOT STARTED " + "="*15)
     setup_database()
+    run_migrations(DB_FILE, MOCK_MIGRATIONS)
+    position_state.load()  # 열린 포지션/지갑/최근 분석을 한 번 읽고 이후 루프는 메모리에서 조회
+    start_equity_sampler(DB_FILE, sample_equity)
 
     # 포지션 진입 후 재분석을 위한 시간 추적 변수
     last_in_position_analysis = None
+    # 열린 거래의 재분석 대화 세션 (거래가 바뀌면 새로 시작)
+    conversation_session = None
 
     while True:
         try:
@@ -432,7 +398,7 @@ def main():
                 
                 # --- B. 10분마다 재분석하여 TP/SL 업데이트 ---
                 # 대기시간 간격 설정
-                re_analysis_interval = timedelta(hours=2) 
+                re_analysis_interval = RE_ANALYSIS_INTERVAL
                 
                 
                 if not is_closed and (last_in_position_analysis is None or (datetime.now() - last_in_position_analysis) > re_analysis_interval):
@@ -443,21 +409,27 @@ def main():
                     
                     market_data = fetch_multi_timeframe_data()
                     news_data = fetch_bitcoin_news()
-                    prompt_for_update = SYSTEM_PROMPT_UPDATE.format(side=open_trade['action'].upper(), entry_price=open_trade['entry_price'], current_price=current_price, pnl_percentage=f"{pnl_percent:.2f}")
-                    
-                    analysis_input_update = { "timeframes": {}, "recent_news": news_data }
-                    if market_data:
-                        for tf, df in market_data.items():
-                            df['timestamp'] = df['timestamp'].astype(str)
-                            analysis_input_update["timeframes"][tf] = df.to_dict(orient="records")
-                    
-                    # response = client.chat.completions.create(model="gpt-4o", messages=[{"role": "system", "content": prompt_for_update}, {"role": "user", "content": json.dumps(analysis_input_update)}], response_format={"type": "json_object"})
-                    
-                    # # 새로운 파싱 함수 사용
-                    # decision = parse_ai_response(response.choices[0].message.content)
 
-                    # API 호출을 막았으므로, 기본값으로 HOLD를 설정합니다.
-                    decision = {"action": "HOLD", "reasoning": "In-position analysis disabled."}
+                    # 직전 HOLD 이후 시장 상태 지문이 그대로면 이전 판단 재사용
+                    fingerprint = market_fingerprint(current_price, market_data, news_data, extra=open_trade['id'])
+                    decision = lookup_decision("position_check", fingerprint, max_age=POSITION_MEMO_MAX_AGE)
+                    if decision is not None:
+                        print("시장 상태 변화 없음 - 직전 HOLD 판단 재사용")
+                        print_memo_stats()
+                    else:
+                        # 같은 거래에 대해서는 서버 측 대화를 이어가며 새 캔들/뉴스만 전송
+                        if conversation_session is None or conversation_session['trade_id'] != open_trade['id']:
+                            conversation_session = new_session(open_trade, current_price, pnl_percent)
+                        
+                        # 소형 모델로 점검 후 HOLD가 아닐 때만 GPT-4o로 에스컬레이션
+                        # response_content, used_model = request_update_decision(client, conversation_session, market_data, news_data, current_price, pnl_percent)
+                        
+                        # # 새로운 파싱 함수 사용
+                        # decision = parse_ai_response(response_content)
+
+                        # API 호출을 막았으므로, 기본값으로 HOLD를 설정합니다.
+                        decision = {"action": "HOLD", "reasoning": "In-position analysis disabled."}
+                        store_decision("position_check", fingerprint, decision, field="action")
                     ai_action = decision.get('action', 'HOLD')
                     
                     print(f"AI Re-Analysis Decision: {ai_action} | Reason: {decision.get('reasoning')}")
@@ -479,21 +451,7 @@ def main():
                         else:
                             new_tp_price, new_sl_price = None, None
                         
-                        conn = sqlite3.connect(DB_FILE)
-                        cursor = conn.cursor()
-                        cursor.execute("""
-                            INSERT INTO trade_adjustments (trade_id, timestamp, action, new_tp_price, new_sl_price, reasoning)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        """, (
-                            open_trade['id'],
-                            datetime.now().isoformat(),
-                            ai_action,
-                            new_tp_price,
-                            new_sl_price,
-                            decision.get('reasoning')
-                        ))
-                        conn.commit()
-                        conn.close()
+                        save_trade_adjustment(open_trade['id'], ai_action, new_tp_price, new_sl_price, decision.get('reasoning'))
 
                     if ai_action == "CLOSE":
                         print("AI recommends closing position. Closing now.")
@@ -523,6 +481,7 @@ def main():
                 # 포지션이 종료되었다면, 잠시 대기 후 루프의 처음으로 돌아감
                 if is_closed:
                     last_in_position_analysis = None # 포지션 종료 시 분석 시간 초기화
+                    conversation_session = None
                     time.sleep(10)
                     continue
                 
@@ -538,9 +497,9 @@ def main():
                     time.sleep(60)
                     continue
 
-                news_data = fetch_bitcoin_news()
+                news_sentiment = fetch_news_sentiment()
                 historical_data = get_historical_trading_data(limit=10)
-                wallet_balance = get_wallet_balance()
+                wallet_balance = position_state.wallet_balance
 
                 timeframes_data_for_json = {}
                 for tf, df in market_data.items():
@@ -551,41 +510,52 @@ def main():
                     "current_price": current_price,
                     "wallet_balance_usd": wallet_balance,
                     "timeframes": timeframes_data_for_json,
-                    "recent_news": news_data,
+                    "news_sentiment": news_sentiment,
                     "historical_trading_data": historical_data
                 }
 
                 # active_prompt.txt 파일의 내용을 읽어옴
                 with open(ACTIVE_PROMPT_FILE, "r") as f:
                     system_prompt_content = f.read()
-
-                print("Asking AI for trading advice...")
-                # response = client.chat.completions.create(
-                #     model="gpt-4o",
-                #     messages=[
-                #         {"role": "system", "content": system_prompt_content},
-                #         {"role": "user", "content": json.dumps(analysis_input, indent=2)}
-                #     ],
-                #     response_format={"type": "json_object"}
-                # )
-                
-                # decision = parse_ai_response(response.choices[0].message.content)
-                
-                # API 호출을 막았으므로, 기본값으로 NO_POSITION을 설정합니다.
-                decision = {"direction": "NO_POSITION", "reasoning": "New position analysis disabled."}
+                # 이번 판단에 사용한 프롬프트 버전 (분석/거래에 기록해 버전별 성과 집계)
+                prompt_id = get_active_prompt_id(PROMPT_DB_FILE)
+
+                # 직전 NO_POSITION 이후 시장 상태 지문(프롬프트 포함)이 그대로면 이전 판단 재사용
+                fingerprint = market_fingerprint(current_price, market_data, news_sentiment["top_movers"], extra=(system_prompt_content, round(news_sentiment["score"], 1)))
+                decision = lookup_decision("entry", fingerprint, max_age=ENTRY_MEMO_MAX_AGE)
+                if decision is not None:
+                    print("시장 상태 변화 없음 - 직전 NO_POSITION 판단 재사용")
+                    print_memo_stats()
+                else:
+                    print("Asking AI for trading advice...")
+                    # response_content, used_model = route_completion(
+                    #     client,
+                    #     "entry",
+                    #     messages=[
+                    #         {"role": "system", "content": system_prompt_content},
+                    #         {"role": "user", "content": json.dumps(analysis_input, indent=2)}
+                    #     ],
+                    #     response_format={"type": "json_object"}
+                    # )
+                    
+                    # decision = parse_ai_response(response_content)
+                    
+                    # API 호출을 막았으므로, 기본값으로 NO_POSITION을 설정합니다.
+                    decision = {"direction": "NO_POSITION", "reasoning": "New position analysis disabled."}
+                    store_decision("entry", fingerprint, decision)
                 action = decision.get('direction', 'NO_POSITION').lower()
 
                 reasoning = decision.get('reasoning', 'No specific reason provided.')
                 print(f"AI Decision: {action.upper()} | Reason: {reasoning}")
 
-                # 거래를 실행할 때만 AI 분석 로그를 저장하도록 수정
+                # 진입 판단은 거래와 함께 저장, NO_POSITION 판단은 백그라운드 큐로 저장 (프롬프트 버전별 판단 분포 집계용)
                 if action in ["long", "short"]:
                     analysis_data_to_save = {
                         'current_price': current_price,
                         'direction': action.upper(),
-                        'reasoning': reasoning
+                        'reasoning': reasoning,
+                        'prompt_id': prompt_id
                     }
-                    analysis_id = save_ai_analysis(analysis_data_to_save)
 
                     leverage = int(decision.get('recommended_leverage', 1))
                     position_size_pct = float(decision.get('recommended_position_size', 0))
@@ -615,15 +585,11 @@ def main():
 
                     mock_trade_data = {
                         'action': action, 'entry_price': current_price, 'amount': amount_btc,
-                        'leverage': leverage, 'sl_price': sl_price, 'tp_price': tp_price
+                        'leverage': leverage, 'sl_price': sl_price, 'tp_price': tp_price,
+                        'prompt_id': prompt_id
                     }
-                    trade_id = save_mock_trade(mock_trade_data)
-                    
-                    conn = sqlite3.connect(DB_FILE)
-                    cursor = conn.cursor()
-                    cursor.execute("UPDATE mock_ai_analysis SET trade_id = ? WHERE id = ?", (trade_id, analysis_id))
-                    conn.commit()
-                    conn.close()
+                    # 거래 기록과 AI 분석 결과(거래 ID 연결 포함)를 한 번의 커밋으로 저장하고 포지션 상태 갱신
+                    trade_id = position_state.open_position(build_trade_record(mock_trade_data), build_analysis_record(analysis_data_to_save))
                     
                     print(f"\n{'='*10} NEW MOCK POSITION OPENED {'='*9}")
                     print(f"Trade ID: {trade_id} | Action: {action.upper()}")
@@ -635,10 +601,16 @@ def main():
                     print("="*42)
                 
                 else: # NO_POSITION
+                    position_state.record_analysis(build_analysis_record({
+                        'current_price': current_price,
+                        'direction': 'NO_POSITION',
+                        'reasoning': reasoning,
+                        'prompt_id': prompt_id
+                    }), background=True)
                     print("AI recommends NO POSITION. Waiting for the next opportunity.")
             
              # 대기 시간: 포지션 있으면 @초, 없으면 @초, 3600 = 1h, 600 = 10m
-            sleep_time = 600 if open_trade else 3600
+            sleep_time = IN_POSITION_SLEEP if open_trade else NO_POSITION_SLEEP
             print(f"Waiting for {sleep_time} seconds...")
             time.sleep(sleep_time)
 
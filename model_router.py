@@ -0,0 +1,312 @@
+# model_router.py
+"""
+LLM 모델 라우터
+--------------------------------------------------------
+기능:
+- 호출 지점(route)별 모델 선택 (신규 진입, 포지션 점검, 물어보기)
+- 소형 모델 우선 호출 후 HOLD가 아닐 때만 상위 모델로 에스컬레이션
+- 모델별 지연 시간, 토큰 비용, 모델 간 판단 일치율 집계
+- 집계된 통계로 소형 모델 경유가 손해인 경우 상위 모델로 직행
+- 통계 파일은 봇과 대시보드가 함께 쓰므로 파일 잠금 아래에서 다시 읽고 증가분만 반영해 저장
+--------------------------------------------------------
+"""
+import os
+import json
+import time
+import fcntl
+import random
+import threading
+from contextlib import contextmanager
+
+# 통계 파일 (재시작 후에도 일치율/지연 통계를 유지, 실행 위치와 관계없이 DB 파일과 같은 디렉터리)
+ROUTER_STATS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_router_stats.json")
+ROUTER_STATS_LOCK = ROUTER_STATS_FILE + ".lock"  # 프로세스 간 쓰기 잠금용 파일
+
+# 모델별 가격 (USD / 1M 토큰)
+MODEL_PRICING = {
+    "gpt-4o": {"input": 2.50, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60},
+}
+
+# 에스컬레이션 정책 설정
+AUDIT_RATE = 0.1             # 소형 모델이 HOLD라고 답해도 상위 모델로 검증하는 비율
+MIN_AGREEMENT_SAMPLES = 20   # 정책 판단에 필요한 최소 비교 횟수
+MIN_AGREEMENT_RATE = 0.7     # 이보다 일치율이 낮으면 소형 모델을 건너뜀
+
+# 호출 지점별 라우팅 설정
+# - model: 1차로 호출할 모델
+# - escalate_to: 1차 판단이 escalate_unless 값이 아닐 때 다시 물어볼 모델
+# - decision_field: 판단 비교에 사용할 JSON 필드
+ROUTES = {
+    "entry": {  # autotrade/mocktrade 신규 진입 분석 (기존과 동일하게 GPT-4o)
+        "model": "gpt-4o",
+        "decision_field": "direction",
+    },
+    "position_check": {  # 포지션 보유 중 HOLD/ADJUST/CLOSE 점검
+        "model": "gpt-4o-mini",
+        "escalate_to": "gpt-4o",
+        "escalate_unless": "HOLD",
+        "decision_field": "action",
+    },
+    "ask_ai": {  # 대시보드 '물어보기' 페이지
+        "model": "gpt-4o",
+    },
+}
+
+_lock = threading.Lock()
+
+
+def _empty_stats():
+    return {"models": {}, "routes": {}}
+
+
+def _load_stats():
+    """통계 파일을 읽어옵니다. 파일이 없거나 손상된 경우 빈 통계로 시작합니다. (다른 프로세스의 기록도 반영됨)"""
+    try:
+        with open(ROUTER_STATS_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return _empty_stats()
+
+
+def _save_stats(stats):
+    tmp_file = f"{ROUTER_STATS_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "w") as f:
+            json.dump(stats, f)
+        os.replace(tmp_file, ROUTER_STATS_FILE)
+    except OSError as e:
+        print(f"[Router] 통계 저장 실패: {e}")
+
+
+@contextmanager
+def _update_stats():
+    """
+    다른 프로세스(봇, 대시보드)와 겹치지 않도록 잠금을 잡고 파일의 최신 통계를 읽어 제공한 뒤 저장합니다
+
+    파일 전체를 메모리 사본으로 덮어쓰지 않고 매번 다시 읽은 값에 이번 호출의 증가분만 더합니다.
+    """
+    with _lock, open(ROUTER_STATS_LOCK, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            stats = _load_stats()
+            yield stats
+            _save_stats(stats)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _usage_tokens(usage):
+    """Chat Completions / Responses API의 usage 객체에서 (입력, 출력) 토큰 수를 꺼냅니다."""
+    if usage is None:
+        return 0, 0
+    input_tokens = getattr(usage, "prompt_tokens", None)
+    if input_tokens is None:
+        input_tokens = getattr(usage, "input_tokens", 0)
+    output_tokens = getattr(usage, "completion_tokens", None)
+    if output_tokens is None:
+        output_tokens = getattr(usage, "output_tokens", 0)
+    return input_tokens or 0, output_tokens or 0
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    """토큰 수로 호출 비용(USD)을 추정합니다."""
+    pricing = MODEL_PRICING.get(model)
+    if not pricing:
+        return 0.0
+    return (input_tokens * pricing["input"] + output_tokens * pricing["output"]) / 1_000_000
+
+
+def _record_call(route, model, latency, usage):
+    input_tokens, output_tokens = _usage_tokens(usage)
+    cost = estimate_cost(model, input_tokens, output_tokens)
+    with _update_stats() as stats:
+        key = f"{route}:{model}"
+        entry = stats["models"].setdefault(key, {
+            "calls": 0, "latency_sum": 0.0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0
+        })
+        entry["calls"] += 1
+        entry["latency_sum"] += latency
+        entry["input_tokens"] += input_tokens
+        entry["output_tokens"] += output_tokens
+        entry["cost"] += cost
+    return cost
+
+
+def _record_route(route, escalated=False, compared=False, agreed=False, bypassed=False):
+    with _update_stats() as stats:
+        entry = stats["routes"].setdefault(route, {
+            "decisions": 0, "escalations": 0, "comparisons": 0, "agreements": 0, "bypassed": 0
+        })
+        # 소형 모델을 건너뛴 호출은 에스컬레이션율 계산에서 제외
+        if bypassed:
+            entry["bypassed"] = entry.get("bypassed", 0) + 1
+            return
+        entry["decisions"] += 1
+        if escalated:
+            entry["escalations"] += 1
+        if compared:
+            entry["comparisons"] += 1
+            if agreed:
+                entry["agreements"] += 1
+
+
+def _model_averages(stats, route, model):
+    """경로/모델 조합의 평균 지연 시간과 평균 비용을 반환합니다. 기록이 없으면 None."""
+    entry = stats["models"].get(f"{route}:{model}")
+    if not entry or entry["calls"] == 0:
+        return None
+    return entry["latency_sum"] / entry["calls"], entry["cost"] / entry["calls"]
+
+
+def _should_bypass_small_model(route, config):
+    """
+    소형 모델을 거치지 않고 상위 모델로 바로 보낼지 판단합니다
+
+    다음 중 하나라도 해당하면 소형 모델 경유가 손해이므로 건너뜁니다:
+    - 상위 모델과의 판단 일치율이 MIN_AGREEMENT_RATE 미만
+    - (소형 호출 + 에스컬레이션 확률 * 상위 호출)의 기대 지연과 기대 비용이 모두 상위 모델 단독보다 큼
+      (둘 중 하나만 크면 지연과 비용을 맞바꾸는 것이므로 소형 모델을 계속 거침)
+    """
+    stats = _load_stats()
+    route_stats = stats["routes"].get(route)
+    small = _model_averages(stats, route, config["model"])
+    large = _model_averages(stats, route, config["escalate_to"])
+    if not route_stats or route_stats["comparisons"] < MIN_AGREEMENT_SAMPLES:
+        return False
+
+    agreement_rate = route_stats["agreements"] / route_stats["comparisons"]
+    if agreement_rate < MIN_AGREEMENT_RATE:
+        return True
+
+    if small and large and route_stats["decisions"] > 0:
+        escalation_rate = route_stats["escalations"] / route_stats["decisions"]
+        expected_latency = small[0] + escalation_rate * large[0]
+        expected_cost = small[1] + escalation_rate * large[1]
+        if expected_latency > large[0] and expected_cost > large[1]:
+            return True
+    return False
+
+
+def _decision_of(content, field):
+    """응답 JSON에서 판단 필드 값을 꺼냅니다. 파싱 실패 시 None."""
+    if not field:
+        return None
+    try:
+        value = json.loads(content).get(field)
+    except (ValueError, AttributeError):
+        return None
+    return str(value).upper() if value is not None else None
+
+
+def _timed_request(route, model, request_fn):
+    start = time.perf_counter()
+    content, usage = request_fn(model)
+    latency = time.perf_counter() - start
+    cost = _record_call(route, model, latency, usage)
+    print(f"[Router] {route} -> {model} | {latency:.2f}s | ${cost:.4f}")
+    return content
+
+
+def route_request(route, request_fn):
+    """
+    호출 지점에 맞는 모델을 골라 요청을 실행합니다
+
+    매개변수:
+        route (str): ROUTES의 키 ('entry', 'position_check', 'ask_ai')
+        request_fn (callable): model 이름을 받아 (응답 텍스트, usage)를 반환하는 함수
+
+    반환값:
+        tuple: (응답 텍스트, 최종 판단에 사용된 모델 이름)
+    """
+    config = ROUTES[route]
+    model = config["model"]
+    escalate_to = config.get("escalate_to")
+
+    # 에스컬레이션 경로가 없는 경우 지정 모델로 한 번만 호출
+    if not escalate_to:
+        content = _timed_request(route, model, request_fn)
+        _record_route(route)
+        return content, model
+
+    # 건너뛰는 중에도 AUDIT_RATE 비율로는 소형 모델을 다시 시험해 통계를 갱신
+    if _should_bypass_small_model(route, config) and random.random() >= AUDIT_RATE:
+        content = _timed_request(route, escalate_to, request_fn)
+        _record_route(route, bypassed=True)
+        return content, escalate_to
+
+    # 1차: 소형 모델
+    content = _timed_request(route, model, request_fn)
+    decision = _decision_of(content, config.get("decision_field"))
+
+    # 예상된 일상 판단(HOLD)이면 일부만 표본 검증하고 그대로 사용
+    if decision == config.get("escalate_unless") and random.random() >= AUDIT_RATE:
+        _record_route(route)
+        return content, model
+
+    # 2차: 상위 모델로 에스컬레이션 (또는 표본 검증)
+    escalated_content = _timed_request(route, escalate_to, request_fn)
+    escalated_decision = _decision_of(escalated_content, config.get("decision_field"))
+    _record_route(
+        route,
+        escalated=True,
+        compared=escalated_decision is not None,
+        agreed=decision is not None and decision == escalated_decision
+    )
+    return escalated_content, escalate_to
+
+
+def route_completion(client, route, messages, **kwargs):
+    """
+    Chat Completions 호출을 라우터를 거쳐 실행합니다
+
+    매개변수:
+        client (OpenAI): OpenAI 클라이언트
+        route (str): ROUTES의 키
+        messages (list): 대화 메시지 목록 (프롬프트는 변경하지 않음)
+        **kwargs: response_format 등 chat.completions.create 추가 인자
+
+    반환값:
+        tuple: (응답 텍스트, 사용된 모델 이름)
+    """
+    def request(model):
+        response = client.chat.completions.create(model=model, messages=messages, **kwargs)
+        return response.choices[0].message.content, response.usage
+
+    return route_request(route, request)
+
+
+def get_router_stats():
+    """경로/모델별 호출 수, 평균 지연 시간, 누적 비용, 에스컬레이션율, 일치율을 반환합니다."""
+    stats = _load_stats()
+    summary = {"models": {}, "routes": {}}
+    for key, entry in stats["models"].items():
+        calls = entry["calls"]
+        summary["models"][key] = {
+            "calls": calls,
+            "avg_latency": entry["latency_sum"] / calls if calls else 0,
+            "avg_cost": entry["cost"] / calls if calls else 0,
+            "total_cost": entry["cost"],
+        }
+    for route, entry in stats["routes"].items():
+        decisions = entry["decisions"]
+        comparisons = entry["comparisons"]
+        summary["routes"][route] = {
+            "decisions": decisions,
+            "escalation_rate": entry["escalations"] / decisions if decisions else 0,
+            "agreement_rate": entry["agreements"] / comparisons if comparisons else None,
+            "comparisons": comparisons,
+            "bypassed": entry.get("bypassed", 0),
+        }
+    return summary
+
+
+def print_router_stats():
+    summary = get_router_stats()
+    print("\n=== Model Router Stats ===")
+    for key, entry in summary["models"].items():
+        print(f"{key}: {entry['calls']} calls | avg {entry['avg_latency']:.2f}s | avg ${entry['avg_cost']:.4f} | total ${entry['total_cost']:.2f}")
+    for route, entry in summary["routes"].items():
+        agreement = f"{entry['agreement_rate']*100:.1f}%" if entry["agreement_rate"] is not None else "N/A"
+        print(f"[{route}] decisions: {entry['decisions']} | escalation: {entry['escalation_rate']*100:.1f}% | agreement: {agreement} ({entry['comparisons']}) | bypassed: {entry['bypassed']}")
+    print("==========================")
@@ -0,0 +1,226 @@
+# news_provider.py
+"""
+통합 뉴스 수집 모듈
+--------------------------------------------------------
+기능:
+- 뉴스 API 제공자(SerpAPI, Serper)를 공통 형식으로 수집 (요청 타임아웃 적용)
+- 두 봇이 함께 쓰는 SQLite 기반 TTL 캐시 (TTL 내에는 제공자를 다시 호출하지 않음)
+- 정규화 해시(완전 중복)와 SimHash(유사 중복)로 출처 간 중복 헤드라인 제거
+- 캐시를 갱신할 때 보관 기간(NEWS_RETENTION_DAYS)이 지난 헤드라인 삭제 (캐시 DB 크기 유지)
+- 대시보드 검색용 헤드라인 전문 검색 색인(FTS5)
+--------------------------------------------------------
+"""
+import os
+import re
+import time
+import hashlib
+
+import requests
+
+from db import get_connection, transaction
+from search_index import setup_search_index
+
+NEWS_DB_FILE = "news_cache.db"   # 두 봇이 공유하는 뉴스 캐시 DB
+NEWS_TTL_SECONDS = 900           # 제공자별 재호출 간격 (15분)
+NEWS_TIMEOUT = 10                # HTTP 요청 타임아웃 (초)
+SIMHASH_DISTANCE = 3             # 이 해밍 거리 이하이면 유사 중복으로 판단
+DEDUP_WINDOW_HOURS = 72          # 유사 중복 비교 대상 기간
+NEWS_RETENTION_DAYS = 30         # 헤드라인 보관 기간 (대시보드 검색 범위)
+
+_initialized_dbs = set()
+_TOKEN_RE = re.compile(r"[a-z0-9$]+")
+_STOPWORDS = {"the", "a", "an", "to", "of", "in", "on", "for", "and", "as", "is", "at", "by", "with", "after", "from"}
+
+
+# ===== 뉴스 제공자 =====
+def fetch_serpapi(query):
+    """SerpAPI(Google 뉴스)에서 뉴스를 가져옵니다."""
+    response = requests.get("https://serpapi.com/search.json", params={
+        "engine": "google_news",
+        "q": query,
+        "gl": "us",
+        "hl": "en",
+        "api_key": os.getenv("SERP_API_KEY")
+    }, timeout=NEWS_TIMEOUT)
+    response.raise_for_status()
+    return [
+        {"title": n.get("title", ""), "date": n.get("date", ""), "source": (n.get("source") or {}).get("name", ""), "link": n.get("link", "")}
+        for n in response.json().get("news_results", [])[:10]
+    ]
+
+
+def fetch_serper(query):
+    """Serper API에서 뉴스를 가져옵니다."""
+    response = requests.post("https://google.serper.dev/news", headers={
+        "X-API-KEY": os.getenv("SERPER_API_KEY"),
+        "Content-Type": "application/json"
+    }, json={"q": query, "gl": "us", "hl": "en", "num": 10}, timeout=NEWS_TIMEOUT)
+    response.raise_for_status()
+    return [
+        {"title": n.get("title", ""), "date": n.get("date", ""), "source": n.get("source", ""), "link": n.get("link", "")}
+        for n in response.json().get("news", [])
+    ]
+
+
+# 제공자 이름 -> (수집 함수, 필요한 API 키 환경 변수)
+PROVIDERS = {
+    "serpapi": (fetch_serpapi, "SERP_API_KEY"),
+    "serper": (fetch_serper, "SERPER_API_KEY"),
+}
+
+
+def register_provider(name, fetch_fn, api_key_env=None):
+    """새 뉴스 제공자를 등록합니다. fetch_fn(query)는 title/date/source/link dict 목록을 반환해야 합니다."""
+    PROVIDERS[name] = (fetch_fn, api_key_env)
+
+
+# ===== 중복 판별 =====
+def normalize_title(title):
+    """출처 접미사(' - Reuters')와 기호를 제거한 소문자 토큰 목록을 반환합니다."""
+    title = re.split(r"\s+[-|–]\s+", title.strip())[0].lower()
+    return [t for t in _TOKEN_RE.findall(title) if t not in _STOPWORDS]
+
+
+def title_fingerprint(title):
+    return hashlib.sha1(" ".join(normalize_title(title)).encode("utf-8")).hexdigest()
+
+
+def simhash(title):
+    """
+    헤드라인의 64비트 SimHash를 계산합니다 (SQLite INTEGER에 맞게 부호 있는 정수로 반환)
+    """
+    weights = [0] * 64
+    for token in normalize_title(title):
+        h = int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:8], "big")
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    value = sum(1 << bit for bit in range(64) if weights[bit] > 0)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming_distance(a, b):
+    return ((a ^ b) & ((1 << 64) - 1)).bit_count()
+
+
+# ===== 캐시 DB =====
+def setup_news_db(db_file=NEWS_DB_FILE):
+    """뉴스 캐시 테이블을 생성합니다. (프로세스당 한 번)"""
+    if db_file in _initialized_dbs:
+        return
+    conn = get_connection(db_file)
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS news_headlines (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fingerprint TEXT NOT NULL UNIQUE,  -- 정규화 제목 해시 (완전 중복)
+        simhash INTEGER NOT NULL,          -- 유사 중복 판별용
+        title TEXT NOT NULL,
+        date TEXT,
+        source TEXT,
+        link TEXT,
+        provider TEXT NOT NULL,
+        first_seen REAL NOT NULL           -- 처음 수집한 시간 (epoch 초)
+    )''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS news_fetches (
+        provider TEXT PRIMARY KEY,
+        fetched_at REAL NOT NULL
+    )''')
+    # 예전 소비자별 전달 기록 (재분석 대화가 대화 체인별로 이미 보낸 헤드라인을 관리하므로 사용하지 않음)
+    cursor.execute("DROP TABLE IF EXISTS news_deliveries")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_news_headlines_first_seen ON news_headlines (first_seen)")
+    # 대시보드 검색창용 헤드라인 전문 검색 색인 (트리거로 자동 동기화)
+    with transaction(db_file, label="news_setup") as cursor:
+        setup_search_index(cursor, "news_headlines", "title")
+    _initialized_dbs.add(db_file)
+
+
+def _store_headlines(conn, provider, items):
+    """새 헤드라인만 저장하고 저장된 개수를 반환합니다."""
+    cursor = conn.cursor()
+    now = time.time()
+    cursor.execute("SELECT simhash FROM news_headlines WHERE first_seen >= ?", (now - DEDUP_WINDOW_HOURS * 3600,))
+    recent_hashes = [row[0] for row in cursor.fetchall()]
+
+    stored = 0
+    for item in items:
+        title = (item.get("title") or "").strip()
+        if not title:
+            continue
+        item_hash = simhash(title)
+        if any(hamming_distance(item_hash, h) <= SIMHASH_DISTANCE for h in recent_hashes):
+            continue  # 다른 출처의 유사 헤드라인
+        cursor.execute('''
+        INSERT OR IGNORE INTO news_headlines (fingerprint, simhash, title, date, source, link, provider, first_seen)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (title_fingerprint(title), item_hash, title, item.get("date", ""), item.get("source", ""), item.get("link", ""), provider, now))
+        if cursor.rowcount:
+            stored += 1
+            recent_hashes.append(item_hash)
+    return stored
+
+
+def _prune_headlines(cursor, days=NEWS_RETENTION_DAYS):
+    """보관 기간이 지난 헤드라인을 삭제합니다. (first_seen 인덱스 사용, 검색 색인은 트리거로 함께 정리)"""
+    cursor.execute("DELETE FROM news_headlines WHERE first_seen < ?", (time.time() - days * 86400,))
+    if cursor.rowcount:
+        print(f"Pruned {cursor.rowcount} headlines older than {days} days")
+
+
+def refresh_news(query="bitcoin", db_file=NEWS_DB_FILE):
+    """
+    TTL이 지난 제공자만 호출해 캐시를 갱신합니다
+
+    반환값:
+        int: 새로 저장된 헤드라인 수
+    """
+    setup_news_db(db_file)
+    conn = get_connection(db_file)
+    cursor = conn.cursor()
+    stored = 0
+    for name, (fetch_fn, api_key_env) in PROVIDERS.items():
+        if api_key_env and not os.getenv(api_key_env):
+            continue  # API 키가 없는 제공자는 사용하지 않음
+        cursor.execute("SELECT fetched_at FROM news_fetches WHERE provider = ?", (name,))
+        row = cursor.fetchone()
+        if row and time.time() - row[0] < NEWS_TTL_SECONDS:
+            continue  # 캐시가 아직 유효함
+
+        try:
+            items = fetch_fn(query)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error fetching news from {name}: {e}")
+            continue
+
+        # 헤드라인 저장, 수집 시각 기록, 오래된 헤드라인 삭제를 한 번에 커밋
+        with transaction(db_file, label="news_refresh"):
+            new_count = _store_headlines(conn, name, items)
+            cursor.execute("INSERT OR REPLACE INTO news_fetches (provider, fetched_at) VALUES (?, ?)", (name, time.time()))
+            _prune_headlines(cursor)
+        stored += new_count
+        print(f"Collected {len(items)} news articles from {name} ({new_count} new)")
+    return stored
+
+
+def get_news(limit=10, max_age_hours=24, query="bitcoin", db_file=NEWS_DB_FILE):
+    """
+    최신 헤드라인을 반환합니다 (필요 시 캐시 갱신)
+
+    매개변수:
+        limit (int): 최대 헤드라인 수
+        max_age_hours (int): 이 시간 이내에 수집된 헤드라인만 반환
+
+    반환값:
+        list: 헤드라인 정보 (title, date, source)
+    """
+    refresh_news(query, db_file)
+    conn = get_connection(db_file)
+    cursor = conn.cursor()
+    since = time.time() - max_age_hours * 3600
+    cursor.execute('''
+    SELECT title, date, source FROM news_headlines
+    WHERE first_seen >= ?
+    ORDER BY first_seen DESC, id DESC
+    LIMIT ?
+    ''', (since, limit))
+    return [{"title": row[0], "date": row[1], "source": row[2]} for row in cursor.fetchall()]
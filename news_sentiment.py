@@ -0,0 +1,174 @@
+# news_sentiment.py
+"""
+로컬 뉴스 헤드라인 감성 점수
+--------------------------------------------------------
+기능:
+- 암호화폐 용어 사전 기반 감성 점수 (CPU만 사용, 외부 모델/API 호출 없음)
+- pandas 벡터 연산으로 헤드라인을 묶음 단위로 채점 (부정어/강조어 처리 포함)
+- 점수는 뉴스 캐시 DB(news_headlines.sentiment)에 헤드라인별로 한 번만 저장
+- LLM에는 헤드라인 목록 대신 요약(평균 점수, 추세, 영향 큰 헤드라인)만 전달
+--------------------------------------------------------
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from db import get_connection
+from news_provider import NEWS_DB_FILE, refresh_news, setup_news_db
+
+# 단어별 감성 가중치 (양수: 강세, 음수: 약세)
+LEXICON = {
+    # 강세
+    "surge": 2.0, "surges": 2.0, "surged": 2.0, "soar": 2.0, "soars": 2.0, "soared": 2.0,
+    "rally": 1.8, "rallies": 1.8, "rallied": 1.8, "jump": 1.5, "jumps": 1.5, "jumped": 1.5,
+    "gain": 1.2, "gains": 1.2, "rise": 1.2, "rises": 1.2, "rising": 1.2, "climb": 1.2, "climbs": 1.2,
+    "record": 1.5, "high": 0.8, "highs": 0.8, "ath": 2.0, "breakout": 1.8, "bullish": 2.0, "bull": 1.5,
+    "rebound": 1.3, "rebounds": 1.3, "recover": 1.0, "recovers": 1.0, "recovery": 1.0,
+    "inflow": 1.2, "inflows": 1.2, "approve": 1.8, "approves": 1.8, "approved": 1.8, "approval": 1.8,
+    "adopt": 1.2, "adopts": 1.2, "adoption": 1.2, "buy": 0.8, "buys": 0.8, "accumulate": 1.2,
+    "upgrade": 1.0, "optimism": 1.5, "optimistic": 1.5, "boost": 1.3, "boosts": 1.3, "support": 0.5,
+    # 약세
+    "crash": -2.5, "crashes": -2.5, "crashed": -2.5, "plunge": -2.2, "plunges": -2.2, "plunged": -2.2,
+    "tumble": -2.0, "tumbles": -2.0, "slump": -1.8, "slumps": -1.8, "drop": -1.3, "drops": -1.3,
+    "fall": -1.3, "falls": -1.3, "fell": -1.3, "decline": -1.2, "declines": -1.2, "slide": -1.2, "slides": -1.2,
+    "low": -0.8, "lows": -0.8, "bearish": -2.0, "bear": -1.5, "selloff": -2.0, "sell": -0.8, "dump": -1.8,
+    "liquidation": -1.5, "liquidations": -1.5, "outflow": -1.2, "outflows": -1.2,
+    "hack": -2.2, "hacked": -2.2, "exploit": -2.0, "fraud": -2.2, "scam": -2.0, "lawsuit": -1.5, "sues": -1.5,
+    "ban": -2.0, "bans": -2.0, "banned": -2.0, "crackdown": -1.8, "reject": -1.8, "rejects": -1.8, "rejected": -1.8,
+    "delay": -0.8, "delays": -0.8, "fear": -1.5, "fears": -1.5, "panic": -2.0, "risk": -0.5, "warning": -1.2,
+    "bankruptcy": -2.5, "collapse": -2.5, "collapses": -2.5, "investigation": -1.2, "fine": -0.8, "fined": -1.2,
+}
+NEGATORS = {"not", "no", "never", "without", "fails", "failed", "despite"}
+INTENSIFIERS = {"massive": 1.5, "huge": 1.5, "sharp": 1.4, "sharply": 1.4, "biggest": 1.5, "major": 1.3}
+
+NORMALIZATION_ALPHA = 4.0   # 합계 점수를 -1~1로 압축할 때의 완화 상수
+TOKEN_PATTERN = r"[a-z]+"
+SENTIMENT_BATCH = 500       # 한 번에 채점할 헤드라인 수
+TREND_HOURS = 6             # 추세: 최근 이 시간 평균 - 그 이전 평균
+
+_column_ready = set()
+
+
+def score_headlines(titles):
+    """
+    헤드라인 묶음의 감성 점수를 벡터 연산으로 계산합니다
+
+    매개변수:
+        titles (list): 헤드라인 문자열 목록
+
+    반환값:
+        numpy.ndarray: 헤드라인별 점수 (-1: 매우 약세 ~ 1: 매우 강세)
+    """
+    titles = pd.Series(list(titles), dtype="object").fillna("")
+    if titles.empty:
+        return np.zeros(0)
+
+    # 헤드라인 번호를 인덱스로 갖는 토큰 시리즈
+    tokens = titles.str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+    weights = tokens.map(LEXICON).fillna(0.0).astype(float)
+
+    # 바로 앞 단어가 부정어면 부호 반전, 강조어면 가중 (같은 헤드라인 안에서만)
+    prev = tokens.groupby(level=0).shift(1)
+    weights = weights.where(~prev.isin(NEGATORS), -weights)
+    weights = weights * prev.map(INTENSIFIERS).fillna(1.0).astype(float)
+
+    raw = weights.groupby(level=0).sum().reindex(range(len(titles)), fill_value=0.0).to_numpy()
+    return raw / np.sqrt(raw * raw + NORMALIZATION_ALPHA)
+
+
+def setup_sentiment_column(db_file=NEWS_DB_FILE):
+    """뉴스 캐시 테이블에 감성 점수 컬럼이 없으면 추가합니다. (프로세스당 한 번)"""
+    if db_file in _column_ready:
+        return
+    setup_news_db(db_file)
+    conn = get_connection(db_file)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(news_headlines)")
+    if "sentiment" not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE news_headlines ADD COLUMN sentiment REAL")
+    _column_ready.add(db_file)
+
+
+def score_pending(db_file=NEWS_DB_FILE):
+    """
+    아직 점수가 없는 헤드라인만 묶음 단위로 채점해 저장합니다
+
+    반환값:
+        int: 새로 채점한 헤드라인 수
+    """
+    setup_sentiment_column(db_file)
+    conn = get_connection(db_file)
+    cursor = conn.cursor()
+    scored = 0
+    while True:
+        cursor.execute("SELECT id, title FROM news_headlines WHERE sentiment IS NULL LIMIT ?", (SENTIMENT_BATCH,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        scores = score_headlines([row[1] for row in rows])
+        cursor.executemany(
+            "UPDATE news_headlines SET sentiment = ? WHERE id = ?",
+            [(float(score), row[0]) for score, row in zip(scores, rows)]
+        )
+        scored += len(rows)
+    return scored
+
+
+def get_news_sentiment(window_hours=24, top_n=3, query="bitcoin", db_file=NEWS_DB_FILE):
+    """
+    최근 뉴스의 감성 요약을 반환합니다 (필요 시 캐시 갱신 및 채점)
+
+    매개변수:
+        window_hours (int): 요약 대상 기간 (수집 시각 기준)
+        top_n (int): 함께 전달할 영향 큰 헤드라인 수
+
+    반환값:
+        dict: score(평균 -1~1), trend(최근 TREND_HOURS 평균 - 이전 평균),
+              headline_count, bullish/bearish 개수, top_movers(제목과 점수)
+    """
+    refresh_news(query, db_file)
+    score_pending(db_file)
+
+    conn = get_connection(db_file)
+    now = time.time()
+    df = pd.read_sql_query(
+        "SELECT title, first_seen, sentiment FROM news_headlines WHERE first_seen >= ? ORDER BY first_seen DESC, id DESC",
+        conn, params=(now - window_hours * 3600,)
+    )
+
+    if df.empty:
+        return {"score": 0.0, "trend": None, "headline_count": 0, "bullish": 0, "bearish": 0, "top_movers": []}
+
+    recent = df['first_seen'] >= now - TREND_HOURS * 3600
+    trend = None
+    if recent.any() and (~recent).any():
+        trend = round(float(df.loc[recent, 'sentiment'].mean() - df.loc[~recent, 'sentiment'].mean()), 3)
+
+    movers = df.loc[df['sentiment'].abs().sort_values(ascending=False, kind="stable").index[:top_n]]
+    return {
+        "score": round(float(df['sentiment'].mean()), 3),
+        "trend": trend,
+        "headline_count": len(df),
+        "bullish": int((df['sentiment'] > 0.1).sum()),
+        "bearish": int((df['sentiment'] < -0.1).sum()),
+        "top_movers": [
+            {"title": row.title, "score": round(float(row.sentiment), 3)}
+            for row in movers.itertuples()
+            if row.sentiment != 0
+        ],
+    }
+
+
+if __name__ == "__main__":
+    # 처리량 벤치마크: 합성 헤드라인 묶음 채점 속도 측정
+    rng = np.random.default_rng(42)
+    vocabulary = list(LEXICON) + list(NEGATORS) + list(INTENSIFIERS) + [
+        "bitcoin", "btc", "price", "etf", "market", "traders", "sec", "analysts", "week", "fed", "miners", "exchange"
+    ] * 5
+    for size in (1000, 5000, 20000):
+        headlines = [" ".join(rng.choice(vocabulary, size=rng.integers(6, 14))) for _ in range(size)]
+        start = time.perf_counter()
+        scores = score_headlines(headlines)
+        elapsed = time.perf_counter() - start
+        print(f"{size:>6} headlines: {elapsed*1000:8.1f} ms ({size/elapsed:,.0f} headlines/s) | mean score {scores.mean():+.3f}")
@@ -0,0 +1,202 @@
+# performance_aggregates.py
+"""
+증분 성과 집계
+--------------------------------------------------------
+기능:
+- 범위(scope)별 누적 집계 테이블: 전체, 방향(long/short), 레버리지 구간, 청산일
+- 거래를 종료하는 트랜잭션 안에서 UPSERT로 갱신 (건수, 합계, 제곱합, 최대/최소)
+- 거래 이력 길이와 무관하게 승률, 평균, 표준편차, 샤프 유사 비율을 O(1)로 계산
+--------------------------------------------------------
+"""
+import math
+from datetime import datetime, timedelta
+
+from db import get_connection
+
+AGGREGATES_TABLE = "performance_aggregates"
+SCOPES = ("overall", "direction", "leverage", "day")
+
+# 레버리지 구간 (상한, 이름). 마지막 상한을 넘으면 "21x+"
+LEVERAGE_BUCKETS = ((5, "1-5x"), (10, "6-10x"), (20, "11-20x"))
+LEVERAGE_OVERFLOW_BUCKET = "21x+"
+
+_COLUMNS = ("trades", "wins", "losses", "pnl_sum", "pnl_sq_sum", "pct_sum", "pct_sq_sum",
+            "win_pct_sum", "loss_pct_sum", "max_pct", "min_pct", "max_pnl", "min_pnl")
+
+
+def leverage_bucket(leverage):
+    for upper, name in LEVERAGE_BUCKETS:
+        if leverage <= upper:
+            return name
+    return LEVERAGE_OVERFLOW_BUCKET
+
+
+def _leverage_bucket_sql(column):
+    cases = " ".join(f"WHEN {column} <= {upper} THEN '{name}'" for upper, name in LEVERAGE_BUCKETS)
+    return f"CASE {cases} ELSE '{LEVERAGE_OVERFLOW_BUCKET}' END"
+
+
+def setup_aggregates_table(cursor):
+    """집계 테이블을 생성합니다. (마이그레이션에서 호출)"""
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS {AGGREGATES_TABLE} (
+        scope TEXT NOT NULL,          -- overall / direction / leverage / day
+        bucket TEXT NOT NULL,         -- '' / long / 1-5x / 2025-01-31
+        trades INTEGER NOT NULL DEFAULT 0,
+        wins INTEGER NOT NULL DEFAULT 0,
+        losses INTEGER NOT NULL DEFAULT 0,
+        pnl_sum REAL NOT NULL DEFAULT 0,       -- 손익 (USDT)
+        pnl_sq_sum REAL NOT NULL DEFAULT 0,
+        pct_sum REAL NOT NULL DEFAULT 0,       -- 손익률 (%)
+        pct_sq_sum REAL NOT NULL DEFAULT 0,
+        win_pct_sum REAL NOT NULL DEFAULT 0,   -- 이익 거래 손익률 합
+        loss_pct_sum REAL NOT NULL DEFAULT 0,  -- 손실 거래 손익률 합
+        max_pct REAL,
+        min_pct REAL,
+        max_pnl REAL,
+        min_pnl REAL,
+        PRIMARY KEY (scope, bucket)
+    ) WITHOUT ROWID
+    ''')
+
+
+def backfill_aggregates(cursor, source_sql):
+    """
+    기존 종료 거래로 집계 테이블을 다시 만듭니다
+
+    매개변수:
+        cursor: 트랜잭션 안의 커서
+        source_sql (str): action, leverage, closed_day, pnl, pct 컬럼을 반환하는 종료 거래 쿼리
+    """
+    cursor.execute(f"DELETE FROM {AGGREGATES_TABLE}")
+    keys = {
+        "overall": "''",
+        "direction": "action",
+        "leverage": _leverage_bucket_sql("leverage"),
+        "day": "closed_day",
+    }
+    for scope, key in keys.items():
+        cursor.execute(f'''
+        WITH src AS ({source_sql})
+        INSERT INTO {AGGREGATES_TABLE} (scope, bucket, {", ".join(_COLUMNS)})
+        SELECT
+            '{scope}', {key},
+            COUNT(*),
+            SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN pnl < 0 THEN 1 ELSE 0 END),
+            SUM(pnl), SUM(pnl * pnl),
+            SUM(pct), SUM(pct * pct),
+            SUM(CASE WHEN pnl > 0 THEN pct ELSE 0 END),
+            SUM(CASE WHEN pnl < 0 THEN pct ELSE 0 END),
+            MAX(pct), MIN(pct), MAX(pnl), MIN(pnl)
+        FROM src
+        GROUP BY 2
+        HAVING COUNT(*) > 0
+        ''')
+
+
+def record_closed_trade(cursor, action, leverage, closed_at, profit_loss, profit_loss_percentage):
+    """
+    종료된 거래 하나를 모든 범위의 집계에 반영합니다
+
+    거래 상태를 CLOSED로 바꾸는 것과 같은 트랜잭션 안에서 호출해야 합니다.
+
+    매개변수:
+        cursor: 트랜잭션 안의 커서
+        action (str): long 또는 short
+        leverage (int): 레버리지
+        closed_at (str): 청산 시간 (ISO 문자열)
+        profit_loss (float): 손익 (USDT)
+        profit_loss_percentage (float): 손익률 (%)
+    """
+    pnl = profit_loss or 0.0
+    pct = profit_loss_percentage or 0.0
+    win, loss = int(pnl > 0), int(pnl < 0)
+    values = (win, loss, pnl, pnl * pnl, pct, pct * pct, pct if win else 0.0, pct if loss else 0.0, pct, pct, pnl, pnl)
+    buckets = (
+        ("overall", ""),
+        ("direction", action),
+        ("leverage", leverage_bucket(leverage)),
+        ("day", closed_at[:10]),
+    )
+    cursor.executemany(f'''
+    INSERT INTO {AGGREGATES_TABLE} (scope, bucket, {", ".join(_COLUMNS)})
+    VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (scope, bucket) DO UPDATE SET
+        trades = trades + 1,
+        wins = wins + excluded.wins,
+        losses = losses + excluded.losses,
+        pnl_sum = pnl_sum + excluded.pnl_sum,
+        pnl_sq_sum = pnl_sq_sum + excluded.pnl_sq_sum,
+        pct_sum = pct_sum + excluded.pct_sum,
+        pct_sq_sum = pct_sq_sum + excluded.pct_sq_sum,
+        win_pct_sum = win_pct_sum + excluded.win_pct_sum,
+        loss_pct_sum = loss_pct_sum + excluded.loss_pct_sum,
+        max_pct = MAX(COALESCE(max_pct, excluded.max_pct), excluded.max_pct),
+        min_pct = MIN(COALESCE(min_pct, excluded.min_pct), excluded.min_pct),
+        max_pnl = MAX(COALESCE(max_pnl, excluded.max_pnl), excluded.max_pnl),
+        min_pnl = MIN(COALESCE(min_pnl, excluded.min_pnl), excluded.min_pnl)
+    ''', [(scope, bucket) + values for scope, bucket in buckets])
+
+
+def _to_metrics(row):
+    """집계 행(dict)에서 성과 지표를 계산합니다."""
+    n = row["trades"] or 0
+    if n == 0:
+        return {
+            "total_trades": 0, "winning_trades": 0, "losing_trades": 0, "win_rate": 0,
+            "total_profit_loss": 0, "avg_profit_loss": 0, "avg_profit_loss_percentage": 0,
+            "std_profit_loss_percentage": 0, "sharpe_ratio": 0,
+            "max_profit_percentage": 0, "max_loss_percentage": 0, "avg_win_percentage": 0, "avg_loss_percentage": 0,
+        }
+    mean_pct = row["pct_sum"] / n
+    # 표본 분산 = (제곱합 - n*평균^2) / (n-1)
+    variance = (row["pct_sq_sum"] - n * mean_pct * mean_pct) / (n - 1) if n > 1 else 0.0
+    std_pct = math.sqrt(max(variance, 0.0))
+    return {
+        "total_trades": n,
+        "winning_trades": row["wins"],
+        "losing_trades": row["losses"],
+        "win_rate": row["wins"] / n * 100,
+        "total_profit_loss": row["pnl_sum"],
+        "avg_profit_loss": row["pnl_sum"] / n,
+        "avg_profit_loss_percentage": mean_pct,
+        "std_profit_loss_percentage": std_pct,
+        # 거래당 손익률 평균 / 표준편차 (무위험 수익률 0 가정)
+        "sharpe_ratio": mean_pct / std_pct if std_pct > 0 else 0,
+        "max_profit_percentage": row["max_pct"] or 0,
+        "max_loss_percentage": row["min_pct"] or 0,
+        "avg_win_percentage": row["win_pct_sum"] / row["wins"] if row["wins"] else 0,
+        "avg_loss_percentage": row["loss_pct_sum"] / row["losses"] if row["losses"] else 0,
+    }
+
+
+def get_scope_metrics(db_file, scope):
+    """
+    범위 하나의 구간별 성과 지표를 반환합니다
+
+    반환값:
+        dict: 구간 이름 -> 성과 지표 (overall은 구간 이름이 '')
+    """
+    cursor = get_connection(db_file).cursor()
+    cursor.execute(f"SELECT bucket, {', '.join(_COLUMNS)} FROM {AGGREGATES_TABLE} WHERE scope = ?", (scope,))
+    names = ["bucket", *_COLUMNS]
+    return {row[0]: _to_metrics(dict(zip(names, row))) for row in cursor.fetchall()}
+
+
+def get_overall_metrics(db_file):
+    return get_scope_metrics(db_file, "overall").get("", _to_metrics({"trades": 0}))
+
+
+def get_recent_days_metrics(db_file, days):
+    """최근 days일(청산일 기준, 오늘 포함)의 일별 집계를 합친 성과 지표를 반환합니다."""
+    since_day = (datetime.now() - timedelta(days=days - 1)).date().isoformat()
+    cursor = get_connection(db_file).cursor()
+    cursor.execute(f'''
+    SELECT
+        SUM(trades), SUM(wins), SUM(losses), SUM(pnl_sum), SUM(pnl_sq_sum), SUM(pct_sum), SUM(pct_sq_sum),
+        SUM(win_pct_sum), SUM(loss_pct_sum), MAX(max_pct), MIN(min_pct), MAX(max_pnl), MIN(min_pnl)
+    FROM {AGGREGATES_TABLE}
+    WHERE scope = 'day' AND bucket >= ?
+    ''', (since_day,))
+    return _to_metrics(dict(zip(_COLUMNS, cursor.fetchone())))
@@ -0,0 +1,167 @@
+# position_conversation.py
+"""
+포지션 보유 중 재분석용 대화 상태 관리
+--------------------------------------------------------
+기능:
+- OpenAI Responses API의 previous_response_id로 서버 측 대화 상태를 이어감
+- 시스템 프롬프트(instructions)는 거래마다 한 번만 구성해 매 호출 동일한 접두어 유지
+- 직전 점검 이후 새로 생긴 캔들과 처음 보는 뉴스만 전송
+- 과금 기준 입력 토큰과 그중 캐시로 처리된 토큰 추적 (이어가는 대화도 이전 턴 전체가 입력으로 과금됨)
+--------------------------------------------------------
+"""
+import json
+
+from prompts import SYSTEM_PROMPT_UPDATE
+from model_router import route_request
+from news_provider import title_fingerprint
+
+# 한 대화에서 이어갈 최대 점검 횟수 (누적 컨텍스트가 커지면 새 대화로 시작)
+MAX_CHAIN_TURNS = 24
+
+# 전체 세션 누적 토큰 통계 (API usage 기준)
+_totals = {"calls": 0, "input_tokens": 0, "cached_tokens": 0}
+
+
+def new_session(trade, current_price, pnl_percentage):
+    """
+    열린 거래 하나에 대한 재분석 대화 세션을 생성합니다
+
+    매개변수:
+        trade (dict): 열린 거래 정보 (id, action, entry_price 포함)
+        current_price (float): 세션 시작 시점 가격
+        pnl_percentage (float): 세션 시작 시점 미실현 손익률
+
+    반환값:
+        dict: 세션 상태 (모델별 대화 체인, 토큰 통계)
+    """
+    instructions = SYSTEM_PROMPT_UPDATE.format(
+        side=trade['action'].upper(),
+        entry_price=trade['entry_price'],
+        current_price=current_price,
+        pnl_percentage=f"{pnl_percentage:.2f}"
+    )
+    return {
+        "trade_id": trade['id'],
+        "instructions": instructions,
+        "chains": {},  # 모델 이름 -> {"response_id", "turns", "candle_marks", "seen_news"}
+        "stats": {"calls": 0, "input_tokens": 0, "cached_tokens": 0},
+    }
+
+
+def _new_chain():
+    return {"response_id": None, "turns": 0, "candle_marks": {}, "seen_news": set()}
+
+
+def _news_key(item):
+    # 출처 접미사 등을 제거한 정규화 제목 기준으로 이미 보낸 헤드라인을 판별
+    return title_fingerprint(item.get("title") or "")
+
+
+def _build_payload(chain, market_data, news_data, position_update):
+    """
+    체인에 아직 보내지 않은 데이터만 담은 입력과, 전체 재전송 시의 입력을 함께 만듭니다
+
+    마지막 캔들은 아직 진행 중일 수 있으므로 직전 전송의 마지막 캔들부터 다시 포함합니다.
+    """
+    full = {"position_update": position_update, "timeframes": {}, "recent_news": news_data}
+    delta = {"position_update": position_update, "timeframes": {}, "recent_news": []}
+    new_marks = {}
+
+    for tf, df in market_data.items():
+        records = df.assign(timestamp=df['timestamp'].astype(str)).to_dict(orient="records")
+        full["timeframes"][tf] = records
+        last_mark = chain["candle_marks"].get(tf)
+        delta["timeframes"][tf] = [r for r in records if last_mark is None or r['timestamp'] >= last_mark]
+        if records:
+            new_marks[tf] = records[-1]['timestamp']
+
+    delta["recent_news"] = [n for n in news_data if _news_key(n) not in chain["seen_news"]]
+    return full, delta, new_marks
+
+
+def _record_usage(session, usage):
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    details = getattr(usage, "input_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+    for stats in (session["stats"], _totals):
+        stats["calls"] += 1
+        stats["input_tokens"] += input_tokens
+        stats["cached_tokens"] += cached_tokens
+
+    cached_pct = (cached_tokens / input_tokens * 100) if input_tokens else 0
+    print(f"[Conversation] 과금 입력 토큰: {input_tokens:,} (캐시 {cached_tokens:,}, {cached_pct:.1f}%)")
+
+
+def request_update_decision(client, session, market_data, news_data, current_price, pnl_percentage):
+    """
+    재분석 판단(HOLD/ADJUST/CLOSE)을 요청합니다
+
+    첫 호출은 전체 캔들과 뉴스를 보내고, 이후 호출은 previous_response_id로 대화를 이어가며
+    새 캔들과 새 뉴스만 보냅니다. 체인이 만료되었거나 이어가기에 실패하면 전체 재전송으로 돌아갑니다.
+
+    매개변수:
+        client (OpenAI): OpenAI 클라이언트
+        session (dict): new_session()으로 만든 세션
+        market_data (dict): 타임프레임별 DataFrame
+        news_data (list): 뉴스 목록
+        current_price (float): 현재 가격
+        pnl_percentage (float): 현재 미실현 손익률
+
+    반환값:
+        tuple: (응답 텍스트, 사용된 모델 이름)
+    """
+    position_update = {
+        "note": "Latest position status. This supersedes the prices in the instructions.",
+        "current_price": current_price,
+        "pnl_percentage": round(pnl_percentage, 2),
+    }
+
+    def request(model):
+        chain = session["chains"].setdefault(model, _new_chain())
+        if chain["turns"] >= MAX_CHAIN_TURNS:
+            chain.update(_new_chain())
+
+        full, delta, new_marks = _build_payload(chain, market_data, news_data, position_update)
+        sent_text = json.dumps(delta if chain["response_id"] else full)
+
+        try:
+            response = client.responses.create(
+                model=model,
+                instructions=session["instructions"],
+                input=sent_text,
+                previous_response_id=chain["response_id"],
+                store=True,
+                text={"format": {"type": "json_object"}}
+            )
+        except Exception as e:
+            if not chain["response_id"]:
+                raise
+            # 서버 측 대화가 만료된 경우 등: 새 체인으로 전체 데이터를 다시 보냄
+            print(f"[Conversation] 대화 이어가기 실패, 전체 재전송: {e}")
+            chain.update(_new_chain())
+            sent_text = json.dumps(full)
+            response = client.responses.create(
+                model=model,
+                instructions=session["instructions"],
+                input=sent_text,
+                store=True,
+                text={"format": {"type": "json_object"}}
+            )
+
+        chain["response_id"] = response.id
+        chain["turns"] += 1
+        chain["candle_marks"].update(new_marks)
+        chain["seen_news"].update(_news_key(n) for n in news_data)
+        _record_usage(session, response.usage)
+        return response.output_text, response.usage
+
+    return route_request("position_check", request)
+
+
+def get_conversation_stats(session=None):
+    """세션(또는 전체 누적)의 과금 입력 토큰 통계를 반환합니다. (cached_ratio: 입력 중 캐시로 처리된 비율)"""
+    stats = dict(session["stats"] if session else _totals)
+    stats["uncached_tokens"] = stats["input_tokens"] - stats["cached_tokens"]
+    stats["cached_ratio"] = (stats["cached_tokens"] / stats["input_tokens"]) if stats["input_tokens"] else 0
+    return stats
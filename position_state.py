@@ -0,0 +1,200 @@
+# position_state.py
+"""
+열린 포지션/지갑/최근 분석 메모리 상태 (write-through)
+--------------------------------------------------------
+기능:
+- 시작 후 처음 조회할 때 DB에서 한 번 읽고, 이후 루프의 조회는 메모리에서 반환
+- 진입/청산/TP·SL 변경/분석 저장은 DB에 먼저 커밋한 뒤 메모리 상태를 갱신 (커밋 실패 시 상태 변경 없음)
+- 일정 간격으로 DB와 비교해 다르면 경고를 출력하고 DB 값으로 교체 (대시보드 등 외부 변경 대비)
+- 봇 루프와 자산 시계열 샘플러 스레드가 함께 사용하므로 잠금으로 보호
+--------------------------------------------------------
+"""
+import threading
+import time
+from datetime import datetime
+
+VERIFY_INTERVAL = 300   # DB와 비교하는 주기 (초)
+
+
+class PositionState:
+    """
+    열린 포지션, 지갑 잔고, 최근 분석의 메모리 사본
+
+    매개변수:
+        store (TradingStore): 거래/분석 저장소
+        load_wallet (callable, optional): 지갑 잔고를 DB에서 읽는 함수 (모의 거래)
+        add_wallet (callable, optional): 잔고에 금액을 더하고 새 잔고를 반환하는 함수 (청산 트랜잭션 안에서 호출)
+        verify_interval (int): DB와 비교하는 주기 (초)
+    """
+
+    def __init__(self, store, load_wallet=None, add_wallet=None, verify_interval=VERIFY_INTERVAL):
+        self.store = store
+        self._load_wallet = load_wallet
+        self._add_wallet = add_wallet
+        self.verify_interval = verify_interval
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._open_trade = None
+        self._wallet_balance = None
+        self._last_analysis = None
+        self._last_verify = 0.0
+        self._stats = {"reads": 0, "db_loads": 0, "verifications": 0, "mismatches": 0}
+
+    # ----- DB에서 읽기 -----
+    def _read_db(self):
+        trade = self.store.get_open_trade()
+        analyses = self.store.get_analyses(limit=1)
+        return (
+            self.store.as_dict(trade) if trade else None,
+            self._load_wallet() if self._load_wallet else None,
+            analyses[0] if analyses else None,
+        )
+
+    def load(self):
+        """DB에서 상태 전체를 다시 읽습니다."""
+        with self._lock:
+            self._open_trade, self._wallet_balance, self._last_analysis = self._read_db()
+            self._loaded = True
+            self._last_verify = time.monotonic()
+            self._stats["db_loads"] += 1
+
+    def verify(self):
+        """
+        메모리 상태를 DB와 비교하고 다르면 DB 값으로 교체합니다
+
+        반환값:
+            bool: 메모리 상태가 DB와 같았으면 True
+        """
+        with self._lock:
+            if not self._loaded:
+                self.load()
+                return True
+            open_trade, wallet_balance, last_analysis = self._read_db()
+            differences = []
+            if open_trade != self._open_trade:
+                differences.append(f"open_trade {self._describe(self._open_trade)} -> {self._describe(open_trade)}")
+            if wallet_balance is not None and (self._wallet_balance is None or abs(wallet_balance - self._wallet_balance) > 1e-9):
+                differences.append(f"wallet {self._wallet_balance} -> {wallet_balance}")
+            self._open_trade, self._wallet_balance, self._last_analysis = open_trade, wallet_balance, last_analysis
+            self._last_verify = time.monotonic()
+            self._stats["verifications"] += 1
+            if differences:
+                self._stats["mismatches"] += 1
+                print(f"[PositionState] 메모리 상태가 DB와 달라 DB 값으로 교체: {'; '.join(differences)}")
+            return not differences
+
+    @staticmethod
+    def _describe(trade):
+        return f"#{trade['id']} {trade['action']}" if trade else "None"
+
+    def _current(self):
+        """처음 조회할 때 DB에서 읽고, 검증 주기가 지났으면 DB와 비교합니다. (잠금 안에서 호출)"""
+        if not self._loaded:
+            self.load()
+        elif time.monotonic() - self._last_verify >= self.verify_interval:
+            self.verify()
+        self._stats["reads"] += 1
+
+    # ----- 조회 (메모리) -----
+    @property
+    def open_trade(self):
+        """열린 거래 dict 사본 (없으면 None)"""
+        with self._lock:
+            self._current()
+            return dict(self._open_trade) if self._open_trade else None
+
+    @property
+    def wallet_balance(self):
+        """지갑 잔고 (load_wallet이 없으면 None)"""
+        with self._lock:
+            self._current()
+            return self._wallet_balance
+
+    @property
+    def last_analysis(self):
+        """가장 최근에 저장한 분석 (AnalysisRecord 또는 None)"""
+        with self._lock:
+            self._current()
+            return self._last_analysis
+
+    # ----- 변경 (DB 커밋 후 메모리 갱신) -----
+    def open_position(self, trade, analysis=None, analysis_id=None):
+        """
+        거래(와 그 거래를 연 분석)를 한 번의 커밋으로 저장하고 열린 포지션으로 기록합니다
+
+        주문 전에 분석을 미리 저장했다면 analysis 대신 analysis_id를 넘겨 같은 커밋에서 거래에 연결합니다.
+
+        반환값:
+            int: 생성된 거래 ID
+        """
+        with self._lock:
+            with self.store.backend.transaction(durable=True, label="trade_open"):
+                self.store.insert_trade(trade)
+                if analysis is not None:
+                    analysis.trade_id = trade.id
+                    self.store.insert_analysis(analysis)
+                elif analysis_id is not None:
+                    self.store.link_analysis(analysis_id, trade.id)
+            self._open_trade = self.store.as_dict(trade)
+            if analysis is not None:
+                self._last_analysis = analysis
+            elif analysis_id is not None and self._last_analysis is not None and self._last_analysis.id == analysis_id:
+                self._last_analysis.trade_id = trade.id
+            return trade.id
+
+    def record_analysis(self, analysis, background=False):
+        """분석을 저장하고 최근 분석으로 기록합니다. (background=True면 백그라운드 기록 큐 사용, ID 없음)"""
+        with self._lock:
+            analysis_id = self.store.insert_analysis(analysis, background=background)
+            self._last_analysis = analysis
+            return analysis_id
+
+    def update_exit_points(self, trade_id, tp_price, sl_price):
+        """열린 거래의 TP/SL 가격을 바꿉니다."""
+        with self._lock:
+            self.store.update_exit_points(trade_id, tp_price, sl_price)
+            if self._open_trade and self._open_trade["id"] == trade_id:
+                self._open_trade.update(tp_price=tp_price, sl_price=sl_price)
+
+    def close_position(self, trade_id, exit_price, profit_loss, profit_loss_percentage=None, exit_timestamp=None):
+        """
+        거래를 종료하고 성과 집계와 지갑 잔고(add_wallet이 있으면)를 같은 커밋으로 갱신합니다
+
+        반환값:
+            TradeRecord: 종료 전 거래 (없거나 이미 종료된 거래면 None, 아무것도 바꾸지 않음)
+        """
+        with self._lock:
+            wallet_balance = None
+            with self.store.backend.transaction(durable=True, label="trade_close"):
+                previous = self.store.get_trade(trade_id)
+                if previous is None or previous.status == "CLOSED":
+                    previous = None
+                else:
+                    self.store.update_trade_status(
+                        trade_id, "CLOSED", exit_price=exit_price,
+                        exit_timestamp=exit_timestamp or datetime.now().isoformat(),
+                        profit_loss=profit_loss, profit_loss_percentage=profit_loss_percentage
+                    )
+                    if self._add_wallet is not None:
+                        wallet_balance = self._add_wallet(profit_loss)
+            if previous is not None:
+                # 종료 후 남은 열린 거래 (보통 없음)
+                trade = self.store.get_open_trade()
+                self._open_trade = self.store.as_dict(trade) if trade else None
+            if wallet_balance is not None:
+                self._wallet_balance = wallet_balance
+            return previous
+
+    # ----- 통계 -----
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def print_stats(self):
+        stats = self.get_stats()
+        if stats["reads"] == 0:
+            return
+        print(
+            f"[PositionState] {stats['reads']} reads served from memory | DB loads {stats['db_loads']} | "
+            f"verifications {stats['verifications']} (mismatches {stats['mismatches']})"
+        )
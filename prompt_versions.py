@@ -0,0 +1,165 @@
+# prompt_versions.py
+"""
+프롬프트 버전별 성과 집계 (모의 거래)
+--------------------------------------------------------
+기능:
+- mock_trades/mock_ai_analysis에 prompt_id 컬럼 추가, 봇이 저장할 때 현재 활성 프롬프트 ID를 기록
+- 기존 행은 prompt_history 시작 시간(start_time_ms) 인덱스를 이용한 구간 조인으로 버전을 배정 (백필)
+- 프롬프트 페이지의 버전별 손익, 승률, 판단 분포를 prompt_id 인덱스만으로 바로 계산
+- 판단 분포는 보관 DB(archive.py)로 옮겨진 오래된 분석까지 합친 all_mock_ai_analysis 뷰에서 집계
+- 샤드 봇(shards.py)도 기본 파일의 prompt_history ID를 기록하지만, 프롬프트 페이지 집계는 기본 파일의 거래/분석만 포함
+- python prompt_versions.py: 합성 데이터로 백필/집계 속도와 실행 계획 확인
+--------------------------------------------------------
+"""
+import pandas as pd
+
+from db import get_connection
+
+# 프롬프트 ID를 기록하는 테이블 -> 구간을 찾을 시간 컬럼 (epoch-ms)
+ATTRIBUTED_TABLES = {
+    "mock_trades": "timestamp_ms",         # 진입 시점의 프롬프트
+    "mock_ai_analysis": "timestamp_ms",
+}
+
+
+def backfill_prompt_ids(cursor, table, time_column="timestamp_ms"):
+    """
+    prompt_id가 없는 행에 그 시간에 사용 중이던 프롬프트 ID를 채웁니다
+
+    행마다 start_time_ms 인덱스를 역순으로 탐색해 시작 시간이 가장 늦은 프롬프트를 찾고,
+    그 프롬프트가 이미 종료된 뒤의 행(사용 중인 프롬프트가 없던 구간)은 NULL로 둡니다.
+
+    반환값:
+        int: 갱신한 행 수
+    """
+    cursor.execute(f'''
+    UPDATE {table} SET prompt_id = (
+        SELECT p.id FROM prompt_history p
+        WHERE p.start_time_ms <= {table}.{time_column}
+          AND (p.end_time_ms IS NULL OR p.end_time_ms > {table}.{time_column})
+        ORDER BY p.start_time_ms DESC
+        LIMIT 1
+    )
+    WHERE prompt_id IS NULL AND {time_column} IS NOT NULL
+    ''')
+    return cursor.rowcount
+
+
+def setup_prompt_attribution(cursor):
+    """prompt_id 컬럼과 버전별 집계용 커버링 인덱스를 만들고 기존 행을 백필합니다. (마이그레이션에서 호출)"""
+    for table, time_column in ATTRIBUTED_TABLES.items():
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN prompt_id INTEGER REFERENCES prompt_history (id)")
+        backfill_prompt_ids(cursor, table, time_column)
+    # 버전별 손익/승률 (status = 'CLOSED'), 판단 분포 - 테이블을 읽지 않고 인덱스만으로 계산
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mock_trades_prompt_status_pnl ON mock_trades (prompt_id, status, profit_loss)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mock_ai_analysis_prompt_direction ON mock_ai_analysis (prompt_id, direction)")
+
+
+def get_active_prompt_id(db_file):
+    """현재 사용 중인 프롬프트(end_time IS NULL)의 ID (없으면 None)"""
+    row = get_connection(db_file).execute(
+        "SELECT id FROM prompt_history WHERE end_time IS NULL ORDER BY start_time DESC LIMIT 1"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def get_prompt_version_stats(db_file):
+    """
+    프롬프트 버전별 성과와 판단 분포를 최신 버전부터 반환합니다
+
+    매개변수:
+        db_file (str): 모의 거래 DB 파일 경로 (보관 DB를 붙인 읽기 전용 연결로 조회)
+
+    반환값:
+        DataFrame: prompt_id, start_time, end_time, trades, wins, win_rate, pnl_sum, avg_pnl,
+            analyses, long_count, short_count, no_position_count
+    """
+    from archive import attach_archive  # archive -> shards -> storage -> migrations -> prompt_versions 순환 import 방지
+    conn = get_connection(db_file, readonly=True)
+    attach_archive(conn, db_file, "mock")
+    return pd.read_sql_query('''
+    WITH trade_stats AS (
+        SELECT prompt_id, COUNT(*) AS trades, SUM(profit_loss > 0) AS wins,
+               SUM(profit_loss) AS pnl_sum, AVG(profit_loss) AS avg_pnl
+        FROM mock_trades
+        WHERE prompt_id IS NOT NULL AND status = 'CLOSED'
+        GROUP BY prompt_id
+    ),
+    decision_stats AS (
+        SELECT prompt_id, COUNT(*) AS analyses,
+               SUM(direction = 'LONG') AS long_count,
+               SUM(direction = 'SHORT') AS short_count,
+               SUM(direction = 'NO_POSITION') AS no_position_count
+        FROM all_mock_ai_analysis
+        WHERE prompt_id IS NOT NULL
+        GROUP BY prompt_id
+    )
+    SELECT
+        p.id AS prompt_id, p.start_time, p.end_time,
+        COALESCE(t.trades, 0) AS trades,
+        COALESCE(t.wins, 0) AS wins,
+        COALESCE(t.wins * 100.0 / t.trades, 0) AS win_rate,
+        COALESCE(t.pnl_sum, 0) AS pnl_sum,
+        COALESCE(t.avg_pnl, 0) AS avg_pnl,
+        COALESCE(d.analyses, 0) AS analyses,
+        COALESCE(d.long_count, 0) AS long_count,
+        COALESCE(d.short_count, 0) AS short_count,
+        COALESCE(d.no_position_count, 0) AS no_position_count
+    FROM prompt_history p
+    LEFT JOIN trade_stats t ON t.prompt_id = p.id
+    LEFT JOIN decision_stats d ON d.prompt_id = p.id
+    ORDER BY p.start_time_ms DESC
+    ''', conn)
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import shutil
+    import sys
+    import tempfile
+    import time
+
+    from db import close_connections
+
+    ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    VERSIONS = 50
+    work_dir = tempfile.mkdtemp()
+    db_file = os.path.join(work_dir, "prompt_bench.db")
+    cursor = get_connection(db_file).cursor()
+    cursor.execute('''
+    CREATE TABLE prompt_history (id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT, start_time TEXT, end_time TEXT,
+                                 start_time_ms INTEGER, end_time_ms INTEGER)''')
+    cursor.execute("CREATE INDEX idx_prompt_history_start_time_ms ON prompt_history (start_time_ms)")
+    cursor.execute("CREATE TABLE mock_trades (id INTEGER PRIMARY KEY, timestamp_ms INTEGER, status TEXT, profit_loss REAL)")
+    cursor.execute("CREATE TABLE mock_ai_analysis (id INTEGER PRIMARY KEY, timestamp_ms INTEGER, direction TEXT)")
+    span = ROWS * 60_000 // VERSIONS
+    cursor.execute("BEGIN")
+    cursor.executemany(
+        "INSERT INTO prompt_history (content, start_time, end_time, start_time_ms, end_time_ms) VALUES ('p', ?, ?, ?, ?)",
+        [(str(v), None if v == VERSIONS - 1 else str(v + 1), v * span, None if v == VERSIONS - 1 else (v + 1) * span)
+         for v in range(VERSIONS)]
+    )
+    cursor.executemany("INSERT INTO mock_trades (timestamp_ms, status, profit_loss) VALUES (?, 'CLOSED', ?)",
+                       ((i * 60_000, random.uniform(-50, 50)) for i in range(ROWS)))
+    cursor.executemany("INSERT INTO mock_ai_analysis (timestamp_ms, direction) VALUES (?, ?)",
+                       ((i * 60_000, random.choice(("LONG", "SHORT", "NO_POSITION"))) for i in range(ROWS)))
+    cursor.execute("COMMIT")
+
+    start = time.perf_counter()
+    cursor.execute("BEGIN")
+    setup_prompt_attribution(cursor)
+    cursor.execute("COMMIT")
+    print(f"Backfill of {ROWS:,} trades + {ROWS:,} analyses over {VERSIONS} versions: {time.perf_counter() - start:.1f}s")
+
+    plan = " | ".join(row[3] for row in cursor.execute(
+        "EXPLAIN QUERY PLAN SELECT prompt_id, COUNT(*), SUM(profit_loss) FROM mock_trades "
+        "WHERE prompt_id IS NOT NULL AND status = 'CLOSED' GROUP BY prompt_id"))
+    print(f"Trade stats plan: {plan}")
+    start = time.perf_counter()
+    stats = get_prompt_version_stats(db_file)
+    print(f"Per-version stats: {len(stats)} versions in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({int(stats['trades'].sum()):,} trades attributed)")
+
+    close_connections()
+    shutil.rmtree(work_dir)
@@ -0,0 +1,188 @@
+# search_index.py
+"""
+AI 분석 근거와 뉴스 헤드라인 전문 검색 (SQLite FTS5)
+--------------------------------------------------------
+기능:
+- 원본 테이블을 그대로 두고 외부 콘텐츠(external content) FTS5 색인만 추가 (텍스트 중복 저장 없음)
+- INSERT/UPDATE/DELETE 트리거로 색인을 원본과 항상 동기화 (보관 작업으로 삭제된 행도 색인에서 제거)
+- search()/search_all(): bm25 순위와 검색어 강조 스니펫을 반환, 입력은 FTS 문법 오류가 나지 않게 정리
+- python search_index.py: 합성 30만 행에서 색인 생성/검색 속도 측정
+--------------------------------------------------------
+"""
+import re
+import sqlite3
+import time
+
+import pandas as pd
+
+from db import get_connection
+
+# 검색 대상 이름 -> (원본 테이블, 텍스트 컬럼, 시간 표현식)
+SEARCH_SOURCES = {
+    "ai_analysis": ("ai_analysis", "reasoning", "timestamp"),
+    "mock_ai_analysis": ("mock_ai_analysis", "reasoning", "timestamp"),
+    "trade_adjustments": ("trade_adjustments", "reasoning", "timestamp"),
+    "news_headlines": ("news_headlines", "title", "datetime(first_seen, 'unixepoch', 'localtime')"),
+}
+
+TOKENIZER = "porter unicode61"   # 영어 어간 추출 (liquidations -> liquidat)
+SNIPPET_TOKENS = 16              # 스니펫 길이 (토큰 수)
+_QUERY_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def setup_search_index(cursor, table, column):
+    """
+    테이블 하나에 FTS5 색인과 동기화 트리거를 만들고 기존 행을 색인합니다 (마이그레이션에서 호출)
+
+    매개변수:
+        cursor: 트랜잭션 안의 커서
+        table (str): 원본 테이블 (INTEGER PRIMARY KEY id 필요)
+        column (str): 색인할 텍스트 컬럼
+    """
+    fts = f"{table}_fts"
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,))
+    if cursor.fetchone():
+        return
+    cursor.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({column}, content='{table}', content_rowid='id', tokenize='{TOKENIZER}')")
+    cursor.execute(f'''
+    CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column});
+    END''')
+    cursor.execute(f'''
+    CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+    END''')
+    cursor.execute(f'''
+    CREATE TRIGGER {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN
+        INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+        INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column});
+    END''')
+    cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def to_fts_query(text):
+    """
+    사용자 입력을 FTS5 쿼리로 바꿉니다
+
+    단어마다 따옴표로 감싸 AND 검색하고 마지막 단어는 접두어 검색합니다. (입력 중 검색, 특수문자 무시)
+
+    반환값:
+        str: FTS5 MATCH 식 (검색할 단어가 없으면 None)
+    """
+    tokens = _QUERY_TOKEN_RE.findall(text or "")
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(db_file, text, sources, limit=20, readonly=True):
+    """
+    검색어와 관련도가 높은 순서로 기록을 찾습니다
+
+    매개변수:
+        db_file (str): 데이터베이스 파일 경로
+        text (str): 검색어
+        sources (list): SEARCH_SOURCES의 이름 목록 (이 DB에 있는 것만)
+        limit (int): 최대 결과 수
+        readonly (bool): 읽기 전용 연결 사용 여부 (대시보드)
+
+    반환값:
+        DataFrame: source, id, timestamp, snippet(**검색어** 강조), score(bm25, 낮을수록 관련도 높음)
+    """
+    query = to_fts_query(text)
+    columns = ["source", "id", "timestamp", "snippet", "score"]
+    if query is None:
+        return pd.DataFrame(columns=columns)
+
+    conn = get_connection(db_file, readonly=readonly)
+    selects = []
+    for source in sources:
+        table, column, time_expr = SEARCH_SOURCES[source]
+        fts = f"{table}_fts"
+        selects.append(f'''
+        SELECT * FROM (
+            SELECT '{source}' AS source, t.id AS id, {time_expr} AS timestamp,
+                   snippet({fts}, 0, '**', '**', '…', {SNIPPET_TOKENS}) AS snippet, {fts}.rank AS score
+            FROM {fts} JOIN {table} t ON t.id = {fts}.rowid
+            WHERE {fts} MATCH :query
+            ORDER BY {fts}.rank
+            LIMIT :limit
+        )''')
+    sql = " UNION ALL ".join(selects) + " ORDER BY score LIMIT :limit"
+    return pd.read_sql_query(sql, conn, params={"query": query, "limit": limit})
+
+
+def search_all(targets, text, limit=20):
+    """
+    여러 DB를 한 번에 검색합니다 (대시보드 검색창용)
+
+    색인이나 DB 파일이 아직 없는 대상은 건너뜁니다.
+
+    매개변수:
+        targets (list): (DB 파일 경로, 검색 대상 이름 목록) 튜플 목록
+        text (str): 검색어
+        limit (int): 최대 결과 수
+    """
+    frames = []
+    for db_file, sources in targets:
+        try:
+            frames.append(search(db_file, text, sources, limit))
+        except (pd.errors.DatabaseError, sqlite3.OperationalError):
+            continue
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=["source", "id", "timestamp", "snippet", "score"])
+    return pd.concat(frames, ignore_index=True).sort_values("score").head(limit).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import shutil
+    import sys
+    import tempfile
+
+    from db import close_connections
+
+    ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    keywords = (
+        "bitcoin price momentum rsi macd bullish bearish divergence support resistance volume trend "
+        "breakout consolidation funding rate open interest whales exchange inflows outflows fed cpi "
+        "etf approval liquidation cascade short squeeze long leverage volatility range ema crossover"
+    ).split()
+    # 실제 분석 글처럼 일반 단어가 대부분이고 키워드는 드물게 나오도록 구성 (Zipf 분포)
+    fillers = [f"w{i}" for i in range(5000)]
+    vocabulary = fillers[:200] + keywords + fillers[200:]
+    weights = [1 / (rank + 20) for rank in range(len(vocabulary))]
+    work_dir = tempfile.mkdtemp()
+    db_file = os.path.join(work_dir, "search_bench.db")
+    cursor = get_connection(db_file).cursor()
+    cursor.execute("CREATE TABLE ai_analysis (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, reasoning TEXT)")
+    cursor.execute("BEGIN")
+    cursor.executemany(
+        "INSERT INTO ai_analysis (timestamp, reasoning) VALUES (?, ?)",
+        ((f"2025-01-01T00:{i % 60:02d}:00", " ".join(random.choices(vocabulary, weights, k=80))) for i in range(ROWS))
+    )
+    cursor.execute("COMMIT")
+
+    start = time.perf_counter()
+    cursor.execute("BEGIN")
+    setup_search_index(cursor, "ai_analysis", "reasoning")
+    cursor.execute("COMMIT")
+    print(f"Indexed {ROWS:,} rows in {time.perf_counter() - start:.1f}s")
+
+    for text in ("ETF", "liquidation cascade", "short squee", "whales outflows bearish"):
+        start = time.perf_counter()
+        results = search(db_file, text, ["ai_analysis"], readonly=False)
+        print(f"{text!r:28} {len(results)} hits in {(time.perf_counter() - start) * 1000:.1f} ms | {results.iloc[0]['snippet'][:70] if len(results) else ''}")
+
+    cursor.execute("INSERT INTO ai_analysis (timestamp, reasoning) VALUES ('2025-01-02T00:00:00', 'unique zebra marker')")
+    found = len(search(db_file, "zebra", ["ai_analysis"], readonly=False))
+    cursor.execute("DELETE FROM ai_analysis WHERE reasoning = 'unique zebra marker'")
+    gone = len(search(db_file, "zebra", ["ai_analysis"], readonly=False)) == 0
+    print(f"Trigger sync: insert found={found == 1}, delete removed={gone}")
+
+    close_connections()
+    shutil.rmtree(work_dir)
@@ -0,0 +1,250 @@
+# shards.py
+"""
+전략(봇)별 DB 샤드와 전체 합계 조회
+--------------------------------------------------------
+기능:
+- BOT_SHARD 환경 변수로 봇마다 자기 DB 파일(shards/<DB 이름>/<샤드>.db)에 기록 (쓰기 잠금을 서로 기다리지 않음)
+- 샤드를 지정하지 않으면 기존 단일 파일(bitcoin_trading.db / mock_trading.db)을 그대로 사용 ("default" 샤드)
+- 대시보드는 샤드들을 읽기 전용으로 ATTACH하고 UNION ALL 뷰(shard 컬럼 추가)로 한 번에 조회
+- SQLite의 ATTACH 개수 제한(기본 10)을 넘으면 샤드를 묶음으로 나눠 조회한 뒤 결과를 합침
+- DB 파일 경로에서 프로필/샤드 이름을 찾음 (보관, Parquet 내보내기가 샤드 파일도 같은 규칙으로 처리)
+- 프롬프트 이력(prompt_history)은 대시보드가 기본 파일에만 기록하므로 샤드 봇도 기본 파일에서 활성 프롬프트 ID를 읽음
+- python shards.py [샤드 수]: 합성 샤드로 전체 합계 조회 속도 측정
+--------------------------------------------------------
+"""
+import glob
+import os
+import re
+import sqlite3
+
+import pandas as pd
+
+from storage import PROFILES
+
+SHARD_ENV = "BOT_SHARD"          # 봇이 기록할 샤드 이름을 지정하는 환경 변수
+SHARD_DIR = "shards"             # 기본 DB 파일 옆에 만드는 샤드 디렉터리
+DEFAULT_SHARD = "default"        # 기존 단일 DB 파일의 샤드 이름
+ARCHIVE_SUFFIX = "_archive"      # archive.py의 보관 DB (<샤드>_archive.db)는 샤드가 아님
+_SHARD_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def shard_file(profile, shard=None, base_dir=""):
+    """
+    샤드 이름에 해당하는 DB 파일 경로를 반환합니다
+
+    매개변수:
+        profile (str): "live" 또는 "mock"
+        shard (str, optional): 샤드(전략/봇) 이름 (기본값: BOT_SHARD 환경 변수, 없으면 기존 단일 파일)
+        base_dir (str): 기본 DB 파일이 있는 디렉터리
+
+    반환값:
+        str: DB 파일 경로
+    """
+    default_file = os.path.join(base_dir, PROFILES[profile][0])
+    shard = shard or os.getenv(SHARD_ENV) or DEFAULT_SHARD
+    if shard == DEFAULT_SHARD:
+        return default_file
+    if not _SHARD_NAME.match(shard):
+        raise ValueError(f"샤드 이름은 영문, 숫자, '_', '-'만 사용할 수 있습니다: {shard!r}")
+    shard_dir = os.path.join(base_dir, SHARD_DIR, os.path.splitext(PROFILES[profile][0])[0])
+    os.makedirs(shard_dir, exist_ok=True)
+    return os.path.join(shard_dir, f"{shard}.db")
+
+
+def list_shards(profile, base_dir=""):
+    """존재하는 샤드 이름 -> DB 파일 경로 (기존 단일 파일은 "default")"""
+    default_file = os.path.join(base_dir, PROFILES[profile][0])
+    shards = {DEFAULT_SHARD: default_file} if os.path.exists(default_file) else {}
+    pattern = os.path.join(base_dir, SHARD_DIR, os.path.splitext(PROFILES[profile][0])[0], "*.db")
+    for path in sorted(glob.glob(pattern)):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if _SHARD_NAME.match(name) and not name.endswith(ARCHIVE_SUFFIX):
+            shards[name] = path
+    return shards
+
+
+def shard_info(db_file):
+    """
+    DB 파일 경로의 프로필과 샤드 이름을 찾습니다
+
+    반환값:
+        tuple: (프로필, 샤드 이름, 기본 DB 파일이 있는 디렉터리), 봇 DB가 아니면 None
+    """
+    path = os.path.abspath(db_file)
+    file_name, parent = os.path.basename(path), os.path.dirname(path)
+    for profile, (default_name, _, _) in PROFILES.items():
+        if file_name == default_name:
+            return profile, DEFAULT_SHARD, parent
+        shard_root = os.path.dirname(parent)
+        if os.path.basename(parent) == os.path.splitext(default_name)[0] and os.path.basename(shard_root) == SHARD_DIR:
+            name = os.path.splitext(file_name)[0]
+            if _SHARD_NAME.match(name) and not name.endswith(ARCHIVE_SUFFIX):
+                return profile, name, os.path.dirname(shard_root)
+    return None
+
+
+def list_all_shards(base_dir=""):
+    """모든 프로필의 존재하는 샤드 DB 파일 목록 (보관/내보내기 CLI 기본 대상)"""
+    return [path for profile in PROFILES for path in list_shards(profile, base_dir).values()]
+
+
+class ShardReader:
+    """
+    여러 샤드를 ATTACH해 거래/분석 테이블을 하나의 뷰로 조회하는 읽기 전용 세션
+
+    뷰 이름은 원래 테이블 이름(trades, mock_trades, mock_wallet 등)과 같고 shard 컬럼이 추가됩니다.
+    샤드마다 스키마 버전이 달라도 모든 샤드에 있는 컬럼만 뷰에 포함합니다.
+
+    매개변수:
+        profile (str): "live" 또는 "mock"
+        base_dir (str): 기본 DB 파일이 있는 디렉터리
+        shards (dict, optional): 샤드 이름 -> 파일 경로 (기본값: list_shards() 결과)
+        chunk_size (int, optional): 한 세션에 ATTACH할 샤드 수 (기본값: SQLite ATTACH 제한)
+    """
+
+    def __init__(self, profile, base_dir="", shards=None, chunk_size=None):
+        _, self.trade_table, self.analysis_table = PROFILES[profile]
+        self.tables = [self.trade_table, self.analysis_table, "performance_aggregates"]
+        if profile == "mock":
+            self.tables.append("mock_wallet")
+        self.shards = shards if shards is not None else list_shards(profile, base_dir)
+        if chunk_size is None:
+            probe = sqlite3.connect(":memory:")
+            chunk_size = probe.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+            probe.close()
+        self.chunk_size = chunk_size
+
+    def _open_session(self, chunk):
+        conn = sqlite3.connect(":memory:", uri=True, isolation_level=None)
+        for i, path in enumerate(chunk.values()):
+            conn.execute(f"ATTACH DATABASE ? AS s{i}", (f"file:{os.path.abspath(path)}?mode=ro",))
+        for table in self.tables:
+            sources = []
+            columns = None
+            for i, name in enumerate(chunk):
+                shard_columns = [row[1] for row in conn.execute(f"PRAGMA s{i}.table_info({table})")]
+                if not shard_columns:
+                    continue  # 아직 테이블이 없는 샤드 (봇이 처음 시작하기 전)
+                sources.append((i, name))
+                columns = shard_columns if columns is None else [c for c in columns if c in shard_columns]
+            if not sources:
+                continue
+            column_list = ", ".join(f'"{c}"' for c in columns)
+            union = " UNION ALL ".join(
+                "SELECT '{}' AS shard, {} FROM s{}.{}".format(name.replace("'", "''"), column_list, i, table)
+                for i, name in sources
+            )
+            conn.execute(f"CREATE TEMP VIEW {table} AS {union}")
+        return conn
+
+    def _chunks(self):
+        items = list(self.shards.items())
+        for start in range(0, len(items), self.chunk_size):
+            yield dict(items[start:start + self.chunk_size])
+
+    def query(self, sql, params=()):
+        """
+        샤드 묶음마다 같은 SQL을 실행하고 결과를 이어 붙입니다
+
+        샤드가 ATTACH 제한보다 많으면 묶음별 결과가 합쳐지므로, 집계는 shard로 GROUP BY 하고
+        전체 합계는 반환된 DataFrame에서 계산합니다. (totals() 참고)
+
+        반환값:
+            DataFrame: 쿼리 결과 (샤드가 없거나 테이블이 없으면 빈 DataFrame)
+        """
+        frames = []
+        for chunk in self._chunks():
+            conn = self._open_session(chunk)
+            try:
+                frames.append(pd.read_sql_query(sql, conn, params=params))
+            except (pd.errors.DatabaseError, sqlite3.OperationalError):
+                continue  # 이 묶음의 샤드에 아직 테이블이 없음
+            finally:
+                conn.close()
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def shard_summary(self):
+        """
+        샤드별 종료 거래 수, 승리 수, 누적 손익, 열린 포지션 수, 지갑 잔고(모의 거래)
+
+        반환값:
+            DataFrame: shard, trades, wins, win_rate, pnl_sum, open_positions, last_trade, (usdt_balance)
+        """
+        summary = self.query(f'''
+        SELECT shard,
+               SUM(status = 'CLOSED') AS trades,
+               SUM(status = 'CLOSED' AND profit_loss > 0) AS wins,
+               COALESCE(SUM(CASE WHEN status = 'CLOSED' THEN profit_loss END), 0) AS pnl_sum,
+               SUM(status = 'OPEN') AS open_positions,
+               MAX(timestamp) AS last_trade
+        FROM {self.trade_table}
+        GROUP BY shard
+        ''')
+        if summary.empty:
+            return summary
+        summary["win_rate"] = (summary["wins"] * 100.0 / summary["trades"].where(summary["trades"] > 0)).fillna(0)
+        if "mock_wallet" in self.tables:
+            wallets = self.query("SELECT shard, usdt_balance FROM mock_wallet WHERE id = 1")
+            if not wallets.empty:
+                summary = summary.merge(wallets, on="shard", how="left")
+        return summary.sort_values("pnl_sum", ascending=False, ignore_index=True)
+
+    def totals(self, summary=None):
+        """모든 샤드의 합계 (shard_summary() 결과를 더함)"""
+        summary = self.shard_summary() if summary is None else summary
+        if summary.empty:
+            return {"shards": 0, "trades": 0, "wins": 0, "win_rate": 0, "pnl_sum": 0.0, "open_positions": 0}
+        trades, wins = int(summary["trades"].sum()), int(summary["wins"].sum())
+        totals = {
+            "shards": len(summary),
+            "trades": trades,
+            "wins": wins,
+            "win_rate": wins * 100.0 / trades if trades else 0,
+            "pnl_sum": float(summary["pnl_sum"].sum()),
+            "open_positions": int(summary["open_positions"].sum()),
+        }
+        if "usdt_balance" in summary.columns:
+            totals["usdt_balance"] = float(summary["usdt_balance"].sum())
+        return totals
+
+
+if __name__ == "__main__":
+    import random
+    import shutil
+    import sys
+    import tempfile
+    import time
+
+    from db import close_connections, get_connection
+    from storage import TradeRecord, TradingStore
+
+    SHARDS = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    ROWS = 5_000
+    work_dir = tempfile.mkdtemp()
+    start = time.perf_counter()
+    for n in range(SHARDS):
+        db_file = shard_file("mock", f"bot-{n:02d}", base_dir=work_dir)
+        cursor = get_connection(db_file).cursor()
+        cursor.execute('''
+        CREATE TABLE mock_trades (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, action TEXT, entry_price REAL,
+                                  amount REAL, leverage INTEGER, status TEXT, profit_loss REAL)''')
+        cursor.execute("CREATE TABLE mock_wallet (id INTEGER PRIMARY KEY, usdt_balance REAL)")
+        cursor.execute("INSERT INTO mock_wallet VALUES (1, 10000)")
+        TradingStore("mock", db_file).insert_trades([
+            TradeRecord(timestamp=f"2025-01-01T00:{i % 60:02d}:00", action=random.choice(("long", "short")),
+                        entry_price=100_000, amount=0.01, leverage=5,
+                        status="CLOSED" if i < ROWS - 1 else "OPEN", profit_loss=random.uniform(-50, 50))
+            for i in range(ROWS)
+        ])
+    close_connections()
+    print(f"Created {SHARDS} shards x {ROWS:,} trades in {time.perf_counter() - start:.1f}s")
+
+    reader = ShardReader("mock", base_dir=work_dir)
+    start = time.perf_counter()
+    summary = reader.shard_summary()
+    totals = reader.totals(summary)
+    print(f"Summary of {totals['shards']} shards (ATTACH chunk {reader.chunk_size}) in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms: {totals['trades']:,} trades, "
+          f"P/L {totals['pnl_sum']:,.2f}, open {totals['open_positions']}")
+    shutil.rmtree(work_dir)
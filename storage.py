@@ -0,0 +1,570 @@
+# storage.py
+"""
+거래/분석 기록 저장소 (autotrade, mocktrade, 두 대시보드 공용)
+--------------------------------------------------------
+기능:
+- 실거래(trades/ai_analysis)와 모의 거래(mock_trades/mock_ai_analysis)를 같은 메서드로 저장/조회
+- 결과는 TradeRecord/AnalysisRecord 데이터클래스로 반환 (테이블에 없는 컬럼은 None)
+- 단건/대량(executemany) 저장, 상태별/기간별 조회, 대시보드용 DataFrame 조회
+- 대시보드용 FrameCache: DB에 새 커밋이 있을 때만 새 행/바뀐 행을 읽어 캐시에 반영
+- 저장 엔진은 교체 가능 (기본 SQLite, register_backend()로 DuckDB 등 추가)
+- python storage.py: 단건 저장과 대량 저장, 조회 속도 측정
+--------------------------------------------------------
+"""
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from db import data_version, get_connection, transaction
+from migrations import epoch_ms
+from performance_aggregates import record_closed_trade
+from write_behind import enqueue
+
+# 프로필 이름 -> (기본 DB 파일, 거래 테이블, 분석 테이블)
+PROFILES = {
+    "live": ("bitcoin_trading.db", "trades", "ai_analysis"),
+    "mock": ("mock_trading.db", "mock_trades", "mock_ai_analysis"),
+}
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+TRADE_ORDER_COLUMNS = ("timestamp", "exit_timestamp")   # 거래 조회 정렬 기준으로 허용하는 컬럼
+
+
+@dataclass
+class TradeRecord:
+    """거래 한 건 (모의 거래 테이블에 없는 비율/투자금 컬럼과 실거래 테이블에 없는 prompt_id는 None)"""
+    action: Optional[str] = None
+    entry_price: Optional[float] = None
+    amount: Optional[float] = None
+    leverage: Optional[int] = None
+    sl_price: Optional[float] = None
+    tp_price: Optional[float] = None
+    sl_percentage: Optional[float] = None
+    tp_percentage: Optional[float] = None
+    position_size_percentage: Optional[float] = None
+    investment_amount: Optional[float] = None
+    status: str = "OPEN"
+    exit_price: Optional[float] = None
+    exit_timestamp: Optional[str] = None
+    exit_timestamp_ms: Optional[int] = None
+    profit_loss: Optional[float] = None
+    profit_loss_percentage: Optional[float] = None
+    prompt_id: Optional[int] = None
+    timestamp: Optional[str] = None
+    timestamp_ms: Optional[int] = None
+    id: Optional[int] = None
+
+
+@dataclass
+class AnalysisRecord:
+    """AI 분석 한 건 (모의 분석 테이블에 없는 추천 값 컬럼과 실거래 테이블에 없는 prompt_id는 None)"""
+    current_price: Optional[float] = None
+    direction: Optional[str] = None
+    recommended_position_size: Optional[float] = None
+    recommended_leverage: Optional[int] = None
+    stop_loss_percentage: Optional[float] = None
+    take_profit_percentage: Optional[float] = None
+    reasoning: Optional[str] = None
+    trade_id: Optional[int] = None
+    prompt_id: Optional[int] = None
+    timestamp: Optional[str] = None
+    timestamp_ms: Optional[int] = None
+    id: Optional[int] = None
+
+
+_TRADE_FIELDS = [f.name for f in fields(TradeRecord)]
+_ANALYSIS_FIELDS = [f.name for f in fields(AnalysisRecord)]
+
+
+class SQLiteBackend:
+    """db.py의 스레드별 연결(WAL)과 트랜잭션, write_behind 큐를 사용하는 기본 엔진"""
+    name = "sqlite"
+
+    def __init__(self, db_file, readonly=False):
+        self.db_file = db_file
+        self.readonly = readonly
+
+    def _connection(self):
+        return get_connection(self.db_file, readonly=self.readonly)
+
+    def columns(self, table):
+        """테이블 컬럼 이름 목록 (테이블이 없으면 빈 목록)"""
+        return [row[1] for row in self._connection().execute(f"PRAGMA table_info({table})")]
+
+    def execute(self, sql, params=()):
+        """쓰기 문 하나를 실행하고 lastrowid를 반환합니다. (열린 트랜잭션이 있으면 그 안에서 실행)"""
+        return self._connection().execute(sql, params).lastrowid
+
+    def executemany(self, sql, rows, label="bulk_insert"):
+        """여러 행을 한 트랜잭션에서 기록하고 행 수를 반환합니다."""
+        with self.transaction(label=label) as cursor:
+            cursor.executemany(sql, rows)
+            return cursor.rowcount
+
+    def fetchall(self, sql, params=()):
+        cursor = self._connection().execute(sql, params)
+        return [column[0] for column in cursor.description], cursor.fetchall()
+
+    def frame(self, sql, params=()):
+        return pd.read_sql_query(sql, self._connection(), params=params)
+
+    def transaction(self, durable=False, label="transaction"):
+        return transaction(self.db_file, durable=durable, label=label)
+
+    def data_version(self):
+        """다른 연결이 커밋할 때마다 바뀌는 값 (FrameCache의 무효화 키)"""
+        return data_version(self.db_file)
+
+    def enqueue(self, sql, params):
+        enqueue(self.db_file, sql, params)
+
+    def fetchall_archived(self, profile, sql, params=()):
+        """
+        보관 DB를 붙인 읽기 전용 연결에서 조회합니다 (all_<테이블> 뷰 사용 가능)
+
+        쓰기 연결에는 보관 DB를 붙이지 않으므로 봇의 커밋이 보관 작업의 트랜잭션과 부딪히지 않습니다.
+        보관 대상 테이블은 파일 이름이 아니라 저장소 프로필로 정하므로 임의 경로의 DB에도 뷰가 만들어집니다.
+        """
+        from archive import attach_archive  # archive -> shards -> storage 순환 import 방지
+        conn = get_connection(self.db_file, readonly=True)
+        attach_archive(conn, self.db_file, profile)
+        cursor = conn.execute(sql, params)
+        return [column[0] for column in cursor.description], cursor.fetchall()
+
+
+BACKENDS = {"sqlite": SQLiteBackend}
+
+
+def register_backend(name, factory):
+    """
+    저장 엔진을 등록합니다
+
+    매개변수:
+        name (str): 엔진 이름 (STORAGE_BACKEND 환경 변수나 TradingStore(backend=...)로 선택)
+        factory (callable): (db_file, readonly)를 받아 SQLiteBackend와 같은 메서드를 가진 객체를 반환
+    """
+    BACKENDS[name] = factory
+
+
+class TradingStore:
+    """
+    거래/분석 기록 저장소
+
+    매개변수:
+        profile (str): "live"(실거래) 또는 "mock"(모의 거래)
+        db_file (str, optional): DB 파일 경로 (기본값: 프로필의 파일)
+        readonly (bool): 읽기 전용 연결 사용 여부 (대시보드)
+        backend (str, optional): BACKENDS에 등록된 엔진 이름 (기본값: STORAGE_BACKEND)
+    """
+
+    def __init__(self, profile, db_file=None, readonly=False, backend=None):
+        default_file, self.trade_table, self.analysis_table = PROFILES[profile]
+        self.profile = profile
+        self.db_file = db_file or default_file
+        self.backend = BACKENDS[backend or STORAGE_BACKEND](self.db_file, readonly)
+        self._columns = {}
+
+    # ----- 스키마 -----
+    def columns(self, table):
+        """테이블에 실제로 있는 컬럼 (마이그레이션 후 처음 조회할 때 한 번만 읽음)"""
+        if not self._columns.get(table):
+            self._columns[table] = self.backend.columns(table)
+        return self._columns[table]
+
+    def _stored(self, table, names):
+        existing = set(self.columns(table))
+        return [name for name in names if name in existing]
+
+    def as_dict(self, record):
+        """레코드를 테이블에 있는 컬럼만 담은 dict로 변환합니다. (SELECT *와 같은 키)"""
+        table = self.trade_table if isinstance(record, TradeRecord) else self.analysis_table
+        existing = set(self.columns(table))
+        return {key: value for key, value in asdict(record).items() if key in existing}
+
+    # ----- 저장 -----
+    def _insert_rows(self, table, records):
+        """records를 같은 컬럼 목록의 INSERT 문과 매개변수 목록으로 바꿉니다. (id는 자동 증가)"""
+        now = datetime.now()
+        for record in records:
+            if record.timestamp is None:
+                record.timestamp = now.isoformat()
+            if record.timestamp_ms is None:
+                record.timestamp_ms = epoch_ms(record.timestamp)
+            if getattr(record, "exit_timestamp", None) is not None and record.exit_timestamp_ms is None:
+                record.exit_timestamp_ms = epoch_ms(record.exit_timestamp)
+        names = self._stored(table, [name for name in asdict(records[0]) if name != "id"])
+        sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})"
+        return sql, [tuple(getattr(record, name) for name in names) for record in records]
+
+    def insert_trade(self, trade):
+        """거래 한 건을 저장하고 ID를 반환합니다. (timestamp가 없으면 현재 시간)"""
+        sql, rows = self._insert_rows(self.trade_table, [trade])
+        trade.id = self.backend.execute(sql, rows[0])
+        return trade.id
+
+    def insert_trades(self, trades):
+        """거래 여러 건을 한 트랜잭션에서 저장하고 저장한 행 수를 반환합니다."""
+        if not trades:
+            return 0
+        sql, rows = self._insert_rows(self.trade_table, trades)
+        return self.backend.executemany(sql, rows)
+
+    def insert_analysis(self, analysis, background=False):
+        """
+        분석 한 건을 저장합니다
+
+        매개변수:
+            analysis (AnalysisRecord): 저장할 분석
+            background (bool): True면 백그라운드 기록 큐에 넣고 바로 반환 (거래와 연결되지 않은 분석용)
+
+        반환값:
+            int: 생성된 분석 ID (background=True면 None)
+        """
+        sql, rows = self._insert_rows(self.analysis_table, [analysis])
+        if background:
+            self.backend.enqueue(sql, rows[0])
+            return None
+        analysis.id = self.backend.execute(sql, rows[0])
+        return analysis.id
+
+    def insert_analyses(self, analyses):
+        """분석 여러 건을 한 트랜잭션에서 저장하고 저장한 행 수를 반환합니다."""
+        if not analyses:
+            return 0
+        sql, rows = self._insert_rows(self.analysis_table, analyses)
+        return self.backend.executemany(sql, rows)
+
+    def update_exit_points(self, trade_id, tp_price, sl_price):
+        """열린 거래의 TP/SL 가격을 바꿉니다."""
+        self.backend.execute(f"UPDATE {self.trade_table} SET tp_price = ?, sl_price = ? WHERE id = ?",
+                             (tp_price, sl_price, trade_id))
+
+    def link_analysis(self, analysis_id, trade_id):
+        """먼저 저장해 둔 분석을 거래에 연결합니다."""
+        self.backend.execute(f"UPDATE {self.analysis_table} SET trade_id = ? WHERE id = ?", (trade_id, analysis_id))
+
+    def update_trade_status(self, trade_id, status, exit_price=None, exit_timestamp=None,
+                            profit_loss=None, profit_loss_percentage=None):
+        """
+        거래 상태와 청산 정보를 바꾸고, 처음 종료되는 거래는 성과 집계에 반영합니다
+
+        상태 변경과 집계 갱신은 한 트랜잭션(durable)으로 처리되며, 호출한 쪽의 트랜잭션이 열려 있으면 그 안에 합류합니다.
+        테이블에 없는 컬럼(모의 거래의 profit_loss_percentage 등)은 저장하지 않고 집계에만 사용합니다.
+
+        반환값:
+            TradeRecord: 변경 전 거래 (거래가 없으면 None)
+        """
+        values = {"status": status, "exit_price": exit_price, "exit_timestamp": exit_timestamp,
+                  "profit_loss": profit_loss, "profit_loss_percentage": profit_loss_percentage}
+        if exit_timestamp is not None:
+            values["exit_timestamp_ms"] = epoch_ms(exit_timestamp)
+        names = self._stored(self.trade_table, [name for name, value in values.items() if value is not None])
+        update_sql = f"UPDATE {self.trade_table} SET {', '.join(f'{name} = ?' for name in names)} WHERE id = ?"
+
+        with self.backend.transaction(durable=True, label="trade_close") as cursor:
+            previous = self.get_trade(trade_id)
+            cursor.execute(update_sql, [values[name] for name in names] + [trade_id])
+
+            # 처음 종료되는 거래만 집계에 반영 (중복 집계 방지)
+            if status == "CLOSED" and previous and previous.status != "CLOSED":
+                record_closed_trade(
+                    cursor,
+                    previous.action,
+                    previous.leverage,
+                    exit_timestamp or datetime.now().isoformat(),
+                    profit_loss,
+                    profit_loss_percentage
+                )
+        return previous
+
+    # ----- 조회 -----
+    def _select(self, table, names, where="", order="", limit=None):
+        sql = f"SELECT {', '.join(names)} FROM {table}"
+        if where:
+            sql += f" WHERE {where}"
+        if order:
+            sql += f" ORDER BY {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return sql
+
+    def _trade_query(self, status=None, since=None, order_by="timestamp", limit=None, columns=None, min_id=None):
+        if order_by not in TRADE_ORDER_COLUMNS:
+            raise ValueError(f"정렬할 수 없는 컬럼입니다: {order_by}")
+        conditions, params = [], []
+        if min_id is not None:
+            conditions.append("id >= ?")
+            params.append(int(min_id))
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if since is not None:
+            conditions.append("timestamp_ms >= ?")
+            params.append(epoch_ms(since))
+        names = self._stored(self.trade_table, columns or _TRADE_FIELDS)
+        sql = self._select(self.trade_table, names, " AND ".join(conditions), f"{order_by} DESC", limit)
+        return sql, params
+
+    def _analysis_query(self, since=None, limit=None, columns=None, min_id=None):
+        conditions, params = [], []
+        if min_id is not None:
+            conditions.append("id >= ?")
+            params.append(int(min_id))
+        if since is not None:
+            conditions.append("timestamp_ms >= ?")
+            params.append(epoch_ms(since))
+        names = self._stored(self.analysis_table, columns or _ANALYSIS_FIELDS)
+        sql = self._select(self.analysis_table, names, " AND ".join(conditions), "timestamp DESC", limit)
+        return sql, params
+
+    def _records(self, record_type, sql, params):
+        names, rows = self.backend.fetchall(sql, params)
+        return [record_type(**dict(zip(names, row))) for row in rows]
+
+    def get_trade(self, trade_id):
+        """ID로 거래 하나를 조회합니다. (없으면 None)"""
+        names = self._stored(self.trade_table, _TRADE_FIELDS)
+        records = self._records(TradeRecord, self._select(self.trade_table, names, "id = ?"), (trade_id,))
+        return records[0] if records else None
+
+    def get_open_trade(self):
+        """가장 최근의 열린 거래 (없으면 None)"""
+        trades = self.get_trades(status="OPEN", limit=1)
+        return trades[0] if trades else None
+
+    def get_trades(self, status=None, since=None, order_by="timestamp", limit=None):
+        """
+        조건에 맞는 거래를 최신순으로 조회합니다
+
+        매개변수:
+            status (str, optional): 'OPEN' / 'CLOSED' (None이면 전체)
+            since (datetime/str, optional): 이 시간 이후에 진입한 거래만
+            order_by (str): 'timestamp'(진입 시간) 또는 'exit_timestamp'(청산 시간)
+            limit (int, optional): 최대 개수
+
+        반환값:
+            list: TradeRecord 목록
+        """
+        return self._records(TradeRecord, *self._trade_query(status, since, order_by, limit))
+
+    def get_analyses(self, since=None, limit=None):
+        """분석 기록을 최신순으로 조회합니다. (AnalysisRecord 목록)"""
+        return self._records(AnalysisRecord, *self._analysis_query(since, limit))
+
+    def get_trade_history(self, limit=10):
+        """
+        종료된 거래와 그 거래를 연 분석을 최신순으로 조회합니다 (AI 프롬프트의 과거 기록용)
+
+        분석은 보관 DB(archive.py)로 옮겨진 행까지 합친 all_<분석 테이블> 뷰에서 찾습니다.
+
+        반환값:
+            list: (TradeRecord, AnalysisRecord 또는 None) 튜플 목록
+        """
+        trade_names = self._stored(self.trade_table, _TRADE_FIELDS)
+        analysis_names = self._stored(self.analysis_table, _ANALYSIS_FIELDS)
+        sql = (
+            f"SELECT {', '.join('t.' + name for name in trade_names)}, {', '.join('a.' + name for name in analysis_names)} "
+            f"FROM {self.trade_table} t LEFT JOIN all_{self.analysis_table} a ON t.id = a.trade_id "
+            f"WHERE t.status = 'CLOSED' ORDER BY t.timestamp DESC LIMIT ?"
+        )
+        _, rows = self.backend.fetchall_archived(self.profile, sql, (limit,))
+        history = []
+        for row in rows:
+            trade = TradeRecord(**dict(zip(trade_names, row[:len(trade_names)])))
+            analysis_values = dict(zip(analysis_names, row[len(trade_names):]))
+            analysis = AnalysisRecord(**analysis_values) if analysis_values.get("id") is not None else None
+            history.append((trade, analysis))
+        return history
+
+    def trades_frame(self, status=None, since=None, order_by="timestamp", limit=None, columns=None, min_id=None):
+        """get_trades()와 같은 조건의 거래를 DataFrame으로 조회합니다. (대시보드용, columns로 컬럼 선택, min_id 이상의 ID만)"""
+        return self.backend.frame(*self._trade_query(status, since, order_by, limit, columns, min_id))
+
+    def analyses_frame(self, since=None, limit=None, columns=None, min_id=None):
+        """get_analyses()와 같은 조건의 분석을 DataFrame으로 조회합니다. (대시보드용, columns로 컬럼 선택, min_id 이상의 ID만)"""
+        return self.backend.frame(*self._analysis_query(since, limit, columns, min_id))
+
+    def id_range(self, table, count_from=None, count_below=None):
+        """
+        테이블의 (최소 ID, 최대 ID, count_from 이상 count_below 미만인 행 수)
+
+        비어 있으면 (None, None, 0)이고, count_from/count_below를 주지 않으면 행 수는 None입니다. (ID 범위만 읽음)
+        """
+        count = "NULL"
+        params = ()
+        if count_from is not None and count_below is not None:
+            count = f"(SELECT COUNT(*) FROM {table} WHERE id >= ? AND id < ?)"
+            params = (int(count_from), int(count_below))
+        _, rows = self.backend.fetchall(f"SELECT MIN(id), MAX(id), {count} FROM {table}", params)
+        return rows[0]
+
+
+class FrameCache:
+    """
+    대시보드용 거래/분석 DataFrame 캐시 (DB에 새 커밋이 있을 때만 바뀐 부분을 다시 읽음)
+
+    data_version이 그대로면 DB를 읽지 않고 캐시를 반환합니다. 바뀌었으면 캐시의 마지막 ID 이후 행과
+    아직 바뀔 수 있는 행(거래의 경우 OPEN 상태)부터를 다시 읽어 이어 붙입니다.
+    캐시된 ID 범위 안의 행 수가 DB와 다르면(보관 작업은 조건에 맞는 행만 골라 지우므로 중간 ID도 빠짐) 전체를 다시 읽습니다.
+    window를 주면 최근 기간의 행만 timestamp_ms 인덱스 조건으로 읽고, 기간을 벗어난 행은 캐시에서 뺍니다.
+
+    매개변수:
+        store (TradingStore): 읽기 전용 저장소
+        kind (str): "trades" 또는 "analyses"
+        columns (list, optional): 조회할 컬럼 (id, timestamp는 항상 포함)
+        prepare (callable, optional): 새로 읽은 DataFrame을 캐시에 넣기 전에 변환하는 함수 (날짜 파싱 등)
+        window (timedelta, optional): 캐시할 최근 기간 (기본값: 전체)
+    """
+
+    def __init__(self, store, kind, columns=None, prepare=None, window=None):
+        if kind not in ("trades", "analyses"):
+            raise ValueError(f"알 수 없는 종류입니다: {kind}")
+        self.store = store
+        self.kind = kind
+        self.table = store.trade_table if kind == "trades" else store.analysis_table
+        self.columns = list(dict.fromkeys(["id", "timestamp", *(columns or [])])) if columns else None
+        self.prepare = prepare
+        self.window = window
+        self._lock = threading.Lock()
+        self._frame = None
+        self._version = None
+        self.stats = {"hits": 0, "full_loads": 0, "incremental_loads": 0, "rows_read": 0}
+
+    def _read(self, min_id=None, since=None):
+        if self.kind == "trades":
+            frame = self.store.trades_frame(since=since, columns=self.columns, min_id=min_id)
+        else:
+            frame = self.store.analyses_frame(since=since, columns=self.columns, min_id=min_id)
+        self.stats["rows_read"] += len(frame)
+        return self.prepare(frame) if self.prepare else frame
+
+    @staticmethod
+    def _trim(frame, since):
+        if since is None or frame.empty:
+            return frame
+        return frame[pd.to_datetime(frame["timestamp"]) >= since]
+
+    def _refresh(self, since=None):
+        cached = self._frame
+        if cached is None or cached.empty:
+            self.stats["full_loads"] += 1
+            return self._read(since=since)
+        start_id = int(cached["id"].max()) + 1
+        if self.kind == "trades" and "status" in cached.columns:
+            open_ids = cached.loc[cached["status"] == "OPEN", "id"]
+            if not open_ids.empty:
+                start_id = min(start_id, int(open_ids.min()))
+        first_id = int(cached["id"].min())
+        kept = cached[cached["id"] < start_id]
+        min_id, max_id, count = self.store.id_range(self.table, first_id, start_id)
+        if min_id is None:
+            return cached.iloc[0:0]
+        if count != len(kept):
+            # 캐시된 범위 안에서 지워진 행이 있음 (보관 작업 등)
+            self.stats["full_loads"] += 1
+            return self._read(since=since)
+        self.stats["incremental_loads"] += 1
+        kept = self._trim(kept, since)
+        fresh = self._read(min_id=start_id, since=since) if start_id <= max_id else cached.iloc[0:0]
+        frames = [frame for frame in (fresh, kept) if not frame.empty]
+        if not frames:
+            return cached.iloc[0:0]
+        # 새로 읽은 행이 모두 NULL인 컬럼(열린 거래의 손익 등)이 object로 합쳐지지 않도록 타입을 다시 추론
+        merged = pd.concat(frames, ignore_index=True).infer_objects()
+        return merged.sort_values("timestamp", ascending=False, ignore_index=True)
+
+    def get(self):
+        """
+        최신 DataFrame을 반환합니다 (호출한 쪽에서 바꿔도 캐시에 영향 없는 사본)
+
+        반환값:
+            DataFrame: trades_frame()/analyses_frame()과 같은 컬럼, 최신 순
+        """
+        since = datetime.now() - self.window if self.window is not None else None
+        with self._lock:
+            version = self.store.backend.data_version()
+            if self._frame is not None and version == self._version:
+                self.stats["hits"] += 1
+                self._frame = self._trim(self._frame, since)
+            else:
+                # 읽기 전에 받은 version을 저장하므로, 읽는 중에 들어온 커밋은 다음 호출에서 다시 반영됨
+                self._frame = self._refresh(since)
+                self._version = version
+            return self._frame.copy()
+
+
+if __name__ == "__main__":
+    import random
+    import shutil
+    import sys
+    import tempfile
+
+    from db import close_connections
+
+    ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    SINGLE_ROWS = min(ROWS, 5_000)
+    work_dir = tempfile.mkdtemp()
+    db_file = os.path.join(work_dir, "storage_bench.db")
+    cursor = get_connection(db_file).cursor()
+    cursor.execute('''
+    CREATE TABLE mock_trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, timestamp_ms INTEGER,
+        action TEXT NOT NULL, entry_price REAL NOT NULL, amount REAL NOT NULL, leverage INTEGER NOT NULL,
+        sl_price REAL NOT NULL, tp_price REAL NOT NULL, status TEXT DEFAULT 'OPEN', exit_price REAL,
+        exit_timestamp TEXT, exit_timestamp_ms INTEGER, profit_loss REAL
+    )''')
+    cursor.execute('''
+    CREATE TABLE mock_ai_analysis (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, timestamp_ms INTEGER,
+        current_price REAL NOT NULL, direction TEXT NOT NULL, reasoning TEXT NOT NULL, trade_id INTEGER
+    )''')
+    cursor.execute("CREATE INDEX idx_mock_trades_status_timestamp ON mock_trades (status, timestamp)")
+    cursor.execute("CREATE INDEX idx_mock_ai_analysis_trade_id ON mock_ai_analysis (trade_id)")
+    store = TradingStore("mock", db_file)
+
+    def make_trade(i):
+        price = 60_000 + random.uniform(-5_000, 5_000)
+        return TradeRecord(
+            action=random.choice(["long", "short"]), entry_price=price, amount=0.01, leverage=random.randint(1, 20),
+            sl_price=price * 0.98, tp_price=price * 1.03, status="CLOSED", exit_price=price * 1.01,
+            exit_timestamp=f"2025-01-01T{i % 24:02d}:00:00", profit_loss=random.uniform(-50, 50),
+            timestamp=f"2025-01-01T{i % 24:02d}:{i % 60:02d}:00"
+        )
+
+    start = time.perf_counter()
+    for i in range(SINGLE_ROWS):
+        store.insert_trade(make_trade(i))
+    single = time.perf_counter() - start
+    print(f"insert_trade   x{SINGLE_ROWS:,}: {single:.2f}s ({SINGLE_ROWS / single:,.0f} rows/s)")
+
+    start = time.perf_counter()
+    store.insert_trades([make_trade(i) for i in range(ROWS)])
+    bulk = time.perf_counter() - start
+    print(f"insert_trades  x{ROWS:,}: {bulk:.2f}s ({ROWS / bulk:,.0f} rows/s)")
+
+    start = time.perf_counter()
+    store.insert_analyses([
+        AnalysisRecord(current_price=60_000, direction="LONG", reasoning="benchmark", trade_id=i + 1)
+        for i in range(ROWS)
+    ])
+    print(f"insert_analyses x{ROWS:,}: {time.perf_counter() - start:.2f}s")
+
+    checks = [
+        ("get_open_trade()", lambda: store.get_open_trade()),
+        ("get_trades(CLOSED, limit=20)", lambda: store.get_trades(status="CLOSED", limit=20)),
+        ("get_trade_history(10)", lambda: store.get_trade_history(10)),
+        ("trades_frame() all rows", lambda: store.trades_frame()),
+    ]
+    for label, query in checks:
+        start = time.perf_counter()
+        result = query()
+        size = len(result) if result is not None else 0
+        print(f"{label:30} {size:>8,} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    close_connections()
+    shutil.rmtree(work_dir)
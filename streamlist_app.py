@@ -1,11 +1,16 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import ccxt  # 암호화폐 거래소 API 라이브러리
 import numpy as np
+from storage import TradingStore, FrameCache  # 봇과 공용인 거래/분석 저장소 (읽기 전용), 변경분만 읽는 캐시
+from equity import get_equity_curve  # 미리 집계된 평가 자산 시계열
+from search_index import search_all  # AI 분석 근거/뉴스 전문 검색 (FTS5)
+from news_provider import NEWS_DB_FILE
+from analytics_export import aggregate_trades, export_dir_for  # Parquet + DuckDB 기준별 성과 집계
+from shards import ShardReader  # 전략(봇)별 샤드 합계 (읽기 전용 ATTACH)
 
 # 페이지 설정
 st.set_page_config(
@@ -74,39 +79,47 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+store = TradingStore("live", "bitcoin_trading.db", readonly=True)
+
 # SQLite 데이터베이스에서 데이터를 읽는 함수들
-def get_trades_data():
-    # 새로운 연결을 만들어 현재 스레드에서 사용
-    conn = sqlite3.connect("bitcoin_trading.db")
-    query = """
-    SELECT 
-        id, timestamp, action, entry_price, exit_price, amount, leverage, 
-        status, profit_loss, profit_loss_percentage, exit_timestamp
-    FROM trades
-    ORDER BY timestamp DESC
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()  # 연결 닫기
+def parse_trade_times(df):
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     if 'exit_timestamp' in df.columns:
         df['exit_timestamp'] = pd.to_datetime(df['exit_timestamp'])
     return df
 
-def get_ai_analysis_data():
-    # 새로운 연결을 만들어 현재 스레드에서 사용
-    conn = sqlite3.connect("bitcoin_trading.db")
-    query = """
-    SELECT 
-        id, timestamp, current_price, direction, 
-        recommended_leverage, reasoning, trade_id
-    FROM ai_analysis
-    ORDER BY timestamp DESC
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()  # 연결 닫기
+def parse_analysis_times(df):
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     return df
 
+# 기간 선택 -> 최근 며칠 (None이면 전체)
+TIME_FILTERS = {"전체": None, "최근 24시간": 1, "최근 7일": 7, "최근 30일": 30, "최근 90일": 90}
+
+# 재실행(위젯 조작)마다 유지되는 기간별 캐시: 봇이 커밋하지 않았으면(PRAGMA data_version 그대로) DB를 읽지 않고,
+# 커밋이 있으면 새 행과 아직 열린 거래만 다시 읽어 이어 붙임
+@st.cache_resource
+def get_trades_cache(period_days):
+    return FrameCache(store, "trades", columns=[
+        'id', 'timestamp', 'action', 'entry_price', 'exit_price', 'amount', 'leverage',
+        'status', 'profit_loss', 'profit_loss_percentage', 'exit_timestamp'
+    ], prepare=parse_trade_times, window=timedelta(days=period_days) if period_days else None)
+
+def get_trades_data(period_days=None):
+    # 기간 조건은 SQL(timestamp_ms 인덱스)로 적용해 선택한 기간의 거래만 읽음 (읽기 전용 연결, 봇의 WAL 쓰기와 서로 막지 않음)
+    return get_trades_cache(period_days).get()
+
+def get_open_position():
+    # (status, timestamp) 인덱스로 열린 거래 한 건만 조회
+    return parse_trade_times(store.trades_frame(
+        status='OPEN', limit=1, columns=['id', 'timestamp', 'action', 'entry_price', 'amount', 'leverage']
+    ))
+
+def get_latest_analysis():
+    # timestamp 인덱스로 가장 최근 분석 한 건만 조회
+    return parse_analysis_times(store.analyses_frame(
+        limit=1, columns=['id', 'timestamp', 'current_price', 'direction', 'recommended_leverage', 'reasoning']
+    ))
+
 # 비트코인 가격 데이터 가져오기
 @st.cache_data(ttl=3600)  # 1시간 캐시
 def get_bitcoin_price_data(timeframe='1d', limit=90):
@@ -207,50 +220,32 @@ def calculate_trading_metrics(trades_df):
     }
 
 try:
-    # 데이터 로드
-    trades_df = get_trades_data()
-    ai_analysis_df = get_ai_analysis_data()
-    btc_price_df = get_bitcoin_price_data()
-
     # 시간 필터
     st.sidebar.title("Bitcoin Trading Bot")
     time_filter = st.sidebar.selectbox(
         "기간 선택:", 
-        ["전체", "최근 24시간", "최근 7일", "최근 30일", "최근 90일"]
+        list(TIME_FILTERS)
     )
-
-    # 시간 필터 적용
+    period_days = TIME_FILTERS[time_filter]
     now = datetime.now()
-    if time_filter == "최근 24시간":
-        filter_time = now - timedelta(days=1)
-        filtered_trades = trades_df[trades_df['timestamp'] > filter_time]
-        chart_days = 1
-    elif time_filter == "최근 7일":
-        filter_time = now - timedelta(days=7)
-        filtered_trades = trades_df[trades_df['timestamp'] > filter_time]
-        chart_days = 7
-    elif time_filter == "최근 30일":
-        filter_time = now - timedelta(days=30)
-        filtered_trades = trades_df[trades_df['timestamp'] > filter_time]
-        chart_days = 30
-    elif time_filter == "최근 90일":
-        filter_time = now - timedelta(days=90)
-        filtered_trades = trades_df[trades_df['timestamp'] > filter_time]
-        chart_days = 90
-    else:
-        filtered_trades = trades_df
-        chart_days = 90
+    filter_time = now - timedelta(days=period_days) if period_days else None
+    chart_days = period_days or 90
+
+    # 데이터 로드 (기간 필터, 열린 포지션, 최근 분석은 각각 인덱스를 타는 SQL로 필요한 행만 조회)
+    filtered_trades = get_trades_data(period_days)
+    open_position_df = get_open_position()
+    latest_analysis_df = get_latest_analysis()
+    btc_price_df = get_bitcoin_price_data()
 
     # 트레이딩 지표 계산
     metrics = calculate_trading_metrics(filtered_trades)
 
     # 현재 오픈 포지션
-    open_trades = trades_df[trades_df['status'] == 'OPEN']
-    has_open_position = len(open_trades) > 0
-    current_position = open_trades.iloc[0] if has_open_position else None
+    has_open_position = not open_position_df.empty
+    current_position = open_position_df.iloc[0] if has_open_position else None
 
     # 현재 BTC 가격
-    current_btc_price = ai_analysis_df.iloc[0]['current_price'] if not ai_analysis_df.empty else btc_price_df.iloc[-1]['close']
+    current_btc_price = latest_analysis_df.iloc[0]['current_price'] if not latest_analysis_df.empty else btc_price_df.iloc[-1]['close']
 
     # 대시보드 메인
     st.markdown("<h1 class='header'>Bitcoin Trading Dashboard</h1>", unsafe_allow_html=True)
@@ -405,6 +400,43 @@ try:
 
     st.plotly_chart(fig, use_container_width=True)
 
+    # 평가 자산 곡선 (봇이 기록한 1m/1h/1d 집계 구간에서 기간에 맞는 해상도로 조회)
+    st.markdown("<h2 class='subheader'>Equity Curve</h2>", unsafe_allow_html=True)
+    try:
+        equity_df = get_equity_curve("bitcoin_trading.db", since=filter_time if time_filter != "전체" else None)
+    except Exception:
+        equity_df = pd.DataFrame()
+    if not equity_df.empty:
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=equity_df['timestamp'],
+            y=equity_df['close'],
+            mode='lines',
+            name='Equity',
+            line=dict(color='#00CC96', width=2),
+            hovertemplate='<b>Equity</b>: $%{y:,.2f}<br>'
+        ))
+        fig.add_trace(go.Bar(
+            x=equity_df['timestamp'],
+            y=equity_df['unrealized_pnl'],
+            name='Unrealized P/L',
+            marker_color='gray',
+            opacity=0.4,
+            yaxis='y2',
+            hovertemplate='<b>Unrealized</b>: $%{y:,.2f}<br>'
+        ))
+        fig.update_layout(
+            title=f"Equity (USDT, {equity_df.attrs['resolution']} buckets)",
+            xaxis_title='Date',
+            yaxis_title='Equity (USDT)',
+            yaxis2=dict(title='Unrealized P/L (USDT)', overlaying='y', side='right', showgrid=False),
+            hovermode='x unified',
+            height=400
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No equity samples recorded yet.")
+
     # 거래 성과 차트
     st.markdown("<h2 class='subheader'>Trading Performance</h2>", unsafe_allow_html=True)
     chart_cols = st.columns(2)
@@ -448,6 +480,45 @@ try:
         else:
             st.info("No trades to display.")
 
+    # 기준별 성과 (analytics_export.py가 내보낸 Parquet을 DuckDB로 집계, 거래 이력이 길어도 SQLite 전체 조회 없음)
+    st.markdown("<h2 class='subheader'>Performance Breakdown</h2>", unsafe_allow_html=True)
+    try:
+        breakdown_since = filter_time if time_filter != "전체" else None
+        export_dir = export_dir_for("bitcoin_trading.db")
+        breakdown_tabs = st.tabs(["By Day", "By Direction", "By Leverage"])
+        for tab, by in zip(breakdown_tabs, ["day", "direction", "leverage"]):
+            with tab:
+                breakdown_df = aggregate_trades(export_dir, by, since=breakdown_since)
+                if breakdown_df.empty:
+                    st.info("No exported trades yet. Run `python analytics_export.py` to refresh.")
+                    continue
+                fig = px.bar(
+                    breakdown_df,
+                    x='bucket',
+                    y='pnl_sum',
+                    color=breakdown_df['pnl_sum'] > 0,
+                    color_discrete_map={True: '#00CC96', False: '#EF553B'},
+                    hover_data=['trades', 'win_rate', 'avg_pnl'],
+                    labels={'bucket': by.title(), 'pnl_sum': 'P/L (USDT)'}
+                )
+                fig.update_layout(height=350, showlegend=False)
+                st.plotly_chart(fig, use_container_width=True)
+    except RuntimeError as e:
+        st.info(str(e))
+
+    # 전략(봇)별 샤드가 여러 개면 ATTACH + UNION 뷰로 전체 합계 표시 (각 봇의 쓰기와 서로 막지 않음)
+    shard_reader = ShardReader("live")
+    if len(shard_reader.shards) > 1:
+        st.markdown("<h2 class='subheader'>All Bots</h2>", unsafe_allow_html=True)
+        shard_summary_df = shard_reader.shard_summary()
+        shard_totals = shard_reader.totals(shard_summary_df)
+        total_cols = st.columns(4)
+        total_cols[0].metric("Bots", shard_totals['shards'])
+        total_cols[1].metric("Closed Trades", shard_totals['trades'])
+        total_cols[2].metric("Win Rate", f"{shard_totals['win_rate']:.1f}%")
+        total_cols[3].metric("Total P/L", f"${shard_totals['pnl_sum']:,.2f}")
+        st.dataframe(shard_summary_df.round(2), hide_index=True, use_container_width=True)
+
     # 거래 내역
     st.markdown("<h2 class='subheader'>Recent Trades</h2>", unsafe_allow_html=True)
     if not filtered_trades.empty:
@@ -504,8 +575,8 @@ try:
 
     # AI 분석 섹션
     st.markdown("<h2 class='subheader'>Latest AI Analysis</h2>", unsafe_allow_html=True)
-    if not ai_analysis_df.empty:
-        latest_analysis = ai_analysis_df.iloc[0]
+    if not latest_analysis_df.empty:
+        latest_analysis = latest_analysis_df.iloc[0]
         
         analysis_cols = st.columns(2)
         with analysis_cols[0]:
@@ -528,6 +599,17 @@ try:
     else:
         st.info("No AI analysis data available.")
 
+    # 과거 분석 근거와 뉴스 헤드라인 검색 (관련도 순, 검색어 강조)
+    st.markdown("<h2 class='subheader'>Search Analyses & News</h2>", unsafe_allow_html=True)
+    search_text = st.text_input("Search", placeholder="e.g. ETF, liquidation", label_visibility="collapsed")
+    if search_text:
+        results = search_all([("bitcoin_trading.db", ["ai_analysis"]), (NEWS_DB_FILE, ["news_headlines"])], search_text)
+        if results.empty:
+            st.info("No matching records.")
+        for _, row in results.iterrows():
+            label = "AI Analysis" if row['source'] == 'ai_analysis' else "News"
+            st.markdown(f"`{label}` {str(row['timestamp'])[:16].replace('T', ' ')}  \n{row['snippet']}")
+
 except Exception as e:
     st.error(f"An error occurred: {str(e)}")
     st.stop()
\ No newline at end of file
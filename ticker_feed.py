@@ -0,0 +1,93 @@
+# ticker_feed.py
+"""
+대시보드 공용 시세 폴러
+--------------------------------------------------------
+기능:
+- 서버 프로세스마다 백그라운드 스레드 하나가 일정 간격으로 fetch_ticker를 호출해 최신 시세를 보관
+- 모든 세션(브라우저 탭)은 보관된 값을 바로 읽으므로 화면 렌더링이 바이낸스 REST 응답 시간을 기다리지 않음
+- 조회 실패 시 마지막 값을 유지하고 재시도 간격을 늘림 (최대 MAX_BACKOFF초)
+- 대시보드는 st.cache_resource로 폴러를 한 번만 만들어 공유
+--------------------------------------------------------
+"""
+import threading
+import time
+
+import ccxt
+
+POLL_INTERVAL = 5    # 시세 조회 간격 (초)
+MAX_BACKOFF = 60     # 연속 실패 시 최대 재시도 간격 (초)
+STALE_AFTER = 60     # 이 시간(초)보다 오래된 시세는 없는 것으로 취급
+
+
+class TickerPoller:
+    """
+    백그라운드에서 최신 시세를 갱신하는 폴러
+
+    매개변수:
+        symbol (str): 조회할 심볼 (예: "BTC/USDT")
+        interval (float): 조회 간격 (초)
+        exchange (ccxt.Exchange, optional): 사용할 거래소 클라이언트 (기본값: 바이낸스 선물)
+    """
+
+    def __init__(self, symbol, interval=POLL_INTERVAL, exchange=None):
+        self.symbol = symbol
+        self.interval = interval
+        self.exchange = exchange or ccxt.binance({'options': {'defaultType': 'future'}})
+        self._lock = threading.Lock()
+        self._ticker = None
+        self._updated_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"polls": 0, "errors": 0, "reads": 0}
+
+    def start(self):
+        """폴링 스레드를 시작하고 자신을 반환합니다. (이미 실행 중이면 그대로)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"ticker-{self.symbol}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        delay = self.interval
+        while not self._stop.is_set():
+            try:
+                ticker = self.exchange.fetch_ticker(self.symbol)
+                with self._lock:
+                    self._ticker = ticker
+                    self._updated_at = time.time()
+                    self.stats["polls"] += 1
+                delay = self.interval
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                delay = min(delay * 2, MAX_BACKOFF)
+                print(f"[TickerPoller] {self.symbol} 시세 조회 실패 (다음 시도 {delay:.0f}초 후): {e}")
+            self._stop.wait(delay)
+
+    def latest(self, max_age=STALE_AFTER):
+        """
+        보관 중인 최신 시세를 반환합니다 (네트워크 호출 없음)
+
+        반환값:
+            dict: ccxt ticker (아직 없거나 max_age초보다 오래됐으면 None)
+        """
+        with self._lock:
+            self.stats["reads"] += 1
+            if self._ticker is None or time.time() - self._updated_at > max_age:
+                return None
+            return self._ticker
+
+    def last_price(self, default=None, max_age=STALE_AFTER):
+        """최신 체결가 (없으면 default)"""
+        ticker = self.latest(max_age)
+        return ticker['last'] if ticker and ticker.get('last') is not None else default
+
+    @property
+    def age(self):
+        """마지막 갱신 후 지난 시간 (초, 아직 없으면 None)"""
+        with self._lock:
+            return time.time() - self._updated_at if self._updated_at else None
@@ -0,0 +1,165 @@
+# write_behind.py
+"""
+비동기 기록 (write-behind)
+--------------------------------------------------------
+기능:
+- 거래 흐름에 필수가 아닌 기록(NO_POSITION 분석, 재분석 판단, 사전 필터 로그)을 큐에 넣고 바로 반환
+- 백그라운드 스레드가 큐를 모아 DB별로 한 트랜잭션에 묶어 커밋
+- 큐가 가득 차면 잠시 대기(backpressure), 그래도 비지 않으면 호출한 스레드에서 직접 기록 (유실 없음)
+- 묶음 커밋이 실패하면 한 건씩 다시 기록해 문제가 된 행만 버림
+- 프로세스 종료 시(atexit) 남은 기록을 모두 커밋
+--------------------------------------------------------
+"""
+import atexit
+import queue
+import threading
+import time
+
+from db import get_connection, transaction
+
+MAX_QUEUE_SIZE = 1000        # 대기 중인 기록 최대 개수
+BATCH_SIZE = 200             # 한 번에 커밋할 최대 기록 수
+FLUSH_INTERVAL = 1.0         # 새 기록이 없을 때 대기 시간 (초)
+BACKPRESSURE_TIMEOUT = 5.0   # 큐가 가득 찼을 때 기다리는 최대 시간 (초)
+SHUTDOWN_TIMEOUT = 10.0      # 종료 시 남은 기록을 기다리는 최대 시간 (초)
+
+_queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
+_start_lock = threading.Lock()
+_writer = None
+_stats = {"queued": 0, "written": 0, "batches": 0, "sync_fallbacks": 0, "errors": 0, "max_batch_ms": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _start_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_run, name="write-behind", daemon=True)
+            _writer.start()
+
+
+def enqueue(db_file, sql, params=()):
+    """
+    기록 하나를 큐에 넣고 바로 반환합니다
+
+    매개변수:
+        db_file (str): 데이터베이스 파일 경로
+        sql (str): INSERT/UPDATE 문
+        params (tuple): SQL 매개변수
+    """
+    _ensure_writer()
+    try:
+        _queue.put((db_file, sql, tuple(params)), timeout=BACKPRESSURE_TIMEOUT)
+        _count("queued")
+    except queue.Full:
+        # 기록 스레드가 따라오지 못하는 경우: 유실 대신 직접 기록
+        _count("sync_fallbacks")
+        get_connection(db_file).execute(sql, params)
+
+
+def _write_batch(items):
+    """DB 파일별로 같은 SQL을 묶어 한 트랜잭션에서 기록합니다."""
+    by_db = {}
+    for db_file, sql, params in items:
+        by_db.setdefault(db_file, {}).setdefault(sql, []).append(params)
+
+    for db_file, statements in by_db.items():
+        count = sum(len(rows) for rows in statements.values())
+        start = time.perf_counter()
+        try:
+            with transaction(db_file, label="write_behind") as cursor:
+                for sql, rows in statements.items():
+                    cursor.executemany(sql, rows)
+        except Exception as e:
+            # 한 행의 실패로 묶음 전체가 롤백됨: 행마다 다시 기록해 실패한 행만 버림
+            print(f"[WriteBehind] {db_file} 묶음 기록 실패 ({count}건), 한 건씩 다시 기록: {e}")
+            _write_rows(db_file, statements)
+            continue
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with _stats_lock:
+            _stats["written"] += count
+            _stats["batches"] += 1
+            _stats["max_batch_ms"] = max(_stats["max_batch_ms"], elapsed_ms)
+
+
+def _write_rows(db_file, statements):
+    """묶음 기록이 실패했을 때 행마다 따로 커밋합니다. (실패한 행만 errors로 집계)"""
+    conn = get_connection(db_file)
+    for sql, rows in statements.items():
+        for params in rows:
+            try:
+                conn.execute(sql, params)
+                _count("written")
+            except Exception as e:
+                print(f"[WriteBehind] {db_file} 기록 실패 (1건 버림): {e} | {sql.split('(')[0].strip()} {params}")
+                _count("errors")
+
+
+def _run():
+    while True:
+        try:
+            item = _queue.get(timeout=FLUSH_INTERVAL)
+        except queue.Empty:
+            continue
+
+        batch, markers = [], []
+        while True:
+            # flush()가 넣은 표시(Event)는 앞선 기록이 모두 커밋된 뒤 알림
+            if isinstance(item, threading.Event):
+                markers.append(item)
+            else:
+                batch.append(item)
+            if len(batch) >= BATCH_SIZE:
+                break
+            try:
+                item = _queue.get_nowait()
+            except queue.Empty:
+                break
+
+        if batch:
+            _write_batch(batch)
+        for marker in markers:
+            marker.set()
+
+
+def flush(timeout=SHUTDOWN_TIMEOUT):
+    """
+    지금까지 큐에 넣은 기록이 모두 커밋될 때까지 기다립니다
+
+    반환값:
+        bool: 제한 시간 안에 모두 커밋되었으면 True
+    """
+    if _writer is None or not _writer.is_alive():
+        return _queue.empty()
+    marker = threading.Event()
+    try:
+        _queue.put(marker, timeout=timeout)
+    except queue.Full:
+        return False
+    return marker.wait(timeout)
+
+
+def get_write_behind_stats():
+    with _stats_lock:
+        return {**_stats, "pending": _queue.qsize()}
+
+
+def print_write_behind_stats():
+    stats = get_write_behind_stats()
+    if stats["queued"] == 0 and stats["sync_fallbacks"] == 0:
+        return
+    print(
+        f"[WriteBehind] queued {stats['queued']} / written {stats['written']} in {stats['batches']} batches "
+        f"(max {stats['max_batch_ms']:.1f} ms) | pending {stats['pending']} | "
+        f"sync fallbacks {stats['sync_fallbacks']} | errors {stats['errors']}"
+    )
+
+
+atexit.register(flush)